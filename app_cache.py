@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+
+def frame_nbytes(*frames):
+    """
+    Deep memory usage of some DataFrames in bytes (string columns included).
+    """
+    return int(sum(df.memory_usage(deep=True).sum() for df in frames if df is not None))
+
+
+class AppCache:
+    """
+    Least recently used cache of loaded apps, bounded by a memory budget.
+
+    loader(app_name) builds an app's data, and sizeof(data) says how many bytes it holds.
+    When the total goes over budget_bytes, the least recently used apps are dropped until
+    it fits again. The app that was just asked for is never dropped, so a single app bigger
+    than the whole budget still works, it just won't share the cache with anything else.
+    Dropped apps are simply loaded again by loader the next time they're asked for.
+    """
+
+    def __init__(self, loader, sizeof, budget_bytes):
+        self.loader = loader
+        self.sizeof = sizeof
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()  # app_name -> (data, nbytes), oldest first
+        # Dash serves callbacks from several threads, and two of them asking for the same
+        # app shouldn't both load it
+        self._lock = threading.Lock()
+
+    def __contains__(self, app_name):
+        return app_name in self._entries
+
+    @property
+    def nbytes(self):
+        return sum(nbytes for _, nbytes in self._entries.values())
+
+    def get(self, app_name):
+        with self._lock:
+            if app_name in self._entries:
+                self._entries.move_to_end(app_name)
+                return self._entries[app_name][0]
+
+            print(f"Loading {app_name}...")
+            data = self.loader(app_name)
+            self._entries[app_name] = (data, self.sizeof(data))
+            self._evict()
+            return data
+
+    def drop(self, app_name):
+        """
+        Forgets a loaded app, so the next get loads it again (e.g. once its clusters exist).
+        """
+        with self._lock:
+            self._entries.pop(app_name, None)
+
+    def _evict(self):
+        while len(self._entries) > 1 and self.nbytes > self.budget_bytes:
+            app_name, (_, nbytes) = self._entries.popitem(last=False)
+            print(f"Evicted {app_name} from memory ({nbytes / 1024 ** 2:.0f} MB)")
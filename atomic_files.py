@@ -0,0 +1,85 @@
+"""
+Writing cache files that more than one process builds (the dashboard and a background
+cluster job can both be filling the same cache at once).
+
+Every writer writes to a temp file of its own and swaps it in with os.replace, so nobody
+ever reads half a file and two writers never write into the same temp file.
+"""
+import os
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where there's no flock and locked() doesn't lock
+    fcntl = None
+
+
+def temp_path(path, suffix=".tmp"):
+    """
+    A name next to path that no other writer uses. Unlike tempfile's, the file (or folder)
+    gets made the usual way, so once it's swapped in it has the usual permissions.
+    """
+    return f"{path}.{os.getpid()}.{uuid.uuid4().hex[:12]}{suffix}"
+
+
+def atomic_write(path, write, suffix=".tmp"):
+    """
+    Calls write with a fresh temp file name next to path, then swaps that file in for path.
+    suffix is the temp name's ending, for writers like np.save that add their own otherwise.
+    """
+    tmp_path = temp_path(path, suffix)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_text(path, text):
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            f.write(text)
+    atomic_write(path, write)
+
+
+def remove_if_exists(path):
+    # Another writer may have removed it between us checking and removing it
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def locked(path):
+    """
+    Holds an exclusive lock on the file at path (made if needed) for the with block,
+    for caches that span several files that have to be swapped in together.
+    """
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def try_lock(path):
+    """
+    Takes an exclusive lock on the file at path (made if needed) if nobody holds it, and
+    returns the open file, which keeps it locked until it's closed. None if it's held.
+    """
+    f = open(path, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return None
+    return f
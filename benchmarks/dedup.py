@@ -0,0 +1,137 @@
+"""
+Compares clustering every copy of a review against one point per group of copies (see dedup.py).
+
+Makes one synthetic version where --copies of the reviews are pasted from an earlier review,
+half of them word for word and half with a word or two changed, then clusters it the way
+review_clustering does: without dedup, with exact copies collapsed (--dedup) and with near
+copies collapsed at each of --thresholds. Reports for each:
+
+    seconds   - duplicate grouping + embedding + HDBSCAN
+    embedded  - distinct texts that reach the model (the embedding cache never encodes a text
+                twice, so exact copies cost nothing even without dedup)
+    points    - rows HDBSCAN clustered
+    worst     - lowest shingle Jaccard similarity of any review to the review it's grouped under
+    ari, ami  - adjusted Rand index / adjusted mutual information of every review's cluster
+                against clustering every copy (1 is the same clustering)
+    clusters  - clusters found
+    noise     - fraction of reviews left as noise
+
+The stub embedder needs no model; --embedder torch/quantized/onnx uses a real backend.
+
+Usage:
+    python benchmarks/dedup.py [--reviews 20000] [--copies 0.3] [--thresholds 0.7 0.8 0.9] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dedup import duplicate_groups, jaccard, shingle_hashes
+from embedding_backends import get_backend, BACKENDS
+from review_clustering import EMBEDDING_MODEL, MIN_WORDS, cluster_embeddings
+from synthetic import review_text, FILLER, HashingEmbedder
+
+
+def make_embedder(name, dim):
+    if name == "stub":
+        return HashingEmbedder(dim)
+    return get_backend(name, model_name=EMBEDDING_MODEL, show_progress_bar=False)
+
+
+def synthetic_texts(num_reviews, copies, seed):
+    rng = np.random.default_rng(seed)
+    texts = []
+    while len(texts) < num_reviews:
+        if texts and rng.random() < copies:
+            words = texts[rng.integers(len(texts))].split()
+            if rng.random() < 0.5:
+                # Edited a little before posting again
+                for _ in range(rng.integers(1, 3)):
+                    words[rng.integers(len(words))] = str(rng.choice(FILLER))
+            texts.append(" ".join(words))
+        else:
+            text = review_text(rng, 20)
+            if len(text.split()) >= MIN_WORDS:
+                texts.append(text)
+    return pd.Series(texts)
+
+
+def worst_similarity(texts, groups, representatives):
+    hashes, owner = shingle_hashes(texts.tolist())
+    starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+    shingles = [np.unique(part) for part in np.split(hashes, starts[1:])]
+    leaders = representatives[groups]
+    return min((jaccard(shingles[i], shingles[leader]) for i, leader in enumerate(leaders) if leader != i),
+               default=1.0)
+
+
+def run(texts, embedder, dedup, threshold):
+    start = time.perf_counter()
+    if dedup:
+        groups, representatives = duplicate_groups(texts, threshold)
+    else:
+        groups = representatives = np.arange(len(texts))
+    embedded = texts.iloc[representatives]
+    # Like the embedding cache, each distinct text only goes to the model once
+    distinct = embedded.unique().tolist()
+    vectors = np.asarray(embedder.encode(distinct), dtype=np.float32)
+    embeddings = vectors[pd.Index(distinct).get_indexer(embedded)]
+    # The same way cluster_version feeds HDBSCAN, one point per group
+    labels = cluster_embeddings(embeddings)[groups]
+    seconds = time.perf_counter() - start
+    return labels, len(distinct), len(representatives), worst_similarity(texts, groups, representatives), seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare clustering with duplicate reviews embedded once against without.")
+    parser.add_argument("--reviews", type=int, default=20_000, help="Synthetic reviews in the version (default: 20000)")
+    parser.add_argument("--copies", type=float, default=0.3, help="Fraction of reviews pasted from another one (default: 0.3)")
+    parser.add_argument("--thresholds", nargs="+", type=float, default=[0.7, 0.8, 0.9],
+                        help="dedup thresholds to compare (default: 0.7 0.8 0.9)")
+    parser.add_argument("--embedder", choices=["stub"] + list(BACKENDS), default="stub",
+                        help="stub (no model, default) or a real embedding backend")
+    parser.add_argument("--dim", type=int, default=384, help="Stub embedding size (default: 384)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    from sklearn.metrics import adjusted_rand_score, adjusted_mutual_info_score
+
+    texts = synthetic_texts(args.reviews, args.copies, args.seed)
+    embedder = make_embedder(args.embedder, args.dim)
+    print(f"Clustering {len(texts)} reviews ({texts.nunique()} distinct texts), {args.embedder} embedder")
+
+    results = {}
+    baseline = None
+    configs = [("every copy", False, None), ("exact copies", True, None)]
+    configs += [(f"near {threshold}", True, threshold) for threshold in args.thresholds]
+    for name, dedup, threshold in configs:
+        labels, embedded, points, worst, seconds = run(texts, embedder, dedup, threshold)
+        if baseline is None:
+            baseline = labels
+        results[name] = {
+            "seconds": seconds, "embedded": embedded, "points": points, "worst": worst,
+            "ari": adjusted_rand_score(baseline, labels), "ami": adjusted_mutual_info_score(baseline, labels),
+            "clusters": len(set(labels.tolist()) - {-1}), "noise": float((labels == -1).mean()),
+        }
+
+    print(f"\n{'config':<14}{'seconds':>9}{'embedded':>10}{'points':>9}{'worst':>7}{'ari':>7}{'ami':>7}"
+          f"{'clusters':>10}{'noise':>7}")
+    for name, r in results.items():
+        print(f"{name:<14}{r['seconds']:>9.2f}{r['embedded']:>10}{r['points']:>9}{r['worst']:>7.2f}"
+              f"{r['ari']:>7.3f}{r['ami']:>7.3f}{r['clusters']:>10}{r['noise']:>7.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"reviews": len(texts), "copies": args.copies, "embedder": args.embedder,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Compares embedding backends against what create_cluster used to do
+(SentenceTransformer.encode with its default batch size of 32, float32 PyTorch).
+
+For every backend it reports:
+    texts/s  - embedding throughput, model loading excluded
+    speedup  - throughput relative to the current backend
+    cosine   - mean cosine similarity between its vectors and the current backend's
+    ARI      - adjusted Rand index between the HDBSCAN clusters of the largest versions
+               using its vectors and using the current backend's (1.0 = same clusters)
+
+Usage:
+    python benchmarks/embedding_backends.py zoom [--sample 5000] [--backends torch quantized onnx]
+                                            [--batch-size 64] [--threads 4] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from embedding_backends import get_backend, BACKENDS, DEFAULT_BATCH_SIZE
+from ingest import load_reviews
+from review_clustering import prepare_reviews, CLUSTER_SETTINGS, EMBEDDING_MODEL
+
+
+def sample_reviews(app_name, sample, seed=0):
+    reviews = prepare_reviews(load_reviews(app_name))
+    if len(reviews) > sample:
+        reviews = reviews.sample(sample, random_state=seed)
+    return reviews
+
+
+def time_backend(backend, texts):
+    # Load the model and warm it up first, we only care about steady state throughput
+    backend.encode(texts[:64])
+    start = time.perf_counter()
+    embeddings = backend.encode(texts)
+    return embeddings, time.perf_counter() - start
+
+
+def cluster_agreement(reviews, reference, embeddings, versions=3):
+    """
+    Mean adjusted Rand index over the largest versions' HDBSCAN clusters.
+    """
+    import hdbscan
+    from sklearn.metrics import adjusted_rand_score
+
+    positions = np.arange(len(reviews))
+    largest = reviews['clean_version'].value_counts().index[:versions]
+    scores = []
+    for version in largest:
+        rows = positions[(reviews['clean_version'] == version).to_numpy()]
+        if len(rows) < CLUSTER_SETTINGS["min_reviews"]:
+            continue
+        labels = []
+        for matrix in (reference, embeddings):
+            clusterer = hdbscan.HDBSCAN(min_cluster_size=CLUSTER_SETTINGS["min_cluster_size"])
+            labels.append(clusterer.fit_predict(matrix[rows].astype(np.float64)))
+        scores.append(adjusted_rand_score(*labels))
+    return float(np.mean(scores)) if scores else float('nan')
+
+
+def mean_cosine(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return float(np.mean(np.sum(a * b, axis=1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backend throughput and cluster agreement.")
+    parser.add_argument("app_name", type=str, help="App whose reviews to embed (e.g., Zoom, Webex, Firefox)")
+    parser.add_argument("--sample", type=int, default=5000, help="Reviews to embed (default: 5000)")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    reviews = sample_reviews(args.app_name, args.sample)
+    texts = reviews['cleaned_content'].tolist()
+    print(f"Embedding {len(texts)} {args.app_name} reviews")
+
+    # What create_cluster did before backends existed
+    current = get_backend("torch", model_name=EMBEDDING_MODEL, batch_size=32, sort_by_length=False,
+                          num_threads=args.threads, show_progress_bar=False)
+    reference, reference_time = time_backend(current, texts)
+    results = [{
+        "backend": "current", "batch_size": 32, "sort_by_length": False,
+        "texts_per_s": len(texts) / reference_time, "speedup": 1.0, "cosine": 1.0, "ari": 1.0,
+    }]
+
+    for name in args.backends:
+        backend = get_backend(name, model_name=EMBEDDING_MODEL, batch_size=args.batch_size,
+                              num_threads=args.threads, show_progress_bar=False)
+        try:
+            embeddings, seconds = time_backend(backend, texts)
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        results.append({
+            "backend": name, "batch_size": args.batch_size, "sort_by_length": True,
+            "texts_per_s": len(texts) / seconds,
+            "speedup": reference_time / seconds,
+            "cosine": mean_cosine(reference, embeddings),
+            "ari": cluster_agreement(reviews, reference, embeddings),
+        })
+
+    print(f"\n{'backend':<12}{'batch':>7}{'texts/s':>10}{'speedup':>9}{'cosine':>9}{'ARI':>7}")
+    for r in results:
+        print(f"{r['backend']:<12}{r['batch_size']:>7}{r['texts_per_s']:>10.0f}{r['speedup']:>8.2f}x"
+              f"{r['cosine']:>9.4f}{r['ari']:>7.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"app": args.app_name, "reviews": len(texts), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
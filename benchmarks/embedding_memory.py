@@ -0,0 +1,143 @@
+"""
+Peak memory of the two ways create_cluster has held review embeddings.
+
+    lists  - what it used to do: the whole matrix read into memory, turned into a column of
+             Python lists (reviews['embedding']), and rebuilt per version with np.array(tolist)
+    memmap - what it does now: the matrix written block by block to a memory mapped .npy,
+             versions in contiguous rows, each version a slice of it
+
+Both run on the same synthetic reviews against the same pre-filled EmbeddingCache, so no
+model is needed. Every mode runs in its own fresh process and reports that process's peak
+RSS. "setup" is a process that only builds the reviews and opens the cache, so the numbers
+minus setup are what holding the embeddings cost.
+
+Usage:
+    python benchmarks/embedding_memory.py [--reviews 200000] [--versions 50] [--dim 384] [--json out.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from embedding_cache import EmbeddingCache
+from ingest import peak_rss_mb
+
+MODEL_NAME = "benchmark-model"
+MODES = ["setup", "lists", "memmap"]
+
+
+def make_reviews(num_reviews, num_versions):
+    versions = np.arange(num_reviews) % num_versions
+    return pd.DataFrame({
+        "clean_version": versions.astype(str),
+        "cleaned_content": [f"synthetic review number {i} about version {v}" for i, v in enumerate(versions)],
+    })
+
+
+def random_encoder(dim, seed=0):
+    rng = np.random.default_rng(seed)
+    return lambda texts: rng.standard_normal((len(texts), dim), dtype=np.float32)
+
+
+def fill_cache(cache_dir, reviews, dim):
+    cache = EmbeddingCache(MODEL_NAME, cache_dir=cache_dir, max_entries=len(reviews))
+    cache.encode(reviews['cleaned_content'].tolist(), random_encoder(dim))
+    cache.save()
+
+
+def run_mode(mode, cache_dir, num_reviews, num_versions, dim):
+    reviews = make_reviews(num_reviews, num_versions)
+    cache = EmbeddingCache(MODEL_NAME, cache_dir=cache_dir, max_entries=num_reviews)
+    versions = reviews['clean_version'].unique()
+    version_rows = {v: reviews[reviews['clean_version'] == v] for v in versions}
+    encoder = random_encoder(dim)
+    checksum = 0.0
+
+    start = time.perf_counter()
+    if mode == "lists":
+        embed_index = pd.concat(version_rows.values()).index
+        embeddings = cache.encode(reviews.loc[embed_index, 'cleaned_content'].tolist(), encoder)
+        reviews['embedding'] = pd.Series(list(embeddings), index=embed_index, dtype=object).map(np.ndarray.tolist)
+        for v in versions:
+            version_reviews = reviews.loc[version_rows[v].index]
+            version_embeddings = np.array(version_reviews['embedding'].tolist())
+            checksum += float(version_embeddings[0, 0])
+    elif mode == "memmap":
+        spans = {}
+        texts = []
+        for v in versions:
+            spans[v] = (len(texts), len(texts) + len(version_rows[v]))
+            texts.extend(version_rows[v]['cleaned_content'].tolist())
+        matrix_path = os.path.join(cache_dir, "matrix.npy")
+        matrix = cache.encode_to_file(texts, encoder, matrix_path)
+        del texts
+        for v in versions:
+            lo, hi = spans[v]
+            version_embeddings = np.asarray(matrix[lo:hi], dtype=np.float64)
+            checksum += float(version_embeddings[0, 0])
+        del matrix
+        os.remove(matrix_path)
+    seconds = time.perf_counter() - start
+
+    return {"mode": mode, "peak_rss_mb": peak_rss_mb(), "seconds": seconds, "checksum": checksum}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of embedding lists and a memory mapped matrix.")
+    parser.add_argument("--reviews", type=int, default=200_000, help="Synthetic reviews (default: 200000)")
+    parser.add_argument("--versions", type=int, default=50, help="Versions to spread them over (default: 50)")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding size (default: 384, all-MiniLM-L6-v2)")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this JSON file")
+    parser.add_argument("--mode", choices=MODES, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        # Child process, measure one mode and hand the result back on stdout
+        result = run_mode(args.mode, args.cache_dir, args.reviews, args.versions, args.dim)
+        print(json.dumps(result))
+        return
+
+    if peak_rss_mb() is None:
+        sys.exit("Peak RSS isn't available on this platform")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        print(f"Filling a cache with {args.reviews} x {args.dim} embeddings")
+        fill_cache(cache_dir, make_reviews(args.reviews, args.versions), args.dim)
+
+        results = []
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode, "--cache-dir", cache_dir,
+                 "--reviews", str(args.reviews), "--versions", str(args.versions), "--dim", str(args.dim)],
+                check=True, capture_output=True, text=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    by_mode = {r["mode"]: r for r in results}
+    setup = by_mode["setup"]["peak_rss_mb"]
+    if by_mode["lists"]["checksum"] != by_mode["memmap"]["checksum"]:
+        print("Warning: the two modes saw different embeddings")
+
+    print(f"\n{'mode':<8}{'peak RSS':>11}{'over setup':>12}{'seconds':>9}")
+    for r in results:
+        r["over_setup_mb"] = r["peak_rss_mb"] - setup
+        print(f"{r['mode']:<8}{r['peak_rss_mb']:>8.0f} MB{r['over_setup_mb']:>9.0f} MB{r['seconds']:>9.2f}")
+    matrix_mb = args.reviews * args.dim * 4 / 1024 ** 2
+    print(f"\n(the float32 matrix itself is {matrix_mb:.0f} MB)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"reviews": args.reviews, "versions": args.versions, "dim": args.dim, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Cold start benchmark for the dashboard's imports.
+
+main.py used to import review_clustering at load, which imported sentence_transformers,
+hdbscan, sklearn and nltk and loaded the NLTK words corpus. Now those only get imported
+when clustering actually runs. This times, in fresh interpreters:
+    dashboard - `import main`, what starting the dashboard costs now
+    eager     - `import main` plus everything the old review_clustering import pulled in
+
+Usage:
+    python benchmarks/import_time.py [--runs 5] [--detail]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from importlib.util import find_spec
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ML_MODULES = ["sentence_transformers", "hdbscan", "sklearn.feature_extraction.text", "nltk.corpus"]
+
+
+def time_import(code, runs):
+    """
+    Median wall time in seconds of running code in a brand new interpreter.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def slowest_imports(code, top=10):
+    """
+    The modules with the largest cumulative import time, from python -X importtime.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time how long the dashboard takes to import.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time per case (default: 5)")
+    parser.add_argument("--detail", action="store_true", help="Also list the slowest imports for the dashboard")
+    args = parser.parse_args()
+
+    # The dashboard shouldn't pull in any of the ML stack on its own
+    check = "import sys, main; print(','.join(m for m in %r if m in sys.modules))" % (ML_MODULES,)
+    leaked = subprocess.run([sys.executable, "-c", check], cwd=ROOT, capture_output=True, text=True, check=True)
+    if leaked.stdout.strip():
+        print(f"WARNING: importing main also imported {leaked.stdout.strip()}")
+
+    installed = [m for m in ML_MODULES if find_spec(m.split(".")[0]) is not None]
+    missing = sorted(set(ML_MODULES) - set(installed))
+    eager = "; ".join(["import main, review_clustering"] + [f"import {m}" for m in installed])
+    if "nltk.corpus" in installed:
+        eager += "; review_clustering.get_english_words()"
+
+    dashboard_time = time_import("import main", args.runs)
+    eager_time = time_import(eager, args.runs)
+
+    print(f"{'case':<12}{'median (s)':>12}")
+    print(f"{'dashboard':<12}{dashboard_time:>12.3f}")
+    print(f"{'eager':<12}{eager_time:>12.3f}")
+    print(f"Dashboard cold start is {eager_time - dashboard_time:.3f}s ({eager_time / dashboard_time:.1f}x) faster")
+    if missing:
+        print(f"Not installed, so left out of the eager case: {', '.join(missing)}")
+
+    if args.detail:
+        print("\nSlowest imports for `import main` (cumulative us):")
+        for cumulative, name in slowest_imports("import main"):
+            print(f"{cumulative:>12}  {name}")
+
+
+if __name__ == "__main__":
+    main()
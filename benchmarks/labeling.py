@@ -0,0 +1,94 @@
+"""
+Compares cluster labeling before and after labeling.py.
+
+    per_cluster - what label_clusters used to do: a fresh TfidfVectorizer fit on every cluster
+    legacy      - cluster_labels(method="legacy"), one shared vocabulary, same labels
+    ctfidf      - cluster_labels(method="ctfidf"), one shared vocabulary, class-based TF-IDF
+
+Texts come from the synthetic review generator, split into clusters at random. Reports the
+time each takes and checks the legacy labels match the per cluster ones exactly.
+
+Usage:
+    python benchmarks/labeling.py [--texts 50000] [--clusters 500] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from labeling import cluster_labels
+from review_clustering import CLUSTER_SETTINGS, MIN_WORDS
+from synthetic import review_text
+
+
+def per_cluster_labels(texts, cluster_ids):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    by_cluster = {}
+    for text, cluster_id in zip(texts, cluster_ids.tolist()):
+        by_cluster.setdefault(cluster_id, []).append(text)
+
+    labels = {}
+    for cluster_id, cluster_texts in sorted(by_cluster.items()):
+        tfidf = TfidfVectorizer(
+            ngram_range=tuple(CLUSTER_SETTINGS["tfidf_ngram_range"]),
+            strip_accents='unicode',
+            max_features=CLUSTER_SETTINGS["tfidf_max_features"],
+            stop_words='english'
+        )
+        try:
+            tfidf.fit_transform(cluster_texts)
+        except ValueError:
+            labels[cluster_id] = ""
+            continue
+        labels[cluster_id] = ", ".join(tfidf.get_feature_names_out())
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time per cluster TF-IDF against the shared vocabulary labeling.")
+    parser.add_argument("--texts", type=int, default=50_000, help="Review texts to label (default: 50000)")
+    parser.add_argument("--clusters", type=int, default=500, help="Clusters to split them into (default: 500)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    texts = [review_text(rng, 20) for _ in range(args.texts)]
+    texts = [t for t in texts if len(t.split()) >= MIN_WORDS]
+    cluster_ids = rng.integers(args.clusters, size=len(texts))
+    print(f"Labeling {len(texts)} texts in {len(np.unique(cluster_ids))} clusters")
+
+    methods = {
+        "per_cluster": lambda: per_cluster_labels(texts, cluster_ids),
+        "legacy": lambda: cluster_labels(texts, cluster_ids, method="legacy"),
+        "ctfidf": lambda: cluster_labels(texts, cluster_ids, method="ctfidf"),
+    }
+    seconds = {}
+    labels = {}
+    for name, run in methods.items():
+        start = time.perf_counter()
+        labels[name] = run()
+        seconds[name] = time.perf_counter() - start
+
+    mismatches = sum(labels["legacy"][c] != label for c, label in labels["per_cluster"].items())
+    print(f"\n{'method':<13}{'seconds':>9}{'speedup':>9}")
+    for name, value in seconds.items():
+        print(f"{name:<13}{value:>9.2f}{seconds['per_cluster'] / value:>8.1f}x")
+    print(f"\nLegacy labels that differ from per cluster TF-IDF: {mismatches}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"texts": len(texts), "clusters": args.clusters, "seconds": seconds, "legacy_mismatches": mismatches},
+                      f, indent=2)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Times every stage of the pipeline on synthetic data, so we can see how each one scales
+and compare commits.
+
+Stages, in the order they run:
+    ingest          - load_releases + load_reviews on the raw CSVs (cold ingest cache)
+    clean           - clean_reviews (drop unversioned reviews, clean the text)
+    filter          - filter_reviews (drop uninformative reviews)
+    attribute       - versioning.attribute_releases (Firefox only, ingest already does it
+                      when building the cache, this times it again on its own)
+    embed           - the EmbeddingCache + embedder, into the memory mapped matrix (cold cache)
+    cluster         - HDBSCAN over every version
+    label           - TF-IDF labels for every version's clusters
+    write           - the two cluster CSVs
+    create_cluster  - the whole of create_cluster end to end, embeddings already cached
+    figure          - TraceVisualizer.make_plot (warm ingest cache, like a dashboard restart)
+    cached_figure   - TraceVisualizer.cached_plot with the figure already cached (see figure_cache)
+    append_ratings  - review_aggregates.review_ratings after 1% more reviews are appended to the file
+    click_release   - the click callback for the release dot with the most features
+    click_cluster   - the click callback for the biggest cluster dot
+
+Everything happens in a throwaway folder laid out like the repo (Reviews/, Releases/,
+Clusters/, Cache/), so nothing real gets touched. The stub embedder (the default) needs no
+model or network; --embedder torch/quantized/onnx uses a real backend instead.
+
+Usage:
+    python benchmarks/pipeline.py [--app zoom] [--reviews 20000] [--versions 40] [--text-length 20]
+                                  [--embedder stub] [--repeat 3] [--json out.json] [--compare old.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import CLUSTER_FILES, EMBEDDING_CACHE_DIR, PATCH_COLUMNS, REVIEW_COLUMNS
+from embedding_backends import get_backend, BACKENDS
+from embedding_cache import EmbeddingCache
+from ingest import load_releases, load_reviews, review_path
+from review_clustering import (
+    CLUSTER_SETTINGS, EMBEDDING_MODEL, clean_reviews, filter_reviews,
+    cluster_embeddings, label_clusters, create_cluster,
+)
+from review_aggregates import review_ratings
+from synthetic import write_dataset, HashingEmbedder
+from versioning import attribute_releases
+
+CLICK_REPEATS = 20
+
+
+@contextlib.contextmanager
+def timed(stages, name):
+    start = time.perf_counter()
+    yield
+    stages[name] = time.perf_counter() - start
+
+
+def make_embedder(name, dim):
+    if name == "stub":
+        return HashingEmbedder(dim)
+    return get_backend(name, model_name=EMBEDDING_MODEL, show_progress_bar=False)
+
+
+def time_click(visualizer, app_name, point):
+    click = {"points": [point]}
+    times = []
+    for _ in range(CLICK_REPEATS):
+        start = time.perf_counter()
+        visualizer.click_details(click, app_name)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run_pipeline(workdir, args):
+    """
+    Generates the data in workdir and runs every stage once. Returns (stage seconds, counts).
+    """
+    app_name = args.app.lower()
+    stages = {}
+    os.chdir(workdir)
+
+    releases, raw_reviews = write_dataset(workdir, app_name, args.reviews, args.versions, args.text_length, args.seed)
+
+    with timed(stages, "ingest"):
+        releases = load_releases(app_name)
+        reviews = load_reviews(app_name)
+    with timed(stages, "clean"):
+        reviews = clean_reviews(reviews)
+    with timed(stages, "filter"):
+        reviews = filter_reviews(reviews)
+    if app_name == "firefox":
+        with timed(stages, "attribute"):
+            released = attribute_releases(reviews[REVIEW_COLUMNS["Date"]], releases[PATCH_COLUMNS["Date"]])
+            reviews = reviews.assign(clean_version=released)
+        reviews = reviews.sort_values(REVIEW_COLUMNS["Date"], kind='stable')
+
+    versions = releases['clean_version'].dropna().unique()
+    version_rows = {version: reviews[reviews['clean_version'] == version] for version in versions}
+    to_cluster = [v for v in versions if len(version_rows[v]) >= CLUSTER_SETTINGS["min_reviews"]]
+
+    embedder = make_embedder(args.embedder, args.dim)
+    with timed(stages, "embed"):
+        spans = {}
+        texts = []
+        for version in to_cluster:
+            spans[str(version)] = (len(texts), len(texts) + len(version_rows[version]))
+            texts.extend(version_rows[version]['cleaned_content'].tolist())
+        cache = EmbeddingCache(embedder.cache_name)
+        matrix = cache.encode_to_file(texts, embedder.encode, f"{EMBEDDING_CACHE_DIR}/benchmark_matrix.npy")
+        cache.save()
+
+    with timed(stages, "cluster"):
+        labels = {}
+        for version in to_cluster:
+            start, stop = spans[str(version)]
+            labels[str(version)] = cluster_embeddings(matrix[start:stop])
+
+    with timed(stages, "label"):
+        summaries, clustered = [], []
+        for version in to_cluster:
+            version_summaries, version_clustered = label_clusters(
+                version, version_rows[version], labels[str(version)], log=lambda line: None
+            )
+            summaries.extend(version_summaries)
+            clustered.extend(version_clustered)
+    del matrix
+
+    with timed(stages, "write"):
+        os.makedirs("Clusters", exist_ok=True)
+        if clustered:
+            pd.concat(clustered, ignore_index=True).to_csv(CLUSTER_FILES[f"{app_name}_clustered_reviews"], index=False)
+        pd.DataFrame(summaries).to_csv(CLUSTER_FILES[f"{app_name}_summary"], index=False)
+
+    with timed(stages, "create_cluster"):
+        create_cluster(app_name, incremental=False, backend=embedder)
+
+    # Imported here so the timings above don't include loading Dash
+    from main import TraceVisualizer
+    visualizer = TraceVisualizer(app_name=app_name)
+    with timed(stages, "figure"):
+        visualizer.make_plot(app_name)
+    # Loading the first app for the layout cached its figure
+    with timed(stages, "cached_figure"):
+        visualizer.cached_plot(app_name)
+
+    # The feed only grows, so the running rating sums only have to count the new rows
+    raw_reviews.sample(max(1, len(raw_reviews) // 100), random_state=args.seed).to_csv(
+        review_path(app_name), mode="a", header=False, index=False
+    )
+    with timed(stages, "append_ratings"):
+        review_ratings(app_name)
+
+    data = visualizer.cache.get(app_name)
+    biggest_release = max(data.indexes["release"].items(), key=lambda item: len(item[1]))[0]
+    stages["click_release"] = time_click(visualizer, app_name, {"curveNumber": 0, "customdata": str(biggest_release)})
+    cluster_trace = data.fig.data[1]
+    if len(cluster_trace.customdata):
+        biggest_cluster = max(cluster_trace.customdata, key=lambda row: int(row[1]))
+        stages["click_cluster"] = time_click(visualizer, app_name, {"curveNumber": 1, "customdata": list(biggest_cluster)})
+
+    counts = {
+        "raw_reviews": len(raw_reviews),
+        "kept_reviews": len(reviews),
+        "versions": len(versions),
+        "clustered_versions": len(to_cluster),
+        "clusters": len(summaries),
+    }
+    return stages, counts
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def print_comparison(stages, old_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    print(f"\nCompared with {old_path} (commit {old.get('commit')}):")
+    print(f"{'stage':<16}{'before':>10}{'after':>10}{'change':>9}")
+    for name, seconds in stages.items():
+        before = old["stages"].get(name)
+        if before is None:
+            print(f"{name:<16}{'-':>10}{seconds:>9.3f}s{'':>9}")
+        else:
+            print(f"{name:<16}{before:>9.3f}s{seconds:>9.3f}s{seconds / before:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each pipeline stage on synthetic reviews and releases.")
+    parser.add_argument("--app", choices=["zoom", "webex", "firefox"], default="zoom",
+                        help="Which app's version formats to generate (default: zoom)")
+    parser.add_argument("--reviews", type=int, default=20_000, help="Synthetic reviews (default: 20000)")
+    parser.add_argument("--versions", type=int, default=40, help="Release versions (default: 40)")
+    parser.add_argument("--text-length", type=int, default=20, help="Average words per review (default: 20)")
+    parser.add_argument("--embedder", choices=["stub"] + list(BACKENDS), default="stub",
+                        help="stub needs no model, the others are embedding backends (default: stub)")
+    parser.add_argument("--dim", type=int, default=384, help="Stub embedding size (default: 384)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs to take the fastest time of, per stage (default: 1)")
+    parser.add_argument("--keep", type=str, default=None, help="Run in this folder and keep it, instead of a temp folder")
+    parser.add_argument("--json", type=str, default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=str, default=None, help="A previous --json file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    cwd = os.getcwd()
+
+    runs = []
+    for run in range(args.repeat):
+        if args.keep:
+            workdir = os.path.abspath(args.keep) if args.repeat == 1 else os.path.abspath(f"{args.keep}_{run}")
+            os.makedirs(workdir, exist_ok=True)
+            context = contextlib.nullcontext(workdir)
+        else:
+            context = tempfile.TemporaryDirectory()
+        output = None if args.verbose else io.StringIO()
+        with context as workdir, contextlib.redirect_stdout(output or sys.stdout):
+            try:
+                stages, counts = run_pipeline(workdir, args)
+            finally:
+                os.chdir(cwd)
+        runs.append(stages)
+
+    # Fastest run of each stage, the least noisy number for comparing commits
+    stages = {name: min(run[name] for run in runs) for name in runs[0]}
+
+    print(f"{args.reviews} {args.app} reviews, {args.versions} versions, ~{args.text_length} words, "
+          f"{args.embedder} embedder, best of {args.repeat}")
+    print(f"{counts['kept_reviews']} reviews kept, {counts['clustered_versions']} versions clustered, "
+          f"{counts['clusters']} clusters\n")
+    print(f"{'stage':<16}{'seconds':>10}")
+    for name, seconds in stages.items():
+        print(f"{name:<16}{seconds:>10.3f}")
+
+    if compare_path:
+        print_comparison(stages, compare_path)
+
+    if json_path:
+        result = {
+            "commit": git_commit(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "params": {
+                "app": args.app, "reviews": args.reviews, "versions": args.versions,
+                "text_length": args.text_length, "embedder": args.embedder, "dim": args.dim,
+                "seed": args.seed, "repeat": args.repeat,
+            },
+            "counts": counts,
+            "stages": stages,
+            "runs": runs,
+        }
+        with open(json_path, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Compares clustering the full embeddings against shrinking them first (see reduction.py).
+
+For the biggest versions, clusters the embeddings the way review_clustering does by default
+(full dimensions, hdbscan's "best" algorithm) and then with every --methods x --dims
+reduction, with and without the fast neighbor settings (hdbscan_options). Reports for each:
+
+    seconds   - reduction + HDBSCAN, summed over the versions
+    speedup   - full dimension seconds / these seconds
+    ari, ami  - adjusted Rand index / adjusted mutual information against the full
+                dimension cluster ids (1 is the same clustering), averaged over the versions
+    clusters  - clusters found, summed over the versions
+    noise     - fraction of reviews HDBSCAN left as noise
+
+Reviews are synthetic by default (one big version of --reviews reviews). --app uses that
+app's real reviews from Reviews/ instead, its --versions biggest versions. The stub embedder
+(the default) needs no model; --embedder torch/quantized/onnx uses a real backend.
+
+Usage:
+    python benchmarks/reduction.py [--reviews 20000] [--methods pca random] [--dims 10 20 50]
+                                   [--app zoom --versions 3] [--embedder stub] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from embedding_backends import get_backend, BACKENDS
+from reduction import reduce_embeddings, REDUCTION_METHODS
+from review_clustering import CLUSTER_SETTINGS, EMBEDDING_MODEL, MIN_WORDS, cluster_embeddings
+from synthetic import review_text, HashingEmbedder
+
+
+def make_embedder(name, dim):
+    if name == "stub":
+        return HashingEmbedder(dim)
+    return get_backend(name, model_name=EMBEDDING_MODEL, show_progress_bar=False)
+
+
+def synthetic_versions(num_reviews, seed):
+    rng = np.random.default_rng(seed)
+    texts = [review_text(rng, 20) for _ in range(num_reviews)]
+    return {"synthetic": [t for t in texts if len(t.split()) >= MIN_WORDS]}
+
+
+def app_versions(app_name, num_versions):
+    from ingest import load_reviews
+    from review_clustering import prepare_reviews
+
+    reviews = prepare_reviews(load_reviews(app_name))
+    biggest = reviews['clean_version'].value_counts().index[:num_versions]
+    return {str(version): reviews.loc[reviews['clean_version'] == version, 'cleaned_content'].tolist()
+            for version in biggest}
+
+
+def run(embeddings, settings):
+    start = time.perf_counter()
+    if settings["reduction"]:
+        embeddings = reduce_embeddings(embeddings, settings["reduction"], settings["reduction_dims"])
+    labels = cluster_embeddings(embeddings, settings)
+    return labels, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time clustering reduced embeddings against the full ones.")
+    parser.add_argument("--reviews", type=int, default=20_000, help="Synthetic reviews in the version (default: 20000)")
+    parser.add_argument("--app", type=str, default=None, help="Use this app's real reviews instead")
+    parser.add_argument("--versions", type=int, default=3, help="How many of --app's biggest versions to use (default: 3)")
+    parser.add_argument("--methods", nargs="+", choices=REDUCTION_METHODS, default=REDUCTION_METHODS)
+    parser.add_argument("--dims", nargs="+", type=int, default=[10, 20, 50])
+    parser.add_argument("--embedder", choices=["stub"] + list(BACKENDS), default="stub",
+                        help="stub (no model, default) or a real embedding backend")
+    parser.add_argument("--dim", type=int, default=384, help="Stub embedding size (default: 384)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    from sklearn.metrics import adjusted_rand_score, adjusted_mutual_info_score
+
+    versions = app_versions(args.app, args.versions) if args.app else synthetic_versions(args.reviews, args.seed)
+    embedder = make_embedder(args.embedder, args.dim)
+    embeddings = {version: np.asarray(embedder.encode(texts), dtype=np.float32) for version, texts in versions.items()}
+    print(f"Clustering {sum(map(len, versions.values()))} reviews in {len(versions)} version(s), "
+          f"{next(iter(embeddings.values())).shape[1]} dimensions, {args.embedder} embedder")
+
+    configs = {"full": dict(CLUSTER_SETTINGS)}
+    for method in args.methods:
+        for dims in args.dims:
+            for fast in (False, True):
+                name = f"{method}-{dims}" + ("-fast" if fast else "")
+                # fast_neighbors_from=0 gives every version the fast neighbor settings
+                configs[name] = dict(CLUSTER_SETTINGS, reduction=method, reduction_dims=dims,
+                                     fast_neighbors_from=0 if fast else None)
+    configs["full-fast"] = dict(CLUSTER_SETTINGS, fast_neighbors_from=0)
+
+    baseline = {}
+    results = {}
+    for name, settings in configs.items():
+        seconds, ari, ami, clusters, noise = 0.0, [], [], 0, 0
+        for version, version_embeddings in embeddings.items():
+            labels, elapsed = run(version_embeddings, settings)
+            if name == "full":
+                baseline[version] = labels
+            seconds += elapsed
+            ari.append(adjusted_rand_score(baseline[version], labels))
+            ami.append(adjusted_mutual_info_score(baseline[version], labels))
+            clusters += len(set(labels.tolist()) - {-1})
+            noise += int((labels == -1).sum())
+        results[name] = {
+            "seconds": seconds, "ari": float(np.mean(ari)), "ami": float(np.mean(ami)),
+            "clusters": clusters, "noise": noise / sum(len(e) for e in embeddings.values()),
+        }
+
+    full = results["full"]["seconds"]
+    print(f"\n{'config':<16}{'seconds':>9}{'speedup':>9}{'ari':>7}{'ami':>7}{'clusters':>10}{'noise':>7}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['seconds']:>9.2f}{full / r['seconds']:>8.1f}x{r['ari']:>7.3f}{r['ami']:>7.3f}"
+              f"{r['clusters']:>10}{r['noise']:>7.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"app": args.app, "reviews": {v: len(t) for v, t in versions.items()},
+                       "embedder": args.embedder, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Synthetic review and release CSVs for benchmarking, in the same layout as the real exports
+(columns from REVIEW_COLUMNS/PATCH_COLUMNS, version formats each app actually uses), plus a
+stub embedder so the pipeline can run without downloading a model.
+
+Reviews are written about a handful of topics so they actually form clusters, with some
+boring ones ("good", "love it") and some without a version mixed in like the real data.
+"""
+import os
+import zlib
+import numpy as np
+import pandas as pd
+
+from config import PATCH_COLUMNS, REVIEW_COLUMNS
+from ingest import release_path, review_path
+
+# Each topic's words, reviews about a topic mostly use these
+TOPICS = [
+    "video camera black screen frozen picture webcam",
+    "audio microphone echo sound muted speaker volume",
+    "battery drains fast phone hot charging power",
+    "login password account sign error verification code",
+    "meeting join link invite host waiting room",
+    "screen share presentation slides display window",
+    "crash freezes closes restart update broken",
+    "notifications messages chat delayed missing alerts",
+    "tabs bookmarks history sync extensions browser",
+    "bluetooth headphones earbuds connect pairing audio",
+    "subtitles captions transcript language translation text",
+    "background blur virtual filter effects camera",
+]
+FILLER = "the app this when i it and after keeps every time with my on is really so please fix".split()
+BORING = ["good", "bad", "nice", "great", "ok", "love it", "hate it", "very good app", "excellent", "terrible"]
+
+
+def version_string(app_name, i):
+    """
+    The i-th release version in the format app_name's release notes use.
+    """
+    app_name = app_name.lower()
+    if app_name == "webex":
+        return f"{43 + i // 100}.{i % 100:02d}"
+    if app_name == "firefox":
+        return f"{100 + i}.0"
+    return f"5.{10 + i // 10}.{i % 10}"
+
+
+def review_version_string(app_name, version, rng):
+    """
+    How the app store reports version in a review, which has extra build info tacked on.
+    """
+    app_name = app_name.lower()
+    if app_name == "webex":
+        return f"{version}.{rng.integers(1000, 9999)}"
+    if app_name == "zoom":
+        return f"{version} ({rng.integers(1000, 9999)})"
+    return version
+
+
+def generate_releases(app_name, num_versions, start="2022-01-01", days_between=7, max_features=5, seed=0):
+    """
+    One to max_features feature rows per version, one version every days_between days.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(num_versions):
+        date = pd.Timestamp(start) + pd.Timedelta(days=i * days_between)
+        for j in range(rng.integers(1, max_features + 1)):
+            rows.append({
+                PATCH_COLUMNS["Date"]: date,
+                PATCH_COLUMNS["Version"]: version_string(app_name, i),
+                PATCH_COLUMNS["Description"]: f"Feature {j + 1} of {version_string(app_name, i)}",
+            })
+    return pd.DataFrame(rows)
+
+
+def review_text(rng, text_length):
+    if rng.random() < 0.1:
+        return str(rng.choice(BORING))
+    topic = TOPICS[rng.integers(len(TOPICS))].split()
+    length = max(1, int(rng.normal(text_length, text_length / 4)))
+    # Mostly topic words, so reviews about the same thing end up near each other
+    from_topic = rng.random(length) < 0.6
+    words = np.where(from_topic, rng.choice(topic, length), rng.choice(FILLER, length))
+    return " ".join(words)
+
+
+def generate_reviews(app_name, releases, num_reviews, text_length=20, missing_version_rate=0.02, seed=0):
+    """
+    num_reviews reviews spread over the releases, each written some time before the next
+    release came out, about text_length words long on average.
+    """
+    rng = np.random.default_rng(seed)
+    versions = releases.drop_duplicates(PATCH_COLUMNS["Version"])
+    release_dates = versions[PATCH_COLUMNS["Date"]].to_numpy()
+    version_names = versions[PATCH_COLUMNS["Version"]].to_numpy()
+
+    picks = rng.integers(len(versions), size=num_reviews)
+    gaps = np.diff(release_dates).max() if len(release_dates) > 1 else np.timedelta64(7, 'D')
+    offsets = (rng.random(num_reviews) * gaps.astype('timedelta64[s]').astype(np.int64)).astype('timedelta64[s]')
+    app_versions = [review_version_string(app_name, version_names[p], rng) for p in picks]
+    missing = rng.random(num_reviews) < missing_version_rate
+
+    reviews = pd.DataFrame({
+        "reviewId": [f"r{i}" for i in range(num_reviews)],
+        REVIEW_COLUMNS["Description"]: [review_text(rng, text_length) for _ in range(num_reviews)],
+        REVIEW_COLUMNS["Rating"]: rng.integers(1, 6, size=num_reviews),
+        REVIEW_COLUMNS["Date"]: release_dates[picks] + offsets,
+        REVIEW_COLUMNS["Version"]: pd.Series(app_versions).mask(missing),
+    })
+    return reviews.sort_values(REVIEW_COLUMNS["Date"], kind='stable').reset_index(drop=True)
+
+
+def write_dataset(root, app_name, num_reviews, num_versions, text_length=20, seed=0):
+    """
+    Writes app_name's synthetic release and review CSVs under root, at the paths config.py
+    expects them (so run from root, the rest of the code finds them).
+    Returns (releases, reviews).
+    """
+    releases = generate_releases(app_name, num_versions, seed=seed)
+    reviews = generate_reviews(app_name, releases, num_reviews, text_length=text_length, seed=seed)
+    for frame, path in ((releases, release_path(app_name)), (reviews, review_path(app_name))):
+        path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        frame.to_csv(path, index=False)
+    return releases, reviews
+
+
+class HashingEmbedder:
+    """
+    Stand-in for an embedding backend that needs no model or network.
+    A text's vector is the normalized sum of a fixed random vector per word,
+    so texts sharing words end up close together, which is enough for HDBSCAN to find topics.
+    """
+    name = "stub"
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self._word_vectors = {}
+
+    @property
+    def cache_name(self):
+        return f"stub-hashing-{self.dim}"
+
+    @property
+    def model_name(self):
+        # The search index records what made its vectors
+        return self.cache_name
+
+    def word_vector(self, word):
+        vector = self._word_vectors.get(word)
+        if vector is None:
+            rng = np.random.default_rng(zlib.crc32(word.encode('utf-8')))
+            vector = self._word_vectors[word] = rng.standard_normal(self.dim).astype(np.float32)
+        return vector
+
+    def encode(self, texts):
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.split():
+                embeddings[i] += self.word_vector(word)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.where(norms == 0, 1, norms)
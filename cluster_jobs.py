@@ -0,0 +1,204 @@
+"""
+Generates missing cluster files in the background, so the dashboard doesn't wait on them.
+
+create_cluster runs in a separate worker process, one app at a time, and reports how far it
+got to a small JSON file in JOB_DIR (see ProgressFile). The dashboard polls status() for it.
+While a job runs, the process that started it holds a lock file for the app in JOB_DIR, so
+another dashboard process never starts a second job for the same app.
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+from atomic_files import atomic_write, try_lock
+from config import JOB_DIR, CLUSTER_FILES
+
+
+def has_clusters(app_name):
+    """
+    Whether the cluster files main.py reads for app_name (see CLUSTER_FILES) are there.
+    """
+    return all(os.path.exists(CLUSTER_FILES[f"{app_name.lower()}_{kind}"]) for kind in ("summary", "clustered_reviews"))
+
+
+def progress_path(app_name):
+    return os.path.join(JOB_DIR, f"{app_name.lower()}_progress.json")
+
+
+def lock_path(app_name):
+    return os.path.join(JOB_DIR, f"{app_name.lower()}.lock")
+
+
+class ProgressFile:
+    """
+    Progress callback for create_cluster that writes what it's doing to path.
+    Called as progress(stage, done, total), e.g. ("clustering", 3, 12).
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, stage, done=0, total=0, **extra):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        progress = dict(extra, stage=stage, done=done, total=total, updated=time.time())
+
+        def write(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump(progress, f)
+        # Swapped in whole, so the dashboard never reads half a file
+        atomic_write(self.path, write)
+
+
+def read_progress(app_name):
+    try:
+        with open(progress_path(app_name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _run_cluster_job(app_name):
+    progress = ProgressFile(progress_path(app_name))
+    try:
+        # Only the worker pays for importing the ML libraries
+        from review_clustering import create_cluster
+        create_cluster(app_name, progress=progress)
+    except Exception as e:
+        progress("failed", error=f"{type(e).__name__}: {e}")
+        raise
+
+
+class ClusterJobs:
+    """
+    Background create_cluster runs, by app name. Only one runs at a time (clustering already
+    keeps the CPU busy), the rest wait in line. The line moves along whenever start, status
+    or busy is called, the dashboard polls often enough for that. An app whose job another
+    process is running stays in line until that one's done, and is done then if it left the
+    cluster files behind.
+    """
+
+    def __init__(self):
+        self._queue = []
+        self._running = None  # (app_name, process, lock file)
+        self._finished = {}  # app_name -> final status
+        self._lock = threading.Lock()
+
+    def start(self, app_name):
+        """
+        Queues create_cluster for app_name, unless it's already queued or running.
+        """
+        with self._lock:
+            if app_name in self._queue or (self._running and self._running[0] == app_name):
+                return
+            self._finished.pop(app_name, None)
+            print(f"Generating clusters for {app_name} in the background...")
+            self._queue.append(app_name)
+            self._advance()
+
+    def status(self, app_name):
+        """
+        Where app_name's job is, as a dict with "state" being one of:
+            None      - no job was started for it (or it was forgotten)
+            "queued"  - waiting for another app's job, or another process's job for it, to finish
+            "running" - with "stage", "done" and "total" from its progress file
+            "done"    - finished, the cluster files are there
+            "failed"  - with "error", also when the worker exited fine but the files aren't there
+        """
+        with self._lock:
+            self._advance()
+            if app_name in self._finished:
+                return dict(self._finished[app_name])
+            if app_name in self._queue:
+                return {"state": "queued"}
+            if self._running and self._running[0] == app_name:
+                progress = read_progress(app_name) or {"stage": "loading", "done": 0, "total": 0}
+                return dict(progress, state="running")
+            return {"state": None}
+
+    def busy(self):
+        """
+        Whether any job is still queued or running.
+        """
+        with self._lock:
+            self._advance()
+            return self._running is not None or bool(self._queue)
+
+    def forget(self, app_name):
+        """
+        Drops a finished job's status, once whoever was waiting on it has seen it.
+        """
+        with self._lock:
+            self._finished.pop(app_name, None)
+
+    def shutdown(self):
+        """
+        Cancels the queued jobs and stops the running one.
+        """
+        with self._lock:
+            self._queue.clear()
+            if self._running is not None:
+                _, process, lock = self._running
+                process.terminate()
+                process.join()
+                lock.close()
+                self._running = None
+
+    def _advance(self):
+        # Callers hold the lock
+        if self._running is not None:
+            app_name, process, lock = self._running
+            if process.is_alive():
+                return
+            process.join()
+            lock.close()
+            if process.exitcode == 0 and has_clusters(app_name):
+                self._finished[app_name] = {"state": "done"}
+            elif process.exitcode == 0:
+                # Reporting done would only get the app reloaded without clusters and queued again
+                self._finished[app_name] = {"state": "failed", "error": "no cluster files were written"}
+            else:
+                error = (read_progress(app_name) or {}).get("error") or f"worker exited with code {process.exitcode}"
+                self._finished[app_name] = {"state": "failed", "error": error}
+            self._running = None
+
+        os.makedirs(JOB_DIR, exist_ok=True)
+        for app_name in list(self._queue):
+            lock = try_lock(lock_path(app_name))
+            if lock is None:
+                # Another process is generating this app's clusters, wait for it
+                continue
+            self._queue.remove(app_name)
+            if has_clusters(app_name):
+                # Which it has finished doing
+                lock.close()
+                self._finished[app_name] = {"state": "done"}
+                continue
+            # Whatever an earlier run left behind would look like progress
+            if os.path.exists(progress_path(app_name)):
+                os.remove(progress_path(app_name))
+            process = multiprocessing.Process(target=_run_cluster_job, args=(app_name,), name=f"cluster-{app_name}")
+            process.start()
+            self._running = (app_name, process, lock)
+            return
+
+
+def describe(status):
+    """
+    One line about a job for the dashboard, e.g. "Clustering reviews: 3 of 12 versions".
+    """
+    state = status["state"]
+    if state == "queued":
+        return "Clusters will be generated once the run already going is done..."
+    if state == "failed":
+        return f"Generating clusters failed ({status['error']})."
+    if state == "done":
+        return "Clusters ready."
+    if state != "running":
+        return ""
+    stage, done, total = status["stage"], status["done"], status["total"]
+    if stage == "embedding" and total:
+        return f"Generating clusters - embedding reviews: {done:,} of {total:,} new texts"
+    if stage == "clustering" and total:
+        return f"Generating clusters - clustering: {done} of {total} versions"
+    return f"Generating clusters - {stage}..."
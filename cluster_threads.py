@@ -0,0 +1,180 @@
+"""
+Links each version's clusters to the same issue in the next version, by where they sit in
+embedding space, without embedding or clustering anything again.
+
+create_cluster saves every cluster's centroid (its reviews' mean embedding) and size next to
+the cluster summary, in Clusters/<app>_centroids.npz, one row per summary row in the same order:
+    version  - the cluster's version, as a string
+    cluster  - its HDBSCAN cluster id within that version
+    size     - how many reviews it has
+    centroid - float32 matrix, one centroid per row
+
+link_clusters compares every cluster with the clusters of the next version that has any,
+by cosine similarity of their centroids (one matrix product per pair of versions), and links
+pairs that are each other's best match above a threshold. Following the links from version
+to version gives threads: "login fails" in 5.16 -> "login fails" in 5.17 -> ...
+
+Usage:
+    python cluster_threads.py <app_name> [--threshold 0.8] [--min-length 3]
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from atomic_files import atomic_write
+from config import CLUSTER_FILES
+from versioning import release_order_key
+
+# How similar two clusters' centroids have to be (cosine) for them to count as the same issue
+LINK_THRESHOLD = 0.8
+# Threads shorter than this many versions aren't drawn on the timeline
+MIN_THREAD_LENGTH = 3
+
+
+def centroid_path(app_name):
+    return CLUSTER_FILES[f"{app_name.lower()}_centroids"]
+
+
+def cluster_centroids(embeddings, labels, cluster_ids, weights=None):
+    """
+    The mean embedding of the rows labeled with each of cluster_ids, as a float32 matrix.
+    weights is how many reviews each row stands for (see dedup), one each by default.
+    """
+    centroids = np.empty((len(cluster_ids), embeddings.shape[1]), dtype=np.float32)
+    for i, cluster_id in enumerate(cluster_ids):
+        rows = labels == cluster_id
+        if weights is None:
+            centroids[i] = np.asarray(embeddings[rows], dtype=np.float32).mean(axis=0)
+        else:
+            centroids[i] = np.average(np.asarray(embeddings[rows], dtype=np.float32), axis=0, weights=weights[rows])
+    return centroids
+
+
+def save_centroids(path, versions, cluster_ids, sizes, centroids):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    arrays = dict(
+        version=np.array([str(v) for v in versions], dtype=str),
+        cluster=np.asarray(cluster_ids, dtype=np.int64),
+        size=np.asarray(sizes, dtype=np.int64),
+        centroid=np.asarray(centroids, dtype=np.float32).reshape(len(versions), -1),
+    )
+    # np.savez adds .npz to names that don't have it, so the temp name keeps it on the end
+    atomic_write(path, lambda tmp_path: np.savez(tmp_path, **arrays), suffix=".tmp.npz")
+
+
+def load_centroids(path):
+    """
+    The centroid store at path as a dict of arrays, or None if there isn't a readable one.
+    """
+    try:
+        with np.load(path) as store:
+            return {name: store[name] for name in ("version", "cluster", "size", "centroid")}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def link_clusters(versions, centroids, threshold=LINK_THRESHOLD):
+    """
+    Links between clusters of consecutive versions (in release order, skipping versions
+    without clusters). versions and centroids have one entry per cluster.
+    Returns (from rows, to rows, similarities), each link going from a cluster to the
+    matching cluster of the next version.
+    """
+    versions = np.asarray(versions, dtype=object)
+    centroids = np.asarray(centroids, dtype=np.float32)
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    unit = centroids / np.where(norms == 0, 1, norms)
+
+    ordered = sorted(set(versions.tolist()), key=release_order_key)
+    rows = {version: np.flatnonzero(versions == version) for version in ordered}
+
+    sources, targets, similarities = [], [], []
+    for before, after in zip(ordered, ordered[1:]):
+        a, b = rows[before], rows[after]
+        similarity = unit[a] @ unit[b].T
+        # Mutual best matches only, so each cluster links to at most one cluster each way
+        best_b = similarity.argmax(axis=1)
+        best_a = similarity.argmax(axis=0)
+        mutual = best_a[best_b] == np.arange(len(a))
+        scores = similarity[np.arange(len(a)), best_b]
+        keep = mutual & (scores >= threshold)
+        sources.append(a[keep])
+        targets.append(b[best_b[keep]])
+        similarities.append(scores[keep])
+
+    if not sources:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return np.concatenate(sources), np.concatenate(targets), np.concatenate(similarities)
+
+
+def thread_ids(num_clusters, sources, targets):
+    """
+    Which thread each cluster is in, numbered by the thread's first cluster.
+    Every cluster links to at most one in the next version, so threads are simple chains.
+    """
+    thread = np.arange(num_clusters)
+    following = np.full(num_clusters, -1)
+    following[sources] = targets
+    # Start from the clusters nothing links to, and walk each chain forwards
+    starts = np.setdiff1d(np.arange(num_clusters), targets)
+    for start in starts:
+        row = following[start]
+        while row != -1:
+            thread[row] = start
+            row = following[row]
+    return thread
+
+
+def cluster_threads(app_name, threshold=LINK_THRESHOLD, min_length=MIN_THREAD_LENGTH, summary_rows=None):
+    """
+    The app's threads of at least min_length clusters, as a DataFrame with a row per cluster
+    in them: row (in the centroid store and cluster summary), thread, version, cluster, size
+    and similarity (to the cluster before it), in release order within each thread.
+    None if the app has no centroid store, or it has a different number of rows than
+    summary_rows (when given), so it isn't from the same run as the summary.
+    """
+    store = load_centroids(centroid_path(app_name))
+    if store is None or (summary_rows is not None and len(store["version"]) != summary_rows):
+        return None
+    sources, targets, similarities = link_clusters(store["version"], store["centroid"], threshold)
+    threads = pd.DataFrame({
+        "row": np.arange(len(store["version"])),
+        "thread": thread_ids(len(store["version"]), sources, targets),
+        "version": store["version"],
+        "cluster": store["cluster"],
+        "size": store["size"],
+        "similarity": np.nan,
+    })
+    threads.loc[targets, "similarity"] = similarities
+    lengths = threads["thread"].map(threads["thread"].value_counts())
+    threads = threads[lengths >= min_length]
+    order = sorted(range(len(threads)), key=lambda i: (threads["thread"].iloc[i], release_order_key(threads["version"].iloc[i])))
+    return threads.iloc[order].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List the issues that keep coming up in an app\'s reviews, version after version.')
+    parser.add_argument('app_name', type=str, help='Name of the app (e.g., Zoom, Webex, Firefox)')
+    parser.add_argument('--threshold', type=float, default=LINK_THRESHOLD,
+                        help=f'Centroid cosine similarity two clusters need to be linked (default: {LINK_THRESHOLD})')
+    parser.add_argument('--min-length', type=int, default=MIN_THREAD_LENGTH,
+                        help=f'Only show threads through at least this many versions (default: {MIN_THREAD_LENGTH})')
+    args = parser.parse_args()
+
+    app_name = args.app_name.lower()
+    summary = pd.read_csv(CLUSTER_FILES[f"{app_name}_summary"], dtype={"version": str})
+    threads = cluster_threads(app_name, args.threshold, args.min_length, summary_rows=len(summary))
+    if threads is None:
+        print(f"No centroids saved with the current clusters of {app_name}, run review_clustering.py {app_name} first")
+        return
+    print(f"{threads['thread'].nunique()} threads through at least {args.min_length} versions")
+    for _, thread in threads.groupby("thread", sort=False):
+        print()
+        for _, cluster in thread.iterrows():
+            row = summary.iloc[cluster["row"]]
+            link = "" if np.isnan(cluster["similarity"]) else f" ({cluster['similarity']:.2f})"
+            print(f"  {cluster['version']}{link}: {row['cluster_label']} - {row['num_reviews']} reviews, avg {row['avg_score']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
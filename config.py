@@ -19,6 +19,14 @@ CLUSTER_FILES = {
     "webex_clustered_reviews": "Clusters/Webex_clustered_reviews_output.csv",
     "zoom_summary": "Clusters/Zoom_cluster_summary.csv",
     "zoom_clustered_reviews": "Clusters/Zoom_clustered_reviews_output.csv",
+    # Per version review fingerprints and settings from the last run (see create_cluster)
+    "firefox_manifest": "Clusters/Firefox_manifest.json",
+    "webex_manifest": "Clusters/Webex_manifest.json",
+    "zoom_manifest": "Clusters/Zoom_manifest.json",
+    # Cluster centroids and sizes, a row per summary row (see cluster_threads)
+    "firefox_centroids": "Clusters/Firefox_centroids.npz",
+    "webex_centroids": "Clusters/Webex_centroids.npz",
+    "zoom_centroids": "Clusters/Zoom_centroids.npz",
 }
 
 # Common column names
@@ -36,3 +44,15 @@ PATCH_COLUMNS = {
     "Version": "Release Version", # Version the Company made for this releae
     "Description": "Feature Description",
 }
+
+# Caches
+# Generated files that only exist to make later runs faster, safe to delete at any time
+CACHE_DIR = "Cache"
+EMBEDDING_CACHE_DIR = f"{CACHE_DIR}/embeddings"
+INGEST_CACHE_DIR = f"{CACHE_DIR}/ingest"
+FIGURE_CACHE_DIR = f"{CACHE_DIR}/figures"
+SEARCH_INDEX_DIR = f"{CACHE_DIR}/search"
+JOB_DIR = f"{CACHE_DIR}/jobs"
+REVIEW_AGGREGATE_DIR = f"{CACHE_DIR}/aggregates"
+NLTK_DATA_DIR = f"{CACHE_DIR}/nltk_data"
+EMBEDDING_CACHE_MAX_ENTRIES = 1_000_000 # ~1.5GB of float32 MiniLM vectors
@@ -0,0 +1,165 @@
+"""
+Finds reviews that are the same text, or nearly (copy pasted complaints, template reviews
+with a word changed), so each group only gets embedded and clustered once.
+
+Exact copies are found by their cleaned text. The distinct texts are then compared by MinHash:
+each text is cut into character SHINGLE_LENGTH-grams, and NUM_PERM hash functions each keep
+the smallest hash of any of its shingles. Two texts agree on a hash about as often as their
+shingle sets overlap (Jaccard similarity). Signatures are split into BANDS bands, and texts
+that match on a whole band are candidates (LSH), so nothing is compared all against all.
+
+Texts are grouped leader first: in order, each text joins the earlier group leader that it
+shares a band with and is most similar to, as long as their actual shingle sets are at least
+threshold similar, otherwise it leads a group of its own. Every text is that similar to the
+representative it's grouped under, similarity never chains through other members.
+
+Everything is hashed with fixed seeds, so the same texts always group the same way.
+"""
+import numpy as np
+import pandas as pd
+
+# How similar (estimated Jaccard over character shingles) two texts have to be to count as one
+NEAR_DUPLICATE_THRESHOLD = 0.8
+SHINGLE_LENGTH = 5
+NUM_PERM = 128
+BANDS = 16
+# How far under threshold a signature's agreement can be and still get its shingles compared,
+# the estimate is off by about 0.04 at NUM_PERM hashes
+SIGNATURE_SLACK = 0.15
+# Shingles hashed at a time, small enough that each (shingles, NUM_PERM) block stays in cache
+SHINGLE_BLOCK = 1 << 14
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _perms(seed=0):
+    rng = np.random.default_rng(seed)
+    # a * x + b wraps around at 2**32, which shuffles every 32 bit value as long as a is odd
+    a = rng.integers(1, 1 << 32, size=NUM_PERM, dtype=np.uint64).astype(np.uint32) | np.uint32(1)
+    b = rng.integers(0, 1 << 32, size=NUM_PERM, dtype=np.uint64).astype(np.uint32)
+    return a, b
+
+
+def shingle_hashes(texts):
+    """
+    A 32 bit hash of every character shingle of every text, and which text each belongs to
+    (texts in order, each one's shingles together). Texts shorter than a shingle are one shingle.
+    """
+    texts = [text.ljust(SHINGLE_LENGTH) for text in texts]
+    lengths = np.array([len(text) for text in texts], dtype=np.int64)
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+
+    # Polynomial hash of every SHINGLE_LENGTH characters, worked out for the whole string at once
+    total = len(codes) - SHINGLE_LENGTH + 1
+    hashes = np.zeros(max(total, 0), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for offset in range(SHINGLE_LENGTH):
+            hashes = hashes * _MIX + codes[offset:offset + total]
+        hashes ^= hashes >> np.uint64(29)
+        hashes *= _MIX
+    hashes = (hashes >> np.uint64(32)).astype(np.uint32)
+
+    # Only keep the shingles that start and end inside one text
+    counts = lengths - SHINGLE_LENGTH + 1
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    owner = np.repeat(np.arange(len(texts)), counts)
+    first_shingle = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    positions = starts[owner] + np.arange(counts.sum()) - first_shingle[owner]
+    return hashes[positions], owner
+
+
+def minhash_signatures(texts, seed=0):
+    """
+    (len(texts), NUM_PERM) uint32 matrix, each text's smallest value of each hash function.
+    """
+    if not len(texts):
+        return np.empty((0, NUM_PERM), dtype=np.uint32)
+    hashes, owner = shingle_hashes(texts)
+    a, b = _perms(seed)
+    signatures = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    text_starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+    # Blocks of whole texts, so reduceat never has to join a text across blocks
+    block_ends = np.searchsorted(text_starts, np.arange(SHINGLE_BLOCK, len(hashes), SHINGLE_BLOCK), side="right")
+    bounds = np.unique(np.r_[0, block_ends, len(text_starts)])
+    with np.errstate(over="ignore"):
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            stop = text_starts[last] if last < len(text_starts) else len(hashes)
+            block = hashes[text_starts[first]:stop]
+            # One row per hash function, so reduceat runs along contiguous memory
+            values = a[:, None] * block[None, :] + b[:, None]
+            signatures[first:last] = np.minimum.reduceat(values, text_starts[first:last] - text_starts[first], axis=1).T
+    return signatures
+
+
+def jaccard(a, b):
+    """
+    Jaccard similarity of two sorted arrays of distinct shingle hashes.
+    """
+    overlap = len(np.intersect1d(a, b, assume_unique=True))
+    return overlap / (len(a) + len(b) - overlap)
+
+
+def leader_groups(texts, threshold=NEAR_DUPLICATE_THRESHOLD, seed=0):
+    """
+    Group number of each of texts (distinct strings), see the top of the file. Each group is
+    numbered by its leader's position among the leaders.
+    """
+    hashes, owner = shingle_hashes(texts)
+    starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+    shingles = [np.unique(part) for part in np.split(hashes, starts[1:])]
+    signatures = minhash_signatures(texts, seed)
+
+    rows = NUM_PERM // BANDS
+    band_keys = np.zeros((len(texts), BANDS), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for band in range(BANDS):
+            keys = signatures[:, band * rows].astype(np.uint64)
+            for column in range(band * rows + 1, (band + 1) * rows):
+                keys = keys * _MIX + signatures[:, column]
+            band_keys[:, band] = keys
+
+    # For each band, the leaders with each key
+    buckets = [{} for _ in range(BANDS)]
+    groups = np.empty(len(texts), dtype=np.int64)
+    leaders = np.empty(len(texts), dtype=np.int64)
+    num_leaders = 0
+    for i, keys in enumerate(band_keys.tolist()):
+        candidates = set()
+        for band, key in enumerate(keys):
+            candidates.update(buckets[band].get(key, ()))
+        best, best_similarity = None, 0.0
+        if candidates:
+            candidates = np.array(sorted(candidates))
+            # Only the ones whose signatures come close get their shingles compared
+            agreement = (signatures[leaders[candidates]] == signatures[i]).mean(axis=1)
+            for leader in candidates[agreement >= threshold - SIGNATURE_SLACK]:
+                similarity = jaccard(shingles[i], shingles[leaders[leader]])
+                # The most similar one, the earliest if it's a tie
+                if similarity > best_similarity:
+                    best, best_similarity = leader, similarity
+        if best is not None and best_similarity >= threshold:
+            groups[i] = best
+            continue
+        groups[i] = num_leaders
+        for band, key in enumerate(keys):
+            buckets[band].setdefault(key, []).append(num_leaders)
+        leaders[num_leaders] = i
+        num_leaders += 1
+    return groups
+
+
+def duplicate_groups(texts, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Which group of copies each of texts (a Series) is in. Returns (groups, representatives):
+    groups has the group number of every text, numbered in order of first appearance, and
+    representatives the position of each group's first text, which every text in the group
+    is at least threshold similar to. threshold None only groups texts that are exactly the same.
+    """
+    codes, uniques = pd.factorize(texts.astype(object), use_na_sentinel=False)
+    unique_group = np.arange(len(uniques))
+    if threshold is not None and len(uniques) > 1:
+        unique_group = leader_groups([str(text) for text in uniques], threshold)
+
+    groups, _ = pd.factorize(unique_group[codes])
+    representatives = np.unique(groups, return_index=True)[1]
+    return groups, representatives
@@ -0,0 +1,146 @@
+"""
+Ways of turning review text into embeddings on the CPU.
+
+Every backend has the same interface:
+    backend.cache_name   - identifies the vectors it makes, for the embedding cache and manifests
+    backend.encode(texts) - float32 matrix with one row per text
+
+    torch     - SentenceTransformer in float32 PyTorch, what create_cluster always used
+    quantized - the same model with its Linear layers dynamically quantized to int8
+    onnx      - the model's ONNX export run through onnxruntime (optionally a quantized export)
+
+The ML libraries are only imported when a backend first encodes something.
+"""
+import numpy as np
+
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+DEFAULT_BATCH_SIZE = 64
+
+
+class SentenceTransformerBackend:
+    """
+    Plain SentenceTransformer in float32 PyTorch.
+
+    batch_size     - texts per forward pass
+    sort_by_length - sort every text by its real token count before batching, so each batch
+                     holds texts of about the same length and wastes little time on padding.
+                     (SentenceTransformer only sorts by character count, and only within one call.)
+    num_threads    - CPU threads for the model, None leaves the library default
+    """
+    name = "torch"
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=DEFAULT_BATCH_SIZE, sort_by_length=True,
+                 num_threads=None, show_progress_bar=True):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        self.num_threads = num_threads
+        self.show_progress_bar = show_progress_bar
+        self._model = None
+
+    @property
+    def cache_name(self):
+        # Float32 torch vectors are the originals, so they keep the bare model name
+        return self.model_name
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self.load_model()
+        return self._model
+
+    def load_model(self):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        return SentenceTransformer(self.model_name, device='cpu')
+
+    def token_lengths(self, texts):
+        tokenizer = self.model.tokenizer
+        encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=self.model.max_seq_length)
+        return np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64, count=len(texts))
+
+    def encode(self, texts):
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        if not self.sort_by_length:
+            return self._encode(texts)
+
+        # Longest first, same as SentenceTransformer, so a batch that's too big fails right away
+        order = np.argsort(-self.token_lengths(texts), kind='stable')
+        embeddings = self._encode([texts[i] for i in order])
+        # Put the rows back in the order the texts came in
+        result = np.empty_like(embeddings)
+        result[order] = embeddings
+        return result
+
+    def _encode(self, texts):
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            show_progress_bar=self.show_progress_bar,
+            convert_to_numpy=True,
+        )
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class QuantizedTorchBackend(SentenceTransformerBackend):
+    """
+    SentenceTransformer with its Linear layers dynamically quantized to int8.
+    Faster on most CPUs, and the vectors are close to (but not exactly) the float32 ones.
+    """
+    name = "quantized"
+
+    @property
+    def cache_name(self):
+        return f"{self.model_name}+qint8"
+
+    def load_model(self):
+        import torch
+        model = super().load_model()
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxBackend(SentenceTransformerBackend):
+    """
+    The model's ONNX export run with onnxruntime, needs sentence-transformers[onnx].
+    onnx_file picks which export in the model repo to use, e.g. "onnx/model_quint8_avx2.onnx"
+    for an int8 quantized one.
+    """
+    name = "onnx"
+
+    def __init__(self, *args, onnx_file="onnx/model.onnx", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.onnx_file = onnx_file
+
+    @property
+    def cache_name(self):
+        return f"{self.model_name}+{self.onnx_file}"
+
+    def load_model(self):
+        from sentence_transformers import SentenceTransformer
+        model_kwargs = {"file_name": self.onnx_file, "provider": "CPUExecutionProvider"}
+        if self.num_threads:
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = self.num_threads
+            model_kwargs["session_options"] = session_options
+        return SentenceTransformer(self.model_name, device='cpu', backend='onnx', model_kwargs=model_kwargs)
+
+
+BACKENDS = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    QuantizedTorchBackend.name: QuantizedTorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def get_backend(name="torch", **kwargs):
+    """
+    Builds the backend called name, passing kwargs to its constructor.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {name!r}, expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import re
+import numpy as np
+from atomic_files import atomic_write, locked, write_text
+from config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_ENTRIES
+
+
+class EmbeddingCache:
+    """
+    On-disk store of sentence embeddings so reviews only get encoded once.
+
+    Entries are keyed by a hash of the model name plus the cleaned review text, so the
+    same text always maps to the same vector no matter which app or run it came from.
+    Each model gets its own folder holding:
+        keys.npy      - hex digests, one per row
+        vectors.npy   - float32 matrix of embeddings, one row per key
+        last_used.npy - the run ("generation") each row was last read or written in
+        meta.json     - model name, vector size and the current generation
+        lock          - held while the files are read or written, so another process
+                        saving the same cache never leaves us keys and vectors that don't match
+
+    The store is capped at max_entries rows. When it grows past that, save() keeps the
+    most recently used rows and rewrites the files, which also compacts them.
+    """
+
+    def __init__(self, model_name, cache_dir=EMBEDDING_CACHE_DIR, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        # Folder names can't have slashes, and model names like "sentence-transformers/x" do
+        self.path = os.path.join(cache_dir, re.sub(r'[^\w.-]+', '_', model_name))
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._keys = np.empty(0, dtype='S40')
+        self._vectors = None
+        self._last_used = np.empty(0, dtype=np.int64)
+        self._index = {}
+        self._dirty = False
+        # Whether the vectors changed (not just last_used), vectors.npy is only rewritten if so
+        self._vectors_dirty = False
+        # Which vectors.npy ours came from, to tell if another process has replaced it since
+        self._vectors_stamp = None
+        self.load()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def key(self, text):
+        """
+        Content address for a piece of text under this cache's model.
+        """
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest().encode('ascii')
+
+    def _stamp(self):
+        stat = os.stat(os.path.join(self.path, "vectors.npy"))
+        return stat.st_ino, stat.st_mtime_ns
+
+    def load(self):
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.exists(meta_path):
+            return
+        try:
+            with locked(os.path.join(self.path, "lock")):
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                keys = np.load(os.path.join(self.path, "keys.npy"))
+                # Memory mapped, only the rows we actually look up get read in
+                vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode='r')
+                last_used = np.load(os.path.join(self.path, "last_used.npy"))
+                stamp = self._stamp()
+        except (OSError, ValueError) as e:
+            # A half written or corrupt cache just means we encode everything again
+            print(f"Ignoring unreadable embedding cache at {self.path}: {e}")
+            return
+        if meta.get("model") != self.model_name or not (len(keys) == len(vectors) == len(last_used)):
+            print(f"Ignoring mismatched embedding cache at {self.path}")
+            return
+
+        self._keys = keys
+        self._vectors = vectors
+        self._last_used = last_used
+        self._index = {k: i for i, k in enumerate(keys.tolist())}
+        self.generation = meta.get("generation", 0)
+        self._vectors_stamp = stamp
+
+    def _lookup(self, texts, encoder):
+        """
+        Makes sure every text is in the cache, encoding the missing ones (deduplicated)
+        with encoder, which takes a list of strings and returns an array of embeddings.
+        Returns the cache row of each text.
+        """
+        self.generation += 1
+        keys = [self.key(t) for t in texts]
+
+        missing = {}
+        for text, k in zip(texts, keys):
+            if k not in self._index and k not in missing:
+                missing[k] = text
+
+        self.misses = len(missing)
+        self.hits = len(texts) - sum(1 for k in keys if k in missing)
+        print(f"Embedding cache: {self.hits} hits, {self.misses} misses ({len(self)} cached)")
+
+        if missing:
+            new_vectors = np.asarray(encoder(list(missing.values())), dtype=np.float32)
+            self._append(list(missing.keys()), new_vectors)
+
+        rows = np.fromiter((self._index[k] for k in keys), dtype=np.int64, count=len(keys))
+        self._last_used[rows] = self.generation
+        if len(rows):
+            self._dirty = True
+        return rows
+
+    def add(self, texts, encoder):
+        """
+        Makes sure every text is in the cache, encoding the missing ones with encoder in one go.
+        Returns how many had to be encoded.
+        """
+        self._lookup(texts, encoder)
+        return self.misses
+
+    def encode(self, texts, encoder):
+        """
+        Returns a float32 matrix with one embedding per text, in the same order.
+        Only texts missing from the cache get passed to encoder.
+        """
+        rows = self._lookup(texts, encoder)
+        if len(rows):
+            return self._vectors[rows]
+        return np.empty((0, self._dim()), dtype=np.float32)
+
+    def encode_to_file(self, texts, encoder, path, dtype=np.float32, block_size=65536):
+        """
+        Like encode, but writes the matrix straight into a .npy file at path, a block of rows
+        at a time, and returns it memory mapped read only. The whole matrix is never in memory.
+        Returns None if there are no texts.
+        """
+        rows = self._lookup(texts, encoder)
+        if not len(rows):
+            return None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(len(rows), self._dim()))
+        for start in range(0, len(rows), block_size):
+            out[start:start + block_size] = self._vectors[rows[start:start + block_size]]
+        out.flush()
+        del out
+        return np.load(path, mmap_mode='r')
+
+    def _dim(self):
+        return self._vectors.shape[1] if self._vectors is not None else 0
+
+    def _append(self, keys, vectors):
+        start = len(self._keys)
+        self._keys = np.concatenate([self._keys, np.array(keys, dtype='S40')])
+        if self._vectors is None:
+            self._vectors = vectors
+        else:
+            self._vectors = np.concatenate([self._vectors, vectors])
+        self._last_used = np.concatenate([self._last_used, np.full(len(keys), self.generation, dtype=np.int64)])
+        for i, k in enumerate(keys):
+            self._index[k] = start + i
+        self._dirty = True
+        self._vectors_dirty = True
+
+    def evict(self):
+        """
+        Drops the least recently used rows until the cache fits in max_entries.
+        Returns how many rows were dropped.
+        """
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return 0
+        # Stable sort so that among rows from the same run, older rows go first
+        order = np.argsort(-self._last_used, kind='stable')
+        keep = np.sort(order[:self.max_entries])
+        self._keys = self._keys[keep]
+        self._vectors = self._vectors[keep]
+        self._last_used = self._last_used[keep]
+        self._index = {k: i for i, k in enumerate(self._keys.tolist())}
+        self._dirty = True
+        self._vectors_dirty = True
+        print(f"Embedding cache: evicted {excess} least recently used entries")
+        return excess
+
+    def save(self):
+        """
+        Writes the cache back to disk, evicting first if it is over its size cap.
+        Every file is written to a temp name then swapped in so a crash mid-save
+        can't leave a mix of old and new files behind. If another process saved the
+        same cache since we loaded it, ours replaces it whole.
+        """
+        self.evict()
+        if not self._dirty or self._vectors is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+
+        with locked(os.path.join(self.path, "lock")):
+            vectors_path = os.path.join(self.path, "vectors.npy")
+            if not os.path.exists(vectors_path) or self._stamp() != self._vectors_stamp:
+                self._vectors_dirty = True
+            arrays = {"keys": self._keys, "last_used": self._last_used}
+            if self._vectors_dirty:
+                arrays["vectors"] = self._vectors
+            for name, array in arrays.items():
+                atomic_write(os.path.join(self.path, f"{name}.npy"),
+                             lambda tmp_path: np.save(tmp_path, array), suffix=".tmp.npy")
+
+            meta = {"model": self.model_name, "dim": self._dim(), "generation": self.generation, "entries": len(self)}
+            write_text(os.path.join(self.path, "meta.json"), json.dumps(meta))
+            self._vectors_stamp = self._stamp()
+        self._dirty = False
+        self._vectors_dirty = False
@@ -0,0 +1,105 @@
+"""
+Prebuilt timeline figures, so the dashboard doesn't redo make_plot every time it starts.
+
+Each app gets three files in FIGURE_CACHE_DIR:
+    <app>_figure.json        - the finished Plotly figure, as JSON
+    <app>_aggregates.parquet - the per release numbers it was drawn from
+                               (feature count, average rating, review count)
+    <app>_figure_meta.json   - the size and mtime of every file the figure was built from
+
+The figure is only used while none of those files (releases, reviews, both cluster files,
+and the cluster centroids its issue threads come from) have changed, and it was built by the
+same FIGURE_FORMAT and Plotly version.
+"""
+import json
+import os
+import pandas as pd
+import plotly
+import plotly.graph_objs as go
+from atomic_files import atomic_write, remove_if_exists, write_text
+from config import CLUSTER_FILES, FIGURE_CACHE_DIR
+from ingest import file_stamp, release_path, review_path
+from cluster_threads import centroid_path
+
+# Bump this whenever make_plot draws the figure differently,
+# so old figures get rebuilt instead of shown
+FIGURE_FORMAT = 2
+
+
+def figure_sources(app_name):
+    """
+    The files an app's figure is built from.
+    """
+    app_name = app_name.lower()
+    return [
+        release_path(app_name),
+        review_path(app_name),
+        CLUSTER_FILES[f"{app_name}_summary"],
+        CLUSTER_FILES[f"{app_name}_clustered_reviews"],
+    ]
+
+
+def _figure_paths(app_name):
+    name = app_name.lower()
+    return (
+        os.path.join(FIGURE_CACHE_DIR, f"{name}_figure.json"),
+        os.path.join(FIGURE_CACHE_DIR, f"{name}_aggregates.parquet"),
+        os.path.join(FIGURE_CACHE_DIR, f"{name}_figure_meta.json"),
+    )
+
+
+def _stamps(app_name):
+    """
+    {path: [size, mtime_ns]} for every source file, or None if one is missing.
+    """
+    try:
+        stamps = {path: file_stamp(path) for path in figure_sources(app_name)}
+    except FileNotFoundError:
+        return None
+    # Clusters from before the centroid store just don't get threads, so it's allowed to be missing
+    centroids = centroid_path(app_name)
+    stamps[centroids] = file_stamp(centroids) if os.path.exists(centroids) else None
+    return stamps
+
+
+def load_figure(app_name):
+    """
+    Returns (figure, aggregates) from the cache, or None if there isn't an up to date one.
+    """
+    figure_path, aggregates_path, meta_path = _figure_paths(app_name)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (meta.get("format") != FIGURE_FORMAT or meta.get("plotly") != plotly.__version__
+            or meta.get("sources") != _stamps(app_name)):
+        return None
+
+    try:
+        with open(figure_path) as f:
+            figure = go.Figure(json.load(f))
+        aggregates = pd.read_parquet(aggregates_path)
+    except (OSError, ValueError) as e:
+        print(f"Rebuilding unreadable figure cache for {app_name}: {e}")
+        return None
+    return figure, aggregates
+
+
+def save_figure(app_name, fig, aggregates):
+    """
+    Caches a figure made by make_plot and the aggregates behind it.
+    """
+    figure_path, aggregates_path, meta_path = _figure_paths(app_name)
+    os.makedirs(FIGURE_CACHE_DIR, exist_ok=True)
+    # The meta file is what says the rest is up to date, so it goes first and comes back last,
+    # that way a half written cache never gets used
+    remove_if_exists(meta_path)
+
+    write_text(figure_path, fig.to_json())
+    atomic_write(aggregates_path, lambda tmp_path: aggregates.to_parquet(tmp_path, index=False))
+    write_text(meta_path, json.dumps({
+        "format": FIGURE_FORMAT,
+        "plotly": plotly.__version__,
+        "sources": _stamps(app_name),
+    }, indent=2))
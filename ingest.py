@@ -0,0 +1,248 @@
+import codecs
+import hashlib
+import json
+import os
+import sys
+import pandas as pd
+from pandas.api.types import union_categoricals
+from atomic_files import atomic_write, write_text
+from config import (
+    RELEASE_FILES, REVIEW_FILES, PATCH_COLUMNS, REVIEW_COLUMNS, INGEST_CACHE_DIR
+)
+from versioning import clean_versions, major_minor_versions, attribute_releases
+
+# Bump this whenever the cached columns or how they're built changes,
+# so old cache files get rebuilt instead of read
+INGEST_FORMAT = 3
+
+
+def review_path(app_name):
+    return REVIEW_FILES[f"{app_name.lower()}_reviews"]
+
+def release_path(app_name):
+    return RELEASE_FILES[f"{app_name.lower()}_releases"]
+
+
+def detect_encoding(path, chunk_size=1 << 20):
+    """
+    Our exports are mostly cp1252, but some have bytes that aren't valid in it.
+    Decoding the raw bytes is much cheaper than having pandas parse the whole file
+    just to hit an error partway through, so check that first and fall back to latin1.
+    """
+    decoder = codecs.getincrementaldecoder('cp1252')()
+    try:
+        with open(path, 'rb') as f:
+            while chunk := f.read(chunk_size):
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return 'latin1'
+    return 'cp1252'
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_paths(source_path):
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(INGEST_CACHE_DIR, f"{name}.parquet"), os.path.join(INGEST_CACHE_DIR, f"{name}.json")
+
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _read_cached(source_path, build, depends_on=(), **read_kwargs):
+    """
+    Returns the typed frame for source_path, building and caching it if needed.
+
+    The cache is trusted as long as the source file's size and mtime match what we saw
+    when we built it. If only the mtime moved (e.g. the file was copied or touched), the
+    content hash decides whether we really have to rebuild. depends_on are other files
+    build reads (like the releases Firefox reviews get attributed to), any change to
+    their size or mtime rebuilds the cache.
+    """
+    cache_path, meta_path = _cache_paths(source_path)
+    stat = os.stat(source_path)
+    depends = {path: file_stamp(path) for path in depends_on}
+
+    meta = None
+    if os.path.exists(meta_path) and os.path.exists(cache_path):
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+    if meta is not None and (meta.get("format") != INGEST_FORMAT or meta.get("size") != stat.st_size
+                             or meta.get("depends", {}) != depends):
+        meta = None
+
+    if meta is not None and meta.get("mtime_ns") != stat.st_mtime_ns:
+        if meta.get("sha256") == file_hash(source_path):
+            meta["mtime_ns"] = stat.st_mtime_ns
+            write_text(meta_path, json.dumps(meta, indent=2))
+        else:
+            meta = None
+
+    if meta is not None:
+        try:
+            return pd.read_parquet(cache_path)
+        except (OSError, ValueError) as e:
+            print(f"Rebuilding unreadable ingest cache {cache_path}: {e}")
+
+    print(f"Building ingest cache for {source_path}")
+    encoding = detect_encoding(source_path)
+    df = build(pd.read_csv(source_path, encoding=encoding, **read_kwargs))
+
+    # Object columns can hold a mix of types that parquet won't accept, store them as strings
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].astype("string")
+
+    os.makedirs(INGEST_CACHE_DIR, exist_ok=True)
+    atomic_write(cache_path, lambda tmp_path: df.to_parquet(tmp_path, index=False))
+    write_text(meta_path, json.dumps({
+        "format": INGEST_FORMAT,
+        "source": source_path,
+        "encoding": encoding,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_hash(source_path),
+        "depends": depends,
+    }, indent=2))
+    return df
+
+
+def load_releases(app_name, path=None):
+    """
+    Loads an app's release (feature) data with release dates parsed and a clean_version column.
+    Firefox releases don't have versions, so their clean_version is the release date.
+    """
+    date_col = PATCH_COLUMNS["Date"]
+    version_col = PATCH_COLUMNS["Version"]
+
+    def build(df):
+        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+        if app_name.lower() == "firefox" or version_col not in df.columns:
+            df["clean_version"] = df[date_col]
+        else:
+            df["clean_version"] = clean_versions(df[version_col], keep_na=True)
+        return df
+
+    # Versions have to stay strings, read_csv would otherwise turn "43.10" into 43.1
+    return _read_cached(path or release_path(app_name), build, dtype={version_col: str})
+
+
+def load_reviews(app_name, path=None):
+    """
+    Loads an app's reviews with review dates parsed and a clean_version column.
+    Zoom and Webex format their review versions differently so each gets its own cleaning.
+    Firefox reviews get attributed by date instead, their clean_version is the date of the
+    release before them (see versioning.attribute_releases).
+    """
+    date_col = REVIEW_COLUMNS["Date"]
+    version_col = REVIEW_COLUMNS["Version"]
+    depends_on = [release_path(app_name)] if app_name.lower() == "firefox" else []
+
+    def build(df):
+        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+        df["clean_version"] = review_versions(app_name, df)
+        return df
+
+    return _read_cached(path or review_path(app_name), build, depends_on=depends_on, dtype={version_col: str})
+
+
+def review_versions(app_name, reviews, releases=None):
+    """
+    The clean_version column for an app's reviews: the cleaned review version for Zoom and
+    Webex, the date of the release before each review for Firefox (releases is loaded if not given).
+    """
+    version_col = REVIEW_COLUMNS["Version"]
+    if app_name.lower() == "zoom":
+        return clean_versions(reviews[version_col])
+    if app_name.lower() == "webex":
+        return major_minor_versions(reviews[version_col])
+    if app_name.lower() == "firefox":
+        if releases is None:
+            releases = load_releases(app_name)
+        return attribute_releases(reviews[REVIEW_COLUMNS["Date"]], releases[PATCH_COLUMNS["Date"]])
+    return pd.Series(None, index=reviews.index, dtype=object)
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process so far in MB, or None where we can't tell (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def stream_reviews(app_name, prepare=None, chunksize=50_000, path=None):
+    """
+    Reads an app's reviews in chunks, keeping only the columns clustering needs with
+    compact dtypes (category versions, int8 scores, parsed dates). Each chunk gets a
+    clean_version column (see review_versions) and is then passed through prepare
+    (cleaning, filtering, etc.) before being kept, so the full unfiltered export is never in memory at once.
+    """
+    path = path or review_path(app_name)
+    encoding = detect_encoding(path)
+    date_col = REVIEW_COLUMNS["Date"]
+    version_col = REVIEW_COLUMNS["Version"]
+    rating_col = REVIEW_COLUMNS["Rating"]
+
+    header = pd.read_csv(path, encoding=encoding, nrows=0).columns
+    # reviewId isn't used for clustering, but it's what tells rows apart when we need to
+    wanted = [rating_col, date_col, version_col, REVIEW_COLUMNS["Description"], "reviewId"]
+    usecols = [col for col in wanted if col in header]
+
+    releases = load_releases(app_name) if app_name.lower() == "firefox" else None
+
+    reader = pd.read_csv(
+        path,
+        encoding=encoding,
+        usecols=usecols,
+        # Nullable Int8 so a missing score doesn't blow up the read, narrowed to int8 below
+        dtype={version_col: "category", rating_col: "Int8"},
+        parse_dates=[date_col],
+        chunksize=chunksize,
+    )
+
+    chunks = []
+    rows_read = 0
+    for chunk in reader:
+        rows_read += len(chunk)
+        chunk[date_col] = pd.to_datetime(chunk[date_col], errors='coerce')
+        chunk["clean_version"] = review_versions(app_name, chunk, releases)
+        if app_name.lower() != "firefox":
+            chunk["clean_version"] = chunk["clean_version"].astype("category")
+        if prepare is not None:
+            chunk = prepare(chunk)
+        if not chunk[rating_col].hasnans:
+            chunk[rating_col] = chunk[rating_col].astype("int8")
+        chunks.append(chunk)
+
+    if not chunks:
+        return pd.read_csv(path, encoding=encoding, usecols=usecols, nrows=0)
+
+    # Each chunk has its own categories, line them up so concat keeps them as categoricals
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([c[col] for c in chunks], ignore_order=True).categories
+            for c in chunks:
+                c[col] = c[col].cat.set_categories(categories)
+
+    reviews = pd.concat(chunks)
+    peak = peak_rss_mb()
+    peak_text = f", peak RSS {peak:.0f} MB" if peak is not None else ""
+    print(f"Streamed {rows_read} reviews in {len(chunks)} chunks, kept {len(reviews)}{peak_text}")
+    return reviews
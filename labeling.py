@@ -0,0 +1,103 @@
+"""
+Names review clusters after the phrases that stand out in them.
+
+All of a version's clusters are labeled together: their texts are counted once against a
+single shared n-gram vocabulary, summed into one row per cluster with a sparse matrix
+product, and every cluster's top phrases are read off that. Two ways of picking them:
+
+    ctfidf - class-based TF-IDF: each cluster is treated as one big document, and a phrase
+             scores highly if it's common in that cluster but rare in the version's other
+             clusters. The top_k phrases are listed best first.
+    legacy - what a fresh TfidfVectorizer(max_features=top_k) fit on each cluster's texts
+             gives: the top_k most frequent phrases in the cluster (ties broken the same way
+             sklearn breaks them), in alphabetical order. Same labels as before this module.
+"""
+import numpy as np
+
+# scipy and sklearn are imported where they're used, like the other ML libraries
+
+LABEL_METHODS = ["ctfidf", "legacy"]
+
+
+def ngram_counts(texts, cluster_ids, ngram_range=(3, 4)):
+    """
+    Counts every n-gram in texts, per cluster.
+    Returns (clusters, counts, feature_names): the distinct cluster ids in sorted order, a
+    sparse int64 matrix with one row per cluster and one column per n-gram, and the
+    n-grams in alphabetical order (their column order). counts is None if no text has an n-gram.
+    """
+    import scipy.sparse as sp
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    clusters, rows = np.unique(np.asarray(cluster_ids), return_inverse=True)
+    # Same text processing the per cluster TfidfVectorizer used, so the n-grams are the same
+    vectorizer = CountVectorizer(ngram_range=tuple(ngram_range), strip_accents='unicode', stop_words='english')
+    try:
+        doc_terms = vectorizer.fit_transform(texts)
+    except ValueError:
+        # Every text was too short or all stop words
+        return clusters, None, np.array([], dtype=object)
+
+    membership = sp.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (rows, np.arange(len(rows)))),
+        shape=(len(clusters), len(rows)),
+    )
+    counts = (membership @ doc_terms).tocsr()
+    counts.sort_indices()
+    return clusters, counts, vectorizer.get_feature_names_out()
+
+
+def class_tfidf(counts):
+    """
+    Class-based TF-IDF of a cluster x n-gram count matrix (as in BERTopic):
+    each cluster's term frequencies, weighted by log(1 + average cluster size / n-gram frequency).
+    """
+    import scipy.sparse as sp
+
+    counts = counts.astype(np.float64)
+    cluster_sizes = np.asarray(counts.sum(axis=1)).ravel()
+    frequencies = np.asarray(counts.sum(axis=0)).ravel()
+    average_size = cluster_sizes.mean()
+    idf = np.log1p(average_size / frequencies)
+    tf = sp.diags(1 / np.where(cluster_sizes == 0, 1, cluster_sizes)) @ counts
+    return (tf @ sp.diags(idf)).tocsr()
+
+
+def _legacy_top_terms(columns, values, feature_names, top_k):
+    # Exactly what CountVectorizer._limit_features does with max_features: argsort of the
+    # negated counts of the cluster's own (alphabetical) vocabulary, so ties go the same way
+    if len(columns) > top_k:
+        columns = columns[(-values).argsort()[:top_k]]
+    return sorted(feature_names[columns])
+
+
+def _ctfidf_top_terms(columns, values, feature_names, top_k):
+    # Best score first, ties in alphabetical order
+    order = np.lexsort((columns, -values))[:top_k]
+    return list(feature_names[columns[order]])
+
+
+def cluster_labels(texts, cluster_ids, method="ctfidf", ngram_range=(3, 4), top_k=5):
+    """
+    A label for every cluster in cluster_ids (one id per text), in one pass over texts.
+    Returns {cluster id: label}, where a label is the cluster's top phrases joined with ", ",
+    or "" if none of its texts had any.
+    """
+    if method not in LABEL_METHODS:
+        raise ValueError(f"Unknown label method {method!r}, expected one of {', '.join(LABEL_METHODS)}")
+
+    clusters, counts, feature_names = ngram_counts(texts, cluster_ids, ngram_range)
+    if counts is None:
+        return {cluster_id: "" for cluster_id in clusters.tolist()}
+
+    if method == "legacy":
+        scores, top_terms = counts, _legacy_top_terms
+    else:
+        scores, top_terms = class_tfidf(counts), _ctfidf_top_terms
+
+    labels = {}
+    for row, cluster_id in enumerate(clusters.tolist()):
+        start, stop = scores.indptr[row], scores.indptr[row + 1]
+        columns, values = scores.indices[start:stop], scores.data[start:stop]
+        labels[cluster_id] = ", ".join(top_terms(columns, values, feature_names, top_k))
+    return labels
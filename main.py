@@ -1,105 +1,210 @@
-import re
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objs as go
 from packaging import version as packaging_version
-from review_clustering import create_cluster
+from ingest import load_releases
+from review_aggregates import review_ratings
+from versioning import clean_version, extract_major_minor, clean_versions
+from table_paging import query_table, page_records, page_count
+from app_cache import AppCache, frame_nbytes
+from figure_cache import load_figure, save_figure
+from timeline_view import TimelineView, DEFAULT_POINT_BUDGET
+from search_index import SearchIndex, group_by_version, format_version, DEFAULT_TOP_K
+from cluster_jobs import ClusterJobs, describe, has_clusters
+from cluster_threads import cluster_threads
 import numpy as np
-import os
 import argparse
 
 # Dash components for interactivity
+import dash
 from dash import dcc, html, dash_table, Dash
-from dash.dependencies import Input, Output
-from config import RELEASE_FILES, PATCH_COLUMNS, REVIEW_FILES, REVIEW_COLUMNS, CLUSTER_FILES
+from dash.dependencies import Input, Output, State
+from config import RELEASE_FILES, PATCH_COLUMNS, CLUSTER_FILES
+
+# Rows per page in the details table, and the review columns it shows for a cluster
+DETAILS_PAGE_SIZE = 10
+DETAIL_REVIEW_COLUMNS = ['score', 'content']
+# Review columns the search results show, after the similarity
+SEARCH_RESULT_COLUMNS = ['score', 'at', 'content']
+# How often the page checks on clusters being generated in the background, in ms
+PROGRESS_INTERVAL_MS = 2000
+
+# Every app we have release data for, e.g. "zoom"
+APP_NAMES = [key.removesuffix("_releases") for key in RELEASE_FILES]
+DEFAULT_MEMORY_BUDGET_MB = 2048
+
+class AppData:
+    """
+    Everything the dashboard keeps in memory for one app.
+    aggregates are the per release numbers the figure was drawn from.
+    view is the WebGL TimelineView of the figure, None when the dashboard isn't using WebGL.
+    """
+    def __init__(self, fig, aggregates, df_release, df_cluster, indexes, view=None):
+        self.fig = fig
+        self.aggregates = aggregates
+        self.df_release = df_release
+        self.df_cluster = df_cluster
+        self.indexes = indexes
+        self.view = view
+
+    def timeline_figure(self, relayout_data=None):
+        """
+        The figure to show, for the zoom in relayout_data if it's the WebGL view.
+        Returns dash.no_update if that zoom doesn't change anything.
+        """
+        if self.view is None:
+            return self.fig if relayout_data is None else dash.no_update
+        if relayout_data is None:
+            return self.view.figure()
+        x_range = self.view.parse_range(relayout_data)
+        if x_range is False:
+            return dash.no_update
+        return self.view.figure(x_range)
+
+    @property
+    def nbytes(self):
+        return frame_nbytes(self.aggregates, self.df_release, self.df_cluster)
 
 class TraceVisualizer:
-    def __init__(self, app_name="firefox"):
+    def __init__(self, app_name="firefox", apps=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+                 webgl=False, point_budget=DEFAULT_POINT_BUDGET, top_k=DEFAULT_TOP_K):
+        """
+        Serves the timelines of every app in apps (just app_name by default) from one Dash server.
+        app_name is the one shown first. Apps get loaded the first time they're picked and kept
+        in an LRU cache that drops the least recently used ones past memory_budget_mb.
+        With webgl, timelines are drawn with WebGL and only ever send point_budget markers to
+        the browser, merging releases and clusters until you zoom in (see timeline_view).
+        The search box looks through the app's search index (see search_index), shown top_k reviews at a time.
+        Apps without cluster files are shown without clusters right away, while the files get
+        generated in a background process (see cluster_jobs). The clusters show up once it's done.
+        """
         self.app_name = app_name
-        self.app = Dash(__name__)
-        self.fig, self.df_release, self.df_reviews, self.df_cluster = self.make_plot(app_name)
+        self.webgl = webgl
+        self.point_budget = point_budget
+        self.top_k = top_k
+        # Search indexes are only opened when an app is first searched, the vectors stay on disk
+        self.search_indexes = {}
+        self.jobs = ClusterJobs()
+        self.apps = list(apps) if apps else [app_name]
+        if app_name not in self.apps:
+            self.apps.insert(0, app_name)
+        self.cache = AppCache(self.load_app, lambda data: data.nbytes, memory_budget_mb * 1024 ** 2)
+        # The details table is only created once a dot is clicked
+        self.app = Dash(__name__, suppress_callback_exceptions=True)
         self.setup_callbacks()
         self.setup_layout()
 
+    def load_app(self, app_name):
+        data = AppData(*self.cached_plot(app_name, generate=False))
+        if self.webgl:
+            data.view = TimelineView(data.fig, data.aggregates, self.point_budget, uirevision=app_name)
+        return data
+
+    def start_missing_clusters(self, app_name):
+        """
+        Starts generating app_name's cluster files in the background if they're missing.
+        Only called from callbacks, so it's the process serving the dashboard that starts it,
+        not the reloader's parent process that builds the layout too with debug on.
+        """
+        # A job that failed isn't started again until the dashboard restarts, so it can't loop
+        if not self.has_clusters(app_name) and self.jobs.status(app_name)["state"] != "failed":
+            self.jobs.start(app_name)
+
     @staticmethod
-    def clean_version(v):
+    def has_clusters(file_key):
+        return has_clusters(file_key)
+
+    @classmethod
+    def cached_plot(cls, file_key, generate=True):
         """
-        Drops all the unneeded version info.
-        Example: "verrsion 51.01 (4306)" -> "51.01"
+        make_plot, but the figure comes from the figure cache (see figure_cache) if it's up to
+        date, and goes into it if it wasn't. Reviews only get loaded when the figure is rebuilt.
+        generate is passed on to make_plot, a figure drawn without clusters isn't cached.
+        Returns (figure, aggregates, df_release, df_cluster, indexes).
         """
-        s = str(v).lower().strip()
-        pattern = re.search(r'(\d+\.\d+(?:\.\d+)?)', s)
-        if pattern:
-            return pattern.group(1)
-        return s
+        cached = load_figure(file_key)
+        if cached is None:
+            print(f"Building the {file_key} figure...")
+            fig, aggregates, df_release, df_cluster, indexes = cls.make_plot(file_key, generate)
+            if cls.has_clusters(file_key):
+                save_figure(file_key, fig, aggregates)
+            return fig, aggregates, df_release, df_cluster, indexes
+
+        fig, aggregates = cached
+        df_release = load_releases(file_key, RELEASE_FILES[f"{file_key}_releases"])
+        df_cluster = cls.read_clustered_reviews(CLUSTER_FILES[f"{file_key}_clustered_reviews"])
+        return fig, aggregates, df_release, df_cluster, cls.build_indexes(df_release, df_cluster)
 
     @staticmethod
-    def extract_major_minor(version):
-        match = re.search(r'(\d+)\.(\d+)', str(version))
-        if match:
-            major, minor = match.groups()
-            return f"{major}.{minor}"
-        else:
-            return None  # or "0.0" if you prefer
+    def read_clustered_reviews(path):
+        # Versions stay strings so they line up with the release versions on the x axis
+        return pd.read_csv(path, dtype={"clean_version": str})
 
-    def make_plot(self, file_key):
+    # Shared with review_clustering so both sides clean versions the same way
+    clean_version = staticmethod(clean_version)
+    extract_major_minor = staticmethod(extract_major_minor)
+
+    @staticmethod
+    def build_indexes(df_release, df_cluster):
+        """
+        Precomputes row positions for the click callback, so a click is a dict lookup
+        instead of a pass over the whole table.
+        release: clean version (release date for Firefox) -> df_release row positions
+        cluster: (version, cluster label) -> df_cluster row positions
+        """
+        release_index = df_release.groupby("clean_version", sort=False).indices
+        # Labels alone aren't unique, the same label can come up in more than one version
+        cluster_labels = df_cluster["cluster_label"].fillna("Unknown").astype(str)
+        cluster_index = df_cluster.groupby([df_cluster["clean_version"], cluster_labels], sort=False).indices
+        return {"release": release_index, "cluster": cluster_index}
+
+    @classmethod
+    def make_plot(cls, file_key, generate=True):
         """
         Reads CSV data and groups it by release version (for Zoom/Webex) or release date (for Firefox).
-        Returns the Plotly figure and the DataFrame.
+        Review ratings come from the running sums in review_aggregates, which only count the
+        reviews added since the last time, instead of grouping every review again.
+        Returns the Plotly figure, the per release aggregates it shows, the release and
+        clustered review DataFrames and the lookup indexes for the click callback.
+        Missing cluster files are generated first, unless generate is off, then the cluster
+        trace is just left empty.
         """
         release_file_path = RELEASE_FILES[f"{file_key}_releases"]
-        review_file_path = REVIEW_FILES[f"{file_key}_reviews"]
         cluster_summary_path = CLUSTER_FILES[f"{file_key}_summary"]
         cluster_reviews_path = CLUSTER_FILES[f"{file_key}_clustered_reviews"]
         
         # Check if cluster files exist, if not create them
-        if not os.path.exists(cluster_summary_path) or not os.path.exists(cluster_reviews_path):
+        clusters = cls.has_clusters(file_key)
+        if not clusters and generate:
             print(f"Cluster files for {file_key} not found. Generating them now...")
-            create_cluster(self.app_name)
+            # Only pull in the clustering code (and its ML libraries) when we actually need it
+            from review_clustering import create_cluster
+            create_cluster(file_key)
+            clusters = True
         
-        try:
-            df_release = pd.read_csv(release_file_path, encoding='cp1252')
-        except UnicodeDecodeError:
-            df_release = pd.read_csv(release_file_path, encoding='latin1')
+        # Typed copy of the CSV, with dates parsed and versions already cleaned
+        df_release = load_releases(file_key, release_file_path)
+        # Average rating and review count per clean_version (per release date for Firefox)
+        ratings = review_ratings(file_key)
 
-        try:
-            df_review = pd.read_csv(review_file_path, encoding='cp1252')
-        except UnicodeDecodeError:
-            df_review = pd.read_csv(review_file_path, encoding='latin1')
-        
-        # Convert release date column to datetime
         release_date_col = PATCH_COLUMNS["Date"]
-        review_date_col = REVIEW_COLUMNS.get("Date")
-        df_release[release_date_col] = pd.to_datetime(df_release[release_date_col], errors='coerce')
-        df_review[review_date_col] = pd.to_datetime(df_review[review_date_col], errors='coerce')
         
         version_col = PATCH_COLUMNS.get("Version")
-        rating_col = REVIEW_COLUMNS.get("Rating")
 
         
         if version_col and (version_col in df_release.columns) and (file_key in ["webex", "zoom"]):
             # Group by trimmed release version (zoom/webex)
             grouped = df_release.groupby(version_col).size().reset_index(name='count')
-            grouped["clean_version"] = grouped[version_col].apply(self.clean_version)
+            grouped["clean_version"] = clean_versions(grouped[version_col])
             grouped["sort_key"] = grouped["clean_version"].apply(lambda x: packaging_version.parse(x))
             grouped = grouped.sort_values("sort_key")
             grouped[version_col] = grouped["clean_version"]
             x_col = version_col
 
             # Handle reviews
-            # Webex and Zoom's versions are formatted slightly different in reviews, 
-            # and thus need different functions
-            if file_key == "webex":
-                df_review["clean_version"] = df_review[REVIEW_COLUMNS.get("Version")].apply(self.extract_major_minor)
-            elif file_key == "zoom":
-                df_review["clean_version"] = df_review[REVIEW_COLUMNS.get("Version")].apply(self.clean_version)
-            
-            avg_ratings = df_review.groupby("clean_version")[rating_col].mean().reset_index()
-            avg_ratings.rename(columns={rating_col: "avg_rating"}, inplace=True)
-            review_counts = df_review.groupby("clean_version").size().reset_index(name="review_count")
-
-            grouped = grouped.merge(avg_ratings, on="clean_version", how="left")
-            grouped = grouped.merge(review_counts, on="clean_version", how="left")
+            # Webex and Zoom's versions are formatted slightly different in reviews,
+            # ingest already cleaned each one the right way into clean_version
+            grouped = grouped.merge(ratings, on="clean_version", how="left")
         else:
             # Group by date (Firefox)
             grouped = df_release.groupby(release_date_col).size().reset_index(name='count')
@@ -107,30 +212,10 @@ class TraceVisualizer:
             x_col = release_date_col
 
             # Handle reviews for y axis (Firefox needs to handle by date, not version)
-            df_review[review_date_col] = pd.to_datetime(df_review[review_date_col], errors='coerce')
-            grouped = grouped.sort_values(x_col)
-            df_review = df_review.sort_values(review_date_col)
-
-            release_dates = grouped[x_col].to_list()
-            release_dates.append(pd.Timestamp.max)
-
-            # Each review is binned by its date to the feature release date that happened before it
-            df_review['release_bin'] = pd.cut(
-                df_review[review_date_col],
-                bins=release_dates,
-                labels=grouped[x_col],
-                right=False # Don't include reviews that happen on the next review day in the previous bin [x, y)
-            )
-
-            df_review['release_bin'] = pd.to_datetime(df_review['release_bin'])
-
-            review_counts = df_review.groupby('release_bin').size().reset_index(name='review_count')
-
-            avg_ratings = df_review.groupby('release_bin')[rating_col].mean().reset_index()
-            avg_ratings.rename(columns={rating_col: "avg_rating"}, inplace=True)
-
-            grouped = grouped.merge(avg_ratings, left_on=x_col, right_on='release_bin', how='left')
-            grouped = grouped.merge(review_counts, left_on=x_col, right_on='release_bin', how='left')
+            # Each review's clean_version is the feature release date that happened before it,
+            # ingest works that out once and caches it (versioning.attribute_releases)
+            ratings = ratings.rename(columns={"clean_version": "release_bin"})
+            grouped = grouped.merge(ratings, left_on=x_col, right_on='release_bin', how='left')
 
         grouped['y_value'] = grouped['avg_rating'].fillna(3)
         
@@ -146,8 +231,16 @@ class TraceVisualizer:
             labels={'count': 'Number of Features', 'review_count': 'Number of Reviews', 'y_value': ''},
         )
 
-        df_cluster = pd.read_csv(cluster_reviews_path)
-        df_summary = pd.read_csv(cluster_summary_path)
+        if clusters:
+            df_cluster = cls.read_clustered_reviews(cluster_reviews_path)
+            df_summary = pd.read_csv(cluster_summary_path, dtype={"version": str})
+        else:
+            # Same columns as the files, so the rest of the figure gets built the same way
+            df_cluster = pd.DataFrame(columns=["clean_version", "cluster_label", *DETAIL_REVIEW_COLUMNS])
+            df_summary = pd.DataFrame({
+                "version": pd.Series(dtype=object), "cluster_label": pd.Series(dtype=object),
+                "num_reviews": pd.Series(dtype="int64"), "avg_score": pd.Series(dtype="float64"),
+            })
         df_summary = df_summary.sort_values('version')
 
         if file_key in ["webex", "zoom"]:
@@ -196,7 +289,7 @@ class TraceVisualizer:
             ),
             name="Cluster Summary",
             showlegend=False,
-            customdata=np.stack([df_summary['cluster_label'], df_summary['num_reviews']], axis=-1),
+            customdata=np.stack([df_summary['cluster_label'], df_summary['num_reviews'], df_summary['version']], axis=-1),
             hovertemplate=(
                 "<b>Review Cluster:</b> %{customdata[0]}<br>" +
                 "<b>Version:</b> %{x}<br>" +
@@ -205,6 +298,11 @@ class TraceVisualizer:
             )
         ))  
 
+        # Lines joining the clusters that are the same issue version after version.
+        # The trace is always there (empty without a centroid store), so clicks keep their curveNumbers
+        threads = cluster_threads(file_key, summary_rows=len(df_summary)) if clusters else None
+        fig.add_trace(cls.thread_trace(df_summary, threads))
+
         # Add a timeline baseline
         fig.add_shape(
             type="line",
@@ -244,88 +342,220 @@ class TraceVisualizer:
         # Adjust x-axis tick formatting for clarity
         fig.update_xaxes(tickangle=45, gridcolor='lightgray', tickfont=dict(size=10))
             
-        return fig, df_release, df_review, df_cluster
+        aggregates = grouped[[x_col, 'count', 'avg_rating', 'review_count', 'y_value']].reset_index(drop=True)
+        indexes = cls.build_indexes(df_release, df_cluster)
+        return fig, aggregates, df_release, df_cluster, indexes
+
+    @staticmethod
+    def thread_trace(df_summary, threads):
+        """
+        A line segment from each cluster in a thread to the next one, at their average scores.
+        df_summary's index has to be the summary file's row numbers, which threads refer to.
+        """
+        x, y = [], []
+        if threads is not None:
+            for _, thread in threads.groupby("thread", sort=False):
+                rows = df_summary.loc[thread["row"]]
+                for (start_x, start_y), (end_x, end_y) in zip(
+                        zip(rows["version"], rows["avg_score"]), zip(rows["version"].iloc[1:], rows["avg_score"].iloc[1:])):
+                    # None between segments so they aren't joined up
+                    x += [start_x, end_x, None]
+                    y += [start_y, end_y, None]
+        return go.Scatter(
+            x=x, y=y, mode='lines',
+            line=dict(color='rgba(90, 90, 90, 0.45)', width=1.5),
+            hoverinfo='skip',
+            name="Issue threads",
+            showlegend=False,
+        )
+
+    def selection_table(self, selection):
+        """
+        Returns the rows behind a clicked dot, projected down to just the columns the
+        details table shows, with an "ID" column numbering them in their original order.
+        """
+        data = self.cache.get(selection["app"])
+        if selection["kind"] == "release":
+            key = selection["key"]
+            # Firefox dots are release dates, which come back from the browser as strings
+            if pd.api.types.is_datetime64_any_dtype(data.df_release["clean_version"]):
+                key = pd.Timestamp(key)
+
+            # Find all the individual features within a grouping so we can grrab they data
+            rows = data.indexes["release"].get(key, [])
+            # clean_version is only there for grouping, users don't need to see it
+            table = data.df_release.iloc[rows].drop(columns="clean_version")
+
+            # Remove columns where all values are empty/null
+            table = table.loc[:, table.notna().any()]
+        else:
+            rows = data.indexes["cluster"].get((selection["version"], selection["label"]), [])
+            columns = [data.df_cluster.columns.get_loc(col) for col in DETAIL_REVIEW_COLUMNS]
+            table = data.df_cluster.iloc[rows, columns]
+
+        # Reset the index and insert a new "ID" column for clarity
+        table = table.reset_index(drop=True)
+        table.insert(0, "ID", table.index + 1)
+        return table
 
     def setup_callbacks(self):
+        # The WebGL view also gets redrawn for every zoom and pan
+        # and checks on clusters being generated in the background while there are any
+        timeline_inputs = [Input('app-selector', 'value'), Input('cluster-progress-interval', 'n_intervals')]
+        if self.webgl:
+            timeline_inputs.append(Input('timeline-chart', 'relayoutData'))
+
+        @self.app.callback(
+            Output('timeline-chart', 'figure'),
+            Output('cluster-progress', 'children'),
+            Output('cluster-progress-interval', 'disabled'),
+            *timeline_inputs,
+            prevent_initial_call=True
+        )
+        def update_timeline(app_name, n_intervals, relayout_data=None):
+            figure = dash.no_update
+            if dash.ctx.triggered_id != 'cluster-progress-interval':
+                if dash.ctx.triggered_id == 'app-selector':
+                    relayout_data = None
+                figure = self.cache.get(app_name).timeline_figure(relayout_data)
+
+            self.start_missing_clusters(app_name)
+            status = self.jobs.status(app_name)
+            if status["state"] == "done":
+                # The app was drawn without clusters, load it again now that they're there
+                self.jobs.forget(app_name)
+                self.cache.drop(app_name)
+                # The job rebuilt the search index too
+                self.search_indexes.pop(app_name, None)
+                figure = self.cache.get(app_name).timeline_figure()
+            return figure, describe(status), not self.jobs.busy()
+
         @self.app.callback(
             Output('details-container', 'children'),
-            [Input('timeline-chart', 'clickData')]
+            Output('details-selection', 'data'),
+            Input('timeline-chart', 'clickData'),
+            Input('app-selector', 'value')
         )
-        def display_details(clickData):
-            if clickData is None:
-                return "Click on a dot to view individual features here."
-            
-            # Determine the selected x value (release version or date)
-            point = clickData['points'][0]
-            trace_index = point.get('curveNumber')
-            if trace_index == 0:
-                # When feature clicked...
-                x_value = point['customdata']
-                
-                version = PATCH_COLUMNS.get("Version")
-                release_date = PATCH_COLUMNS["Date"]
-                
-                # Find all the individual features within a grouping so we can grrab they data
-                if version and (version in self.df_release.columns):
-                    mask = self.df_release[version].apply(lambda v: self.clean_version(v)) == x_value
-                    filtered = self.df_release[mask]
-                else:
-                    filtered = self.df_release[self.df_release[release_date] == x_value]
-                
-                if filtered.empty:
-                    return "No features found for the selected dot."
-                
-                # Reset the index and insert a new "ID" column for clarity
-                filtered = filtered.reset_index(drop=True)
-                filtered.insert(0, "ID", filtered.index + 1)
-                
-                # Remove columns where all values are empty/null
-                non_empty_columns = [col for col in filtered.columns if not filtered[col].isna().all()]
-                filtered = filtered[non_empty_columns]
-                
-                # Display the details in a styled DataTable
-                return dash_table.DataTable(
-                    data=filtered.to_dict('records'),
-                    columns=[{"name": col, "id": col} for col in filtered.columns],
-                    page_size=10,
-                    style_table={
-                        'overflowX': 'auto',
-                        'border': '1px solid #ddd'
-                    },
-                    style_header={
-                        'backgroundColor': '#f8f9fa',
-                        'fontWeight': 'bold',
-                        'border': '1px solid #ddd'
-                    },
-                    style_cell={
-                        'textAlign': 'left',
-                        'padding': '10px',
-                        'fontFamily': 'Arial'
-                    },
-                    style_data_conditional=[{
-                        'if': {'row_index': 'odd'},
-                        'backgroundColor': '#f1f1f1'
-                    }]
-                )
-            elif trace_index == 1:
-                # When review cluster clicked...
-                cluster_label = point['customdata'][0]
-                
-                filtered_reviews = self.df_cluster[self.df_cluster['cluster_label'] == cluster_label]
-                filtered_reviews = filtered_reviews.reset_index(drop=True)
-                filtered_reviews.insert(0, "ID", filtered_reviews.index + 1)
-
-                filtered_reviews = filtered_reviews[['ID', 'score', 'content']]
-            
-                return dash_table.DataTable(
-                    data=filtered_reviews.to_dict('records'),
-                    columns=[{"name": col, "id": col} for col in filtered_reviews.columns],
-                    page_size=10,
+        def display_details(clickData, app_name):
+            # Clicks from the previous app's chart don't mean anything for the new one
+            if clickData is None or dash.ctx.triggered_id == 'app-selector':
+                return "Click on a dot to view individual features here.", None
+            return self.click_details(clickData, app_name)
+
+        @self.app.callback(
+            Output('search-results', 'children'),
+            Input('search-button', 'n_clicks'),
+            Input('search-query', 'n_submit'),
+            Input('app-selector', 'value'),
+            State('search-query', 'value'),
+            prevent_initial_call=True
+        )
+        def search_reviews(n_clicks, n_submit, app_name, query):
+            if dash.ctx.triggered_id == 'app-selector' or not query or not query.strip():
+                return None
+            return self.search_results(query.strip(), app_name)
+
+        @self.app.callback(
+            Output('details-table', 'data'),
+            Output('details-table', 'page_count'),
+            Input('details-table', 'page_current'),
+            Input('details-table', 'page_size'),
+            Input('details-table', 'sort_by'),
+            Input('details-table', 'filter_query'),
+            State('details-selection', 'data'),
+            prevent_initial_call=True
+        )
+        def update_details_page(page_current, page_size, sort_by, filter_query, selection):
+            if selection is None:
+                return [], 1
+            table = query_table(self.selection_table(selection), filter_query, sort_by)
+            return page_records(table, page_current, page_size), page_count(len(table), page_size)
+
+    def click_details(self, clickData, app_name):
+        """
+        What display_details shows for a click on app_name's chart:
+        (details table or message, selection for the details-selection store)
+        """
+        # Determine the selected x value (release version or date)
+        point = clickData['points'][0]
+        trace_index = point.get('curveNumber')
+        if trace_index == 0:
+            # When feature clicked...
+            selection = {"app": app_name, "kind": "release", "key": point['customdata']}
+        elif trace_index == 1:
+            # When review cluster clicked...
+            selection = {"app": app_name, "kind": "cluster", "label": point['customdata'][0], "version": point['customdata'][2]}
+        elif self.webgl and trace_index in (2, 3):
+            # Merged dots in the WebGL view stand for many releases/clusters
+            # (without WebGL trace 2 is the issue threads, which don't take clicks)
+            return "Zoom in to pick out a single release or cluster.", None
+        else:
+            return dash.no_update, dash.no_update
+
+        table = self.selection_table(selection)
+        if table.empty and selection["kind"] == "release":
+            return "No features found for the selected dot.", None
+
+        # Display the details in a styled DataTable
+        # Only the current page is ever sent to the browser, paging, sorting and
+        # filtering all happen here on the server in update_details_page
+        return dash_table.DataTable(
+            id='details-table',
+            data=page_records(table, 0, DETAILS_PAGE_SIZE),
+            columns=[{"name": col, "id": col} for col in table.columns],
+            page_current=0,
+            page_size=DETAILS_PAGE_SIZE,
+            page_count=page_count(len(table), DETAILS_PAGE_SIZE),
+            page_action='custom',
+            sort_action='custom',
+            sort_mode='multi',
+            sort_by=[],
+            filter_action='custom',
+            filter_query='',
+            style_table={'overflowX': 'auto', 'border': '1px solid #ddd'},
+            style_header={'backgroundColor': '#f8f9fa', 'fontWeight': 'bold', 'border': '1px solid #ddd'},
+            style_cell={'textAlign': 'left', 'padding': '10px', 'fontFamily': 'Arial'},
+            style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': '#f1f1f1'}]
+        ), selection
+
+    def search_results(self, query, app_name):
+        """
+        What search_reviews shows for a search of app_name's reviews:
+        how long it took, then the closest reviews grouped by version.
+        """
+        index = self.search_indexes.get(app_name)
+        if index is None:
+            try:
+                index = self.search_indexes[app_name] = SearchIndex(app_name)
+            except FileNotFoundError as e:
+                return str(e)
+
+        results, timings = index.search(query, self.top_k)
+        groups = group_by_version(results)
+        children = [html.Div(
+            f"{len(results)} closest of {len(index)} reviews, in {len(groups)} versions "
+            f"({timings['encode_ms'] + timings['search_ms']:.0f} ms: {timings['encode_ms']:.0f} ms embedding "
+            f"the query, {timings['search_ms']:.0f} ms searching)",
+            style={'marginBottom': '10px', 'color': '#555'}
+        )]
+        columns = ['similarity'] + [col for col in SEARCH_RESULT_COLUMNS if col in results.columns]
+        for version, group in groups:
+            table = group[columns].copy()
+            if 'at' in table.columns:
+                table['at'] = table['at'].astype(str)
+            children.append(html.Details([
+                html.Summary(f"{format_version(version)} - {len(group)} reviews, "
+                             f"best match {group['similarity'].max():.2f}"),
+                dash_table.DataTable(
+                    data=table.to_dict('records'),
+                    columns=[{"name": col, "id": col} for col in columns],
                     style_table={'overflowX': 'auto', 'border': '1px solid #ddd'},
                     style_header={'backgroundColor': '#f8f9fa', 'fontWeight': 'bold', 'border': '1px solid #ddd'},
-                    style_cell={'textAlign': 'left', 'padding': '10px', 'fontFamily': 'Arial'},
-                    style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': '#f1f1f1'}]
-                )
+                    style_cell={'textAlign': 'left', 'padding': '10px', 'fontFamily': 'Arial',
+                                'whiteSpace': 'normal', 'height': 'auto'},
+                ),
+            ], style={'marginBottom': '10px'}))
+        return children
 
     def setup_layout(self):
         self.app.layout = html.Div([
@@ -337,11 +567,29 @@ class TraceVisualizer:
             }),
             html.Div("This interactive timeline displays release versions (or dates) on the x-axis. The dot's size and color indicate the number of features included in that release. Click a dot to see detailed information.",
                     style={'textAlign': 'center', 'marginBottom': '20px', 'fontFamily': 'Arial', 'color': '#555'}),
+            dcc.Dropdown(
+                id='app-selector',
+                options=[{'label': name.capitalize(), 'value': name} for name in self.apps],
+                value=self.app_name,
+                clearable=False,
+                style={'width': '300px', 'margin': '0 auto 20px auto', 'fontFamily': 'Arial'}
+            ),
+            dcc.Store(id='details-selection'),
+            # Starts enabled, the first check turns it off if nothing is being generated
+            dcc.Interval(id='cluster-progress-interval', interval=PROGRESS_INTERVAL_MS),
+            html.Div(id='cluster-progress', style={'textAlign': 'center', 'fontFamily': 'Arial', 'color': '#555'}),
             dcc.Graph(
                 id='timeline-chart',
-                figure=self.fig,
+                figure=self.cache.get(self.app_name).timeline_figure(),
                 style={'height': '600px', 'width': '90%', 'margin': '0 auto'}
             ),
+            html.Div([
+                dcc.Input(id='search-query', type='text', debounce=True,
+                          placeholder='Search reviews by meaning, e.g. "audio cuts out"',
+                          style={'width': '400px', 'padding': '8px', 'marginRight': '10px'}),
+                html.Button("Search", id='search-button'),
+            ], style={'textAlign': 'center', 'marginTop': '20px', 'fontFamily': 'Arial'}),
+            html.Div(id='search-results', style={'width': '90%', 'margin': '20px auto', 'fontFamily': 'Arial'}),
             html.Hr(style={'margin': '30px 0'}),
             html.Div(
                 id='details-container',
@@ -357,15 +605,45 @@ class TraceVisualizer:
         ])
 
     def run(self, debug=True):
-        self.app.run(debug=debug)
+        try:
+            self.app.run(debug=debug)
+        finally:
+            self.jobs.shutdown()
+
+def prebuild_figures(apps=APP_NAMES):
+    """
+    Makes sure every app's figure is in the figure cache, so the dashboard starts straight from it.
+    """
+    for app_name in apps:
+        if load_figure(app_name) is not None:
+            print(f"{app_name}: figure already up to date")
+            continue
+        TraceVisualizer.cached_plot(app_name)
+        print(f"{app_name}: figure cached")
 
 def main():
     parser = argparse.ArgumentParser(description='Visualize release timelines for different applications.')
-    parser.add_argument('app_name', type=str, help='Name of the application (e.g., Zoom, Webex, Firefox)')
+    parser.add_argument('app_name', type=str, nargs='?', help='Name of the application to show first (e.g., Zoom, Webex, Firefox)')
+    parser.add_argument('--apps', type=str, nargs='+', help='Applications to serve (default: all of them)')
+    parser.add_argument('--memory-budget-mb', type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help='How much app data to keep loaded before dropping the least recently used app')
+    parser.add_argument('--webgl', action='store_true',
+                        help='Draw timelines with WebGL, merging dots when zoomed out (for apps with lots of versions)')
+    parser.add_argument('--point-budget', type=int, default=DEFAULT_POINT_BUDGET,
+                        help=f'Most dots a WebGL timeline shows at once (default: {DEFAULT_POINT_BUDGET})')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K,
+                        help=f'How many reviews the search box returns (default: {DEFAULT_TOP_K})')
+    parser.add_argument('--prebuild', action='store_true',
+                        help="Build and cache the figures of every app (or --apps) that isn't up to date, then exit")
     args = parser.parse_args()
     
-    app_name = args.app_name.lower()
-    visualizer = TraceVisualizer(app_name=app_name)
+    apps = [name.lower() for name in args.apps] if args.apps else APP_NAMES
+    if args.prebuild:
+        prebuild_figures(apps)
+        return
+    app_name = args.app_name.lower() if args.app_name else apps[0]
+    visualizer = TraceVisualizer(app_name=app_name, apps=apps, memory_budget_mb=args.memory_budget_mb,
+                                 webgl=args.webgl, point_budget=args.point_budget, top_k=args.top_k)
     visualizer.run(debug=True)
 
 if __name__ == '__main__':
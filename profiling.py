@@ -0,0 +1,110 @@
+import csv
+import json
+import os
+import time
+from contextlib import contextmanager
+from ingest import peak_rss_mb
+
+SPAN_FIELDS = ["stage", "version", "rows", "wall_s", "cpu_s", "peak_rss_mb", "peak_growth_mb", "pid"]
+
+
+class Profiler:
+    """
+    Records how long each stage of a clustering run takes.
+
+    Every span records its stage name, optionally the version it was for and how many rows
+    it handled, plus:
+        wall_s         - elapsed seconds
+        cpu_s          - CPU seconds this process spent (all its threads), so cpu_s > wall_s
+                         means the libraries were running in parallel
+        peak_rss_mb    - the process's peak memory so far when the span ended
+        peak_growth_mb - how much the span raised that peak, so the stage that set it stands out
+
+    Spans recorded in worker processes are sent back with extend() and keep their pid.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def span(self, stage, version=None, rows=None):
+        """
+        Times the with block. Yields the span's record, so rows can be filled in
+        once they're known (span["rows"] = ...).
+        """
+        record = {"stage": stage, "version": None if version is None else str(version), "rows": rows}
+        peak_before = peak_rss_mb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_s"] = time.perf_counter() - wall_start
+            record["cpu_s"] = time.process_time() - cpu_start
+            peak_after = peak_rss_mb()
+            record["peak_rss_mb"] = peak_after
+            record["peak_growth_mb"] = None if peak_after is None else peak_after - peak_before
+            record["pid"] = os.getpid()
+            self.spans.append(record)
+
+    def extend(self, spans):
+        self.spans.extend(spans)
+
+    def summary(self):
+        """
+        One row per stage, in the order the stages first ran, with the spans' totals.
+        """
+        stages = {}
+        for span in self.spans:
+            row = stages.setdefault(span["stage"], {
+                "stage": span["stage"], "spans": 0, "rows": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": None,
+            })
+            row["spans"] += 1
+            row["rows"] += span["rows"] or 0
+            row["wall_s"] += span["wall_s"]
+            row["cpu_s"] += span["cpu_s"]
+            if span["peak_rss_mb"] is not None:
+                row["peak_rss_mb"] = max(row["peak_rss_mb"] or 0, span["peak_rss_mb"])
+        return list(stages.values())
+
+    def print_summary(self):
+        print(f"\n{'stage':<16}{'spans':>7}{'rows':>10}{'wall s':>10}{'cpu s':>10}{'peak MB':>10}")
+        for row in self.summary():
+            peak = f"{row['peak_rss_mb']:.0f}" if row["peak_rss_mb"] is not None else "-"
+            print(f"{row['stage']:<16}{row['spans']:>7}{row['rows']:>10}"
+                  f"{row['wall_s']:>10.2f}{row['cpu_s']:>10.2f}{peak:>10}")
+
+    def save(self, path_prefix):
+        """
+        Writes the trace to path_prefix.json (spans and summary) and path_prefix.csv (spans).
+        """
+        os.makedirs(os.path.dirname(path_prefix) or ".", exist_ok=True)
+        with open(f"{path_prefix}.json", "w") as f:
+            json.dump({"spans": self.spans, "summary": self.summary()}, f, indent=2)
+        with open(f"{path_prefix}.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=SPAN_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.spans)
+        print(f"Saved profile to '{path_prefix}.json' and '{path_prefix}.csv'")
+
+
+class NullProfiler:
+    """
+    Stand-in for Profiler when profiling is off, every span is the same do-nothing block.
+    """
+    enabled = False
+    spans = []
+
+    @contextmanager
+    def _span(self):
+        yield {}
+
+    def span(self, stage, version=None, rows=None):
+        return self._span()
+
+    def extend(self, spans):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,211 @@
+"""
+Per version review rating sums and counts, kept up to date as the review feed grows.
+
+Our review exports only ever get rows added to the end. Instead of grouping every review
+again each time the timeline is built, each app keeps two files in REVIEW_AGGREGATE_DIR:
+    <app>_ratings.parquet - per clean_version (the release bin for Firefox, see ingest):
+                            rating_sum, rated (reviews with a score) and review_count
+    <app>_ratings.json    - the high-water mark: how far into the review file has been counted
+                            (byte offset and rows), the last review counted (id and date),
+                            and a hash of the bytes just before the mark
+
+update_rating_sums only reads the bytes after the mark and adds their sums in, so keeping
+the aggregates current costs O(new reviews). It counts everything again (from the ingest
+cache) if the file got shorter or the bytes just before the mark changed (it was rewritten,
+not appended to), or the releases Firefox reviews are binned by changed. Edits further back
+than that aren't noticed, --rebuild counts everything again by hand.
+
+Usage:
+    python review_aggregates.py <app_name> [--rebuild]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import numpy as np
+import pandas as pd
+from atomic_files import atomic_write, remove_if_exists, write_text
+from config import REVIEW_COLUMNS, REVIEW_AGGREGATE_DIR
+from ingest import (
+    load_reviews, load_releases, review_versions, review_path, release_path, file_stamp, detect_encoding
+)
+
+# Bump this whenever the sums or the mark change, so old files get rebuilt instead of read
+AGGREGATE_FORMAT = 1
+# Bytes before the mark that get hashed to check the file was only appended to
+TAIL_BYTES = 4096
+SUM_COLUMNS = ["rating_sum", "rated", "review_count"]
+
+
+def _aggregate_paths(app_name):
+    name = app_name.lower()
+    return (
+        os.path.join(REVIEW_AGGREGATE_DIR, f"{name}_ratings.parquet"),
+        os.path.join(REVIEW_AGGREGATE_DIR, f"{name}_ratings.json"),
+    )
+
+
+def _depends(app_name):
+    # Firefox reviews are binned by release date, so new releases move them
+    return {release_path(app_name): file_stamp(release_path(app_name))} if app_name.lower() == "firefox" else {}
+
+
+def _tail_hash(f, offset):
+    start = max(0, offset - TAIL_BYTES)
+    f.seek(start)
+    return hashlib.sha256(f.read(offset - start)).hexdigest()
+
+
+def rating_sums(reviews):
+    """
+    rating_sum, rated and review_count of reviews (with clean_version) per clean_version.
+    """
+    rating = reviews[REVIEW_COLUMNS["Rating"]].astype("float64")
+    sums = pd.DataFrame({
+        "clean_version": reviews["clean_version"].to_numpy(),
+        "rating_sum": rating.fillna(0).to_numpy(),
+        "rated": rating.notna().to_numpy(dtype=np.int64),
+        "review_count": np.ones(len(reviews), dtype=np.int64),
+    })
+    # Reviews without a release (no version, or from before the first Firefox release) aren't counted
+    return sums.groupby("clean_version", sort=False).sum().reset_index()
+
+
+def _add_sums(sums, new_sums):
+    combined = pd.concat([sums, new_sums], ignore_index=True)
+    return combined.groupby("clean_version", sort=False)[SUM_COLUMNS].sum().reset_index()
+
+
+def _read_meta(app_name):
+    sums_path, meta_path = _aggregate_paths(app_name)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        sums = pd.read_parquet(sums_path)
+    except (OSError, ValueError):
+        return None, None
+    if meta.get("format") != AGGREGATE_FORMAT or meta.get("depends") != _depends(app_name):
+        return None, None
+    return meta, sums
+
+
+def _save(app_name, sums, meta):
+    sums_path, meta_path = _aggregate_paths(app_name)
+    os.makedirs(REVIEW_AGGREGATE_DIR, exist_ok=True)
+    # Like the figure cache, the mark goes first and comes back last,
+    # so sums that don't match it never get used
+    remove_if_exists(meta_path)
+    atomic_write(sums_path, lambda tmp_path: sums.to_parquet(tmp_path, index=False))
+    write_text(meta_path, json.dumps(meta, indent=2))
+
+
+def _last_review(reviews):
+    if reviews.empty:
+        return None, None
+    last = reviews.iloc[-1]
+    at = last[REVIEW_COLUMNS["Date"]]
+    review_id = last["reviewId"] if "reviewId" in reviews.columns else None
+    return (None if pd.isna(at) else str(at)), (None if pd.isna(review_id) else str(review_id))
+
+
+def _rebuild(app_name, path):
+    print(f"Counting every {app_name} review for the rating aggregates")
+    size_before = os.path.getsize(path)
+    reviews = load_reviews(app_name, path)
+    sums = rating_sums(reviews)
+
+    meta = {"format": AGGREGATE_FORMAT, "source": path, "depends": _depends(app_name), "offset": None}
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(size - 1, 0))
+        # Only set a mark if we know exactly where the counted rows end: the file didn't
+        # grow while it was read, and its last row is complete
+        if size == size_before and f.read(1) == b"\n":
+            encoding = detect_encoding(path)
+            last_at, last_id = _last_review(reviews)
+            meta.update(
+                offset=size, rows=len(reviews), tail_sha256=_tail_hash(f, size), encoding=encoding,
+                columns=pd.read_csv(path, nrows=0, encoding=encoding).columns.tolist(),
+                last_at=last_at, last_review_id=last_id,
+            )
+    _save(app_name, sums, meta)
+    return sums
+
+
+def update_rating_sums(app_name, path=None, rebuild=False):
+    """
+    The app's per clean_version rating sums (see rating_sums), counting only the reviews
+    added to the end of its review file since the last call. rebuild counts all of them.
+    """
+    path = path or review_path(app_name)
+    meta, sums = (None, None) if rebuild else _read_meta(app_name)
+    if meta is None or meta.get("offset") is None or meta.get("source") != path:
+        return _rebuild(app_name, path)
+
+    offset = meta["offset"]
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size < offset or _tail_hash(f, offset) != meta["tail_sha256"]:
+            print(f"{path} was rewritten since the last count, counting everything again")
+            return _rebuild(app_name, path)
+        if size == offset:
+            return sums
+        f.seek(offset)
+        new_bytes = f.read(size - offset)
+
+    if not new_bytes.endswith(b"\n"):
+        # A row is still being written
+        print(f"{path} ends partway through a row, only counting up to the mark for now")
+        return sums
+
+    try:
+        text = new_bytes.decode(meta.get("encoding", "cp1252"))
+    except UnicodeDecodeError:
+        # The new rows need a different encoding than the file was read with
+        return _rebuild(app_name, path)
+
+    version_col = REVIEW_COLUMNS["Version"]
+    date_col = REVIEW_COLUMNS["Date"]
+    new_reviews = pd.read_csv(io.StringIO(text), header=None, names=meta["columns"], dtype={version_col: str})
+    new_reviews[date_col] = pd.to_datetime(new_reviews[date_col], errors='coerce')
+    releases = load_releases(app_name) if app_name.lower() == "firefox" else None
+    new_reviews["clean_version"] = review_versions(app_name, new_reviews, releases)
+    sums = _add_sums(sums, rating_sums(new_reviews))
+
+    last_at, last_id = _last_review(new_reviews)
+    print(f"Counted {len(new_reviews)} {app_name} reviews added after review {meta.get('last_review_id')} "
+          f"({meta.get('last_at')}), up to review {last_id} ({last_at})")
+    with open(path, "rb") as f:
+        tail = _tail_hash(f, size)
+    meta.update(offset=size, rows=meta["rows"] + len(new_reviews), tail_sha256=tail,
+                last_at=last_at, last_review_id=last_id)
+    _save(app_name, sums, meta)
+    return sums
+
+
+def review_ratings(app_name, path=None):
+    """
+    avg_rating and review_count per clean_version, what the timeline plots for each release.
+    """
+    sums = update_rating_sums(app_name, path)
+    rated = sums["rated"].to_numpy()
+    avg_rating = sums["rating_sum"].to_numpy(dtype=np.float64) / np.where(rated == 0, 1, rated)
+    return pd.DataFrame({
+        "clean_version": sums["clean_version"],
+        "avg_rating": np.where(rated == 0, np.nan, avg_rating),
+        "review_count": sums["review_count"].astype(np.int64),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bring an app\'s review rating aggregates up to date.')
+    parser.add_argument('app_name', type=str, help='Name of the app (e.g., Zoom, Webex, Firefox)')
+    parser.add_argument('--rebuild', action='store_true', help='Count every review again instead of only the new ones')
+    args = parser.parse_args()
+    sums = update_rating_sums(args.app_name.lower(), rebuild=args.rebuild)
+    print(f"{int(sums['review_count'].sum())} reviews in {len(sums)} versions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,31 @@
 import re
-import nltk
-import hdbscan
+import functools
 import pandas as pd
 import numpy as np
 import argparse
-from nltk.corpus import words
-from sentence_transformers import SentenceTransformer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from config import RELEASE_FILES, PATCH_COLUMNS, REVIEW_FILES, REVIEW_COLUMNS
+import hashlib
+import json
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from config import REVIEW_FILES, REVIEW_COLUMNS, CLUSTER_FILES, NLTK_DATA_DIR, EMBEDDING_CACHE_DIR
+from embedding_cache import EmbeddingCache
+from embedding_backends import get_backend, BACKENDS, DEFAULT_MODEL, DEFAULT_BATCH_SIZE
+from ingest import load_releases, load_reviews, stream_reviews, peak_rss_mb
+from profiling import Profiler, NULL_PROFILER
+from labeling import cluster_labels, LABEL_METHODS
+from reduction import reduce_embeddings, hdbscan_options, REDUCTION_METHODS
+from search_index import build_search_index
+from cluster_threads import cluster_centroids, save_centroids, load_centroids
+from dedup import duplicate_groups, NEAR_DUPLICATE_THRESHOLD
 import os
 
+# The ML libraries (sentence_transformers, hdbscan, sklearn, nltk) take seconds to import,
+# so they're only imported inside the functions that use them. That way the dashboard can
+# import this module without paying for them when the cluster files already exist.
 
-def clean_version(v):
-    """
-    Drops all unneeded version info.
-    Example: "version 51.01 (4306)" -> "51.01"
-    """
-    s = str(v).lower().strip()
-    pattern = re.search(r'(\d+\.\d+(?:\.\d+)?)', s)
-    if pattern:
-        return pattern.group(1)
-    return s
+EMBEDDING_MODEL = DEFAULT_MODEL
 
-def extract_major_minor(version):
-    """
-    Extracts the major.minor part of a version string.
-    """
-    match = re.search(r'(\d+)\.(\d+)', str(version))
-    if match:
-        major, minor = match.groups()
-        return f"{major}.{minor}"
-    return None
 
 # Some words and phrases I found that tend not to be useful in reviews
 # We're more looking for details on specific things
@@ -40,6 +35,18 @@ BORING_REVIEWS = {
     "fantastic", "best", "super", "amazing", "terrible"
 }
 
+# A review needs at least this many words, and this many different ones, to be worth clustering
+MIN_WORDS = 5
+MIN_UNIQUE_WORDS = 3
+
+# Texts embedded at a time when create_cluster reports progress, so a big app's embedding
+# isn't one long silent call
+PROGRESS_CHUNK = 4096
+
+# Token count columns prepare_reviews adds so the filters don't have to split every text again.
+# They're derived from cleaned_content, so they stay out of fingerprints and the output files.
+TOKEN_COUNT_COLUMNS = ['num_words', 'num_unique_words']
+
 def is_informative(text):
     """
     Checks if text is informative (not too short or too repetitive).
@@ -47,35 +54,93 @@ def is_informative(text):
     text = text.strip().lower()
     words = text.split()
     unique_words = set(words)
-    return len(words) >= 5 and len(unique_words) >= 3
+    return len(words) >= MIN_WORDS and len(unique_words) >= MIN_UNIQUE_WORDS
 
 
+# Anything that isn't actual text
+EMOJI_PATTERN = re.compile(
+    "["
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F1E0-\U0001F1FF"  # flags
+    "\U00002700-\U000027BF"  # Dingbats
+    "\U000024C2-\U0001F251"
+    "]+", flags=re.UNICODE
+)
+
 # 2. Preprocess text
 def clean_text(text):
     """
     Cleans text by lowercasing, removing emojis and extra whitespace.
     """
     if isinstance(text, str):
-        text = re.sub(r'Ã', '', text)
-        emoji_pattern = re.compile(
-            "["
-            "\U0001F600-\U0001F64F"  # emoticons
-            "\U0001F300-\U0001F5FF"  # symbols & pictographs
-            "\U0001F680-\U0001F6FF"  # transport & map symbols
-            "\U0001F1E0-\U0001F1FF"  # flags
-            "\U00002700-\U000027BF"  # Dingbats
-            "\U000024C2-\U0001F251"
-            "]+", flags=re.UNICODE
-        )
+        text = text.replace('Ã', '')
         text = text.lower().strip()
         # Remove anything that isn't actual text
-        text = emoji_pattern.sub(r'', text)
+        # (every character the pattern matches is non-ASCII, so plain ASCII text can skip it)
+        if not text.isascii():
+            text = EMOJI_PATTERN.sub('', text)
         return text
     return ""
 
+
+def clean_texts(texts):
+    """
+    clean_text over a whole Series. This is still a Python loop, just over the distinct
+    texts (factorized first): reviews repeat a lot ("great app", copy pasted complaints...),
+    so each one is only cleaned once. There's no speedup when every text is different.
+    """
+    codes, uniques = pd.factorize(texts.astype(object))
+    # Missing texts get code -1, which picks the "" on the end
+    cleaned = np.array([clean_text(t) for t in uniques] + [""], dtype=object)
+    return pd.Series(cleaned[codes], index=texts.index)
+
+
+def token_counts(cleaned_texts):
+    """
+    Number of words and of different words in each cleaned text, as a DataFrame with
+    TOKEN_COUNT_COLUMNS. Each distinct text is only split once.
+    """
+    codes, uniques = pd.factorize(cleaned_texts)
+    num_words = np.zeros(len(uniques) + 1, dtype=np.int32)
+    num_unique_words = np.zeros(len(uniques) + 1, dtype=np.int32)
+    for i, text in enumerate(uniques):
+        words = text.split()
+        num_words[i] = len(words)
+        num_unique_words[i] = len(set(words))
+    return pd.DataFrame({
+        'num_words': num_words[codes],
+        'num_unique_words': num_unique_words[codes],
+    }, index=cleaned_texts.index)
+
+
+def informative_mask(reviews):
+    """
+    is_informative for every review, from the token count columns (worked out if they're missing).
+    Cleaned text is already stripped and lowercase, so the counts are the same ones is_informative sees.
+    """
+    counts = reviews if set(TOKEN_COUNT_COLUMNS) <= set(reviews.columns) else token_counts(reviews['cleaned_content'])
+    return (counts['num_words'] >= MIN_WORDS) & (counts['num_unique_words'] >= MIN_UNIQUE_WORDS)
+
+@functools.lru_cache(maxsize=None)
+def get_english_words():
+    """
+    Loads the NLTK English words corpus the first time it's needed.
+    Checks the usual NLTK data folders and our own Cache/ copy first, and only
+    downloads it (into Cache/) if it isn't in any of them.
+    """
+    import nltk
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.append(NLTK_DATA_DIR)
+    try:
+        nltk.data.find('corpora/words')
+    except LookupError:
+        nltk.download('words', download_dir=NLTK_DATA_DIR, quiet=True)
+    from nltk.corpus import words
+    return frozenset(words.words())
+
 # Function to check if a cluster label is valid (i.e., not nonsensical)
-nltk.download('words')
-english_words = set(words.words())
 def is_valid_label(label, threshold=0.3):
     """
     Returns True if the fraction of valid English words in the label exceeds the threshold.
@@ -86,172 +151,703 @@ def is_valid_label(label, threshold=0.3):
     tokens = re.findall(r'\w+', label)
     if not tokens:
         return False
+    english_words = get_english_words()
     valid_count = sum(1 for token in tokens if token.isalpha() and token in english_words)
 
     return (valid_count / len(tokens)) >= threshold
 
 
-def create_cluster(app_name: str):
+# Anything that changes how a version gets clustered has to go in here,
+# otherwise incremental runs would keep reusing clusters made with the old settings
+CLUSTER_SETTINGS = {
+    "embedding_model": EMBEDDING_MODEL,
+    "min_reviews": 5,
+    "min_cluster_size": 5,
+    "tfidf_ngram_range": [3, 4],
+    "tfidf_max_features": 5,
+    "label_threshold": 0.3,
+    # "legacy" keeps the labels earlier runs wrote, "ctfidf" is the class-based TF-IDF (see labeling)
+    "label_method": "legacy",
+    # None clusters the full embeddings, "pca" or "random" shrinks them to reduction_dims first
+    "reduction": None,
+    "reduction_dims": 32,
+    # Versions with at least this many reviews use the fast neighbor settings (see reduction), None never does
+    "fast_neighbors_from": None,
+    "embedding_dtype": "float32",
+    # Collapse each group of copies of a review into one point standing for all of them (see dedup)
+    "dedup": False,
+    # Near copies at least this similar to the group's first review are in its group too, None only exact copies
+    "dedup_threshold": None,
+}
 
-    review_file_path = f'./Reviews/{app_name}_reviews.csv'
-    release_file_path = f'./Releases/{app_name}_releases.csv'
 
-    # Try loading files with different encodings
-    try:
-        releases = pd.read_csv(release_file_path, encoding='cp1252')
-    except UnicodeDecodeError:
-        releases = pd.read_csv(release_file_path, encoding='latin1')
+# What counts as a big version for --fast-neighbors
+LARGE_VERSION_REVIEWS = 5000
+
 
+def fingerprint_reviews(version_reviews):
+    """
+    Hashes a version's review rows (order included) so we can tell if they changed between runs.
+    """
+    version_reviews = version_reviews.drop(columns=TOKEN_COUNT_COLUMNS, errors='ignore')
+    row_hashes = pd.util.hash_pandas_object(version_reviews, index=False).to_numpy()
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+
+def load_manifest(manifest_path, settings):
+    """
+    Loads the per-version fingerprints saved by the last run, or an empty manifest if
+    there isn't one or it was made with different cluster settings.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
     try:
-        reviews = pd.read_csv(review_file_path, encoding='cp1252')
-    except UnicodeDecodeError:
-        reviews = pd.read_csv(review_file_path, encoding='latin1')
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("settings") != settings:
+        print("Cluster settings changed since the last run, recomputing every version")
+        return {}
+    return manifest.get("versions", {})
 
-    reviews = reviews.dropna(subset=[REVIEW_COLUMNS["Version"]])
 
-    # Clean junk out of our reviews
-    reviews['cleaned_content'] = reviews['content'].apply(clean_text)
-    # Filter out any reviews that don't seem like they'll actually be useful
-    reviews = reviews[reviews['cleaned_content'].apply(is_informative)]
-
-    # Embed the cleaned review texts
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    embeddings = model.encode(reviews['cleaned_content'].tolist(), show_progress_bar=True)
-    reviews['embedding'] = embeddings.tolist()
-
-    # Get our versions like we do in main
-    if app_name.lower() == "zoom":
-        reviews["clean_version"] = reviews[REVIEW_COLUMNS.get("Version")].apply(clean_version)
-    elif app_name.lower() == "webex":
-        reviews["clean_version"] = reviews[REVIEW_COLUMNS.get("Version")].apply(extract_major_minor)
-    elif app_name.lower() == "firefox":
-        # Firefox has no versions for features, so we gotta do some more work here
-        review_date_col = REVIEW_COLUMNS.get("Date")
-        release_date_col = PATCH_COLUMNS.get("Date")
-        releases[release_date_col] = pd.to_datetime(releases[release_date_col], errors='coerce')
-        reviews[review_date_col] = pd.to_datetime(reviews[review_date_col], errors='coerce')
-        reviews = reviews.sort_values(review_date_col)
-
-        release_dates = sorted(releases[release_date_col].dropna().unique().tolist())
-        release_dates.append(pd.Timestamp.max)
-
-        reviews['clean_version'] = pd.cut(
-            reviews[review_date_col],
-            bins=release_dates,
-            labels=releases[release_date_col].sort_values().unique(),
-            right=False # Don't include reviews that happen on the next review day in the previous bin [x, y)
-        )
-
-        reviews['clean_version'] = pd.to_datetime(reviews['clean_version'])
-        releases['clean_version'] = releases[release_date_col]
-
-
-    if app_name.lower() != "firefox":
-        releases["clean_version"] = releases[PATCH_COLUMNS.get("Version")].apply(clean_version)
-    versions = releases['clean_version'].dropna().unique()
+def load_saved_clusters(app_name, summary_path, reviews_path):
+    """
+    Reads the outputs of the last run back in so clean versions can reuse them.
+    Returns (summary, clustered_reviews), or (None, None) if either file is missing.
+    """
+    if not os.path.exists(summary_path) or not os.path.exists(reviews_path):
+        return None, None
+    # Read versions as strings, otherwise webex versions like "43.10" turn into 43.1,
+    # and use round trip floats so reused average scores are written back out unchanged
+    version_dtypes = {"version": str, "clean_version": str}
+    summary = pd.read_csv(summary_path, dtype=version_dtypes, float_precision='round_trip')
+    clustered_reviews = pd.read_csv(reviews_path, dtype=version_dtypes, float_precision='round_trip')
+    # Older runs wrote every review's embedding out as a list, we don't keep those anymore
+    clustered_reviews = clustered_reviews.drop(columns='embedding', errors='ignore')
+    if app_name.lower() == "firefox":
+        summary["version"] = pd.to_datetime(summary["version"])
+        clustered_reviews["clean_version"] = pd.to_datetime(clustered_reviews["clean_version"])
+    return summary, clustered_reviews
+
+
+def duplicate_reviews(reviews, dedup=False, dedup_threshold=None):
+    """
+    (groups, representatives) of prepared reviews, see dedup.duplicate_groups. Copies of the
+    same cleaned text are a group, and so are near copies at least dedup_threshold similar
+    if it's given. Without dedup every review is a group of its own.
+    """
+    if not dedup:
+        rows = np.arange(len(reviews))
+        return rows, rows
+    return duplicate_groups(reviews['cleaned_content'], dedup_threshold)
 
-    # Prepare lists to hold results
-    cluster_summary_list = []  # holds one dict per cluster with summary info
-    clustered_reviews_list = []  # holds the individual review clusters
 
-    # Cluster reviews for each version
-    for version in versions:
-        version_reviews = reviews[reviews['clean_version'] == version]
-        print(f"\nProcessing version: {version} - {len(version_reviews)} reviews")
+def cluster_version(version, version_reviews, version_embeddings, log=print, profiler=NULL_PROFILER,
+                    settings=CLUSTER_SETTINGS, groups=None, n_jobs=-1):
+    """
+    Runs HDBSCAN and TF-IDF labeling over one version's reviews.
+    Returns (cluster_summary_list, clustered_reviews_list, centroids) for that version,
+    centroids being each summary's mean embedding (see cluster_threads).
+    groups, if given, is the duplicate group of each review (see dedup), and version_embeddings
+    only has a row per group (its first review). n_jobs goes to cluster_embeddings. Progress
+    messages go through log, so worker processes can hand them back in order.
+    """
+    cluster_input = version_embeddings
+    if settings["reduction"]:
+        with profiler.span("reduce", version, rows=len(version_embeddings)):
+            cluster_input = reduce_embeddings(version_embeddings, settings["reduction"], settings["reduction_dims"])
+    with profiler.span("cluster", version, rows=len(cluster_input)):
+        group_labels = cluster_embeddings(cluster_input, settings, n_jobs)
+    labels = group_labels
+    weights = None
+    if groups is not None:
+        # Every review gets its group's cluster, so the summaries still count (and average) all of them
+        labels = group_labels[groups]
+        weights = np.bincount(groups)
+    with profiler.span("label", version, rows=len(version_reviews)):
+        summaries, clustered = label_clusters(version, version_reviews, labels, log=log, settings=settings)
+    # From the full embeddings, so centroids from runs with and without reduction compare
+    centroids = cluster_centroids(version_embeddings, group_labels, [summary["cluster_id"] for summary in summaries],
+                                  weights)
+    return summaries, clustered, centroids
+
+
+def cluster_embeddings(version_embeddings, settings=CLUSTER_SETTINGS, n_jobs=-1):
+    """
+    HDBSCAN cluster id for each embedding, -1 for noise. n_jobs is how many cores the fast
+    neighbor settings can use (see hdbscan_options).
+    """
+    import hdbscan
 
-        if len(version_reviews) < 5:
-            print(f"Skipping version {version} (not enough reviews)")
-            continue
+    # The embeddings come in as a float32/float16 slice of the memory mapped matrix,
+    # HDBSCAN works in float64 so this is the only copy of them we make
+    version_embeddings = np.asarray(version_embeddings, dtype=np.float64)
+    options = hdbscan_options(len(version_embeddings), version_embeddings.shape[1], settings["fast_neighbors_from"],
+                              n_jobs)
+
+    # Cluster with HDBSCAN
+    # If you want an explanation:
+    # https://hdbscan.readthedocs.io/en/latest/how_hdbscan_works.html
+    clusterer = hdbscan.HDBSCAN(min_cluster_size=settings["min_cluster_size"], **options)
+    return clusterer.fit_predict(version_embeddings)
 
-        version_embeddings = np.array(version_reviews['embedding'].tolist())
 
-        # Cluster with HDBSCAN
-        # If you want an explanation:
-        # https://hdbscan.readthedocs.io/en/latest/how_hdbscan_works.html
-        clusterer = hdbscan.HDBSCAN(min_cluster_size=5, prediction_data=True)
-        labels = clusterer.fit_predict(version_embeddings)
+def label_clusters(version, version_reviews, labels, log=print, settings=CLUSTER_SETTINGS):
+    """
+    Names each of a version's clusters with TF-IDF and drops the ones without a sensible label.
+    labels is the cluster id of each review. settings["label_method"] is how the phrases get
+    picked (see labeling). Returns the same as cluster_version.
+    """
+    cluster_summary_list = []
+    clustered_reviews_list = []
+
+    # Remove boring and uninformative reviews from phrase extraction
+    # Author note: Quite a bit of filtering was needed for this to make this visualizaiton feature not totally useless
+    labelable = (informative_mask(version_reviews) & ~version_reviews['cleaned_content'].isin(BORING_REVIEWS)).to_numpy()
+
+    # The token counts were only needed for that, so they don't end up in the output
+    version_reviews = version_reviews.drop(columns=TOKEN_COUNT_COLUMNS, errors='ignore')
+    version_reviews['cluster'] = labels
+
+    # Filter out noise points (label == -1)
+    not_noise = version_reviews['cluster'].to_numpy() != -1
+    clustered_reviews = version_reviews[not_noise]
+    labelable = labelable[not_noise]
+
+    if clustered_reviews.empty:
+        log(f"No good clusters found for version {version}")
+        return cluster_summary_list, clustered_reviews_list
+
+    log(f"Found {clustered_reviews['cluster'].nunique()} clusters for version {version}")
+
+    # Extract top terms for every cluster at once, over one shared n-gram vocabulary
+    # Explanation: https://www.learndatasci.com/glossary/tf-idf-term-frequency-inverse-document-frequency/
+    # This isn't perfect, but can help summarize for us.
+    cluster_ids = clustered_reviews['cluster'].to_numpy()
+    top_terms = cluster_labels(
+        clustered_reviews['cleaned_content'][labelable].tolist(),
+        cluster_ids[labelable],
+        method=settings["label_method"],
+        ngram_range=settings["tfidf_ngram_range"],
+        top_k=settings["tfidf_max_features"],
+    )
+
+    # For each cluster, update reviews with its representative phrases
+    for cluster_id in sorted(clustered_reviews['cluster'].unique()):
+        # Select reviews in the current cluster
+        in_cluster = cluster_ids == cluster_id
+        cluster_subset = clustered_reviews[in_cluster]
+        if cluster_id not in top_terms:
+            log(f"Skipping cluster {cluster_id} in version {version} (not enough informative reviews)")
+            continue
 
-        version_reviews = version_reviews.copy()
-        version_reviews['cluster'] = labels
+        cluster_label = top_terms[cluster_id]
 
-        # Filter out noise points (label == -1)
-        clustered_reviews = version_reviews[version_reviews['cluster'] != -1]
+        # Get the average score of the cluster
+        avg_score = cluster_subset[REVIEW_COLUMNS["Rating"]].mean()
 
-        if clustered_reviews.empty:
-            print(f"No good clusters found for version {version}")
+        if not is_valid_label(cluster_label, threshold=settings["label_threshold"]):
+            log(f"Cluster {cluster_id} in version {version} filtered out due to nonsensical label: {cluster_label}")
             continue
 
-        print(f"Found {clustered_reviews['cluster'].nunique()} clusters for version {version}")
+        log(f"Version {version} - Cluster {cluster_id}: {cluster_label} - Average Score: {avg_score}")
 
-        # For each cluster, determine representative phrases (using TF-IDF) and update reviews with it.
-        for cluster_id in sorted(clustered_reviews['cluster'].unique()):
-            # Select reviews in the current cluster
-            cluster_subset = clustered_reviews[clustered_reviews['cluster'] == cluster_id]
-            cluster_texts = cluster_subset['cleaned_content'].tolist()
+        # Record a summary for this cluster
+        cluster_summary_list.append({
+            "version": version,
+            "cluster_id": cluster_id,
+            "cluster_label": cluster_label,
+            "num_reviews": len(cluster_subset),
+            "avg_score": avg_score
+        })
 
-            # Remove boring and uninformative reviews from phrase extraction
-            # Author note: Quite a bit of filtering was needed for this to make this visualizaiton feature not totally useless
-            filtered_texts = [t for t in cluster_texts if t not in BORING_REVIEWS and is_informative(t)]
-            if not filtered_texts:
-                print(f"Skipping cluster {cluster_id} in version {version} (not enough informative reviews)")
-                continue
+        # Add the cluster label to each review in this cluster subset
+        cluster_subset = cluster_subset.copy()
+        cluster_subset['cluster_label'] = cluster_label
 
-            # Extract top terms using TF-IDF
-            # Explanation: https://www.learndatasci.com/glossary/tf-idf-term-frequency-inverse-document-frequency/
-            # This isn't perfect, but can help summarize for us.
-            tfidf = TfidfVectorizer(ngram_range=(3,4), strip_accents='unicode', max_features=5, stop_words='english')
-            tfidf_matrix = tfidf.fit_transform(filtered_texts)
-            top_terms = tfidf.get_feature_names_out()
-            cluster_label = ", ".join(top_terms)
+        # Append to global reviews list
+        clustered_reviews_list.append(cluster_subset)
 
-            # Get the average score of the cluster
-            avg_score = cluster_subset[REVIEW_COLUMNS["Rating"]].mean()
+    return cluster_summary_list, clustered_reviews_list
 
-            if not is_valid_label(cluster_label):
-                print(f"Cluster {cluster_id} in version {version} filtered out due to nonsensical label: {cluster_label}")
-                continue
 
-            print(f"Version {version} - Cluster {cluster_id}: {cluster_label} - Average Score: {avg_score}")
+# Worker processes open the shared embedding matrix once, memory mapped, instead of
+# having each version's embeddings pickled over to them
+_worker_embeddings = None
 
-            # Record a summary for this cluster
-            cluster_summary_list.append({
-                "version": version,
-                "cluster_id": cluster_id,
-                "cluster_label": cluster_label,
-                "num_reviews": len(cluster_subset),
-                "avg_score": avg_score
-            })
+def _init_worker(matrix_path):
+    global _worker_embeddings
+    _worker_embeddings = np.load(matrix_path, mmap_mode='r')
 
-            # Add the cluster label to each review in this cluster subset
-            cluster_subset = cluster_subset.copy()
-            cluster_subset['cluster_label'] = cluster_label
+def _cluster_version_task(version, version_reviews, start, stop, profile, settings, groups):
+    lines = []
+    profiler = Profiler() if profile else NULL_PROFILER
+    summaries, clustered, centroids = cluster_version(
+        version, version_reviews, _worker_embeddings[start:stop], log=lines.append, profiler=profiler,
+        settings=settings, groups=groups,
+        # One core each, there's already a worker per core
+        n_jobs=1,
+    )
+    return summaries, clustered, centroids, lines, profiler.spans
 
-            # Append to global reviews list
-            clustered_reviews_list.append(cluster_subset)
 
-    # Combine all the clustered reviews and cluster summaries into DataFrames
-    if clustered_reviews_list:
-        all_clustered_reviews = pd.concat(clustered_reviews_list, ignore_index=True)
-        # Create Clusters directory if it doesn't exist
-        os.makedirs("./Clusters", exist_ok=True)
-        # Save the detailed review clustering to CSV
-        all_clustered_reviews.to_csv(f"./Clusters/{app_name}_clustered_reviews_output.csv", index=False)
-        print(f"Saved detailed clustered reviews to 'Clusters/{app_name}_clustered_reviews_output.csv'")
-    else:
-        print("No clustered reviews to save.")
-
-    if cluster_summary_list:
-        cluster_summary_df = pd.DataFrame(cluster_summary_list)
-        # Create Clusters directory if it doesn't exist
-        os.makedirs("./Clusters", exist_ok=True)
-        # Save the cluster summary to CSV
-        cluster_summary_df.to_csv(f"./Clusters/{app_name}_cluster_summary.csv", index=False)
-        print(f"Saved cluster summary to 'Clusters/{app_name}_cluster_summary.csv'")
+def prepare_reviews(reviews):
+    """
+    Cleans and filters reviews. Their clean_version (the release they belong to) already
+    comes from ingest, for Firefox too.
+    Only looks at one row at a time, so it works the same on the whole frame or a chunk of it.
+    """
+    reviews = clean_reviews(reviews)
+    return filter_reviews(reviews)
+
+
+def clean_reviews(reviews):
+    """
+    Drops reviews without a version and adds their cleaned text as cleaned_content,
+    plus its token counts (TOKEN_COUNT_COLUMNS) for the filters after it.
+    """
+    reviews = reviews.dropna(subset=[REVIEW_COLUMNS["Version"]])
+
+    # Clean junk out of our reviews
+    cleaned = clean_texts(reviews['content'])
+    return reviews.assign(cleaned_content=cleaned, **token_counts(cleaned))
+
+
+def filter_reviews(reviews):
+    """
+    Keeps only the reviews whose cleaned text looks informative.
+    """
+    # Filter out any reviews that don't seem like they'll actually be useful
+    return reviews[informative_mask(reviews)]
+
+
+def load_prepared_reviews(app_name, stream=False, profiler=NULL_PROFILER):
+    """
+    An app's reviews, cleaned and filtered (see prepare_reviews), in the order create_cluster
+    goes through them. stream reads them in chunks, see create_cluster.
+    """
+    if stream:
+        # Reading and preparing happen chunk by chunk, so they can't be timed apart
+        with profiler.span("stream_reviews") as span:
+            reviews = stream_reviews(app_name, prepare=prepare_reviews)
+            span["rows"] = len(reviews)
     else:
-        print("No cluster summaries to save.")
+        with profiler.span("load_reviews") as span:
+            reviews = load_reviews(app_name)
+            span["rows"] = len(reviews)
+        with profiler.span("prepare", rows=len(reviews)):
+            reviews = prepare_reviews(reviews)
+
+    if app_name.lower() == "firefox":
+        reviews = reviews.sort_values(REVIEW_COLUMNS.get("Date"), kind='stable')
+    return reviews
+
+
+def create_cluster(app_name: str, incremental=True, workers=1, stream=False, backend=None,
+                   embedding_dtype="float32", profiler=NULL_PROFILER, label_method=CLUSTER_SETTINGS["label_method"],
+                   reduction=None, reduction_dims=CLUSTER_SETTINGS["reduction_dims"], fast_neighbors_from=None,
+                   dedup=CLUSTER_SETTINGS["dedup"], dedup_threshold=CLUSTER_SETTINGS["dedup_threshold"], reviews=None,
+                   duplicates=None, cache=None, progress=None):
+    """
+    Clusters the reviews of every release version of an app and writes the results to Clusters/.
+
+    With incremental on, each version's reviews are fingerprinted and checked against the
+    manifest from the last run. Versions whose reviews haven't changed reuse their saved
+    clusters, and only the changed ("dirty") versions get embedded and re-clustered.
+
+    With workers > 1, versions are clustered in a process pool. The output is the same as
+    the serial path, in the same order.
+
+    With stream on, reviews are read in chunks with only the columns clustering needs,
+    which keeps peak memory down on big exports. The clustered reviews output then only
+    has those columns.
+
+    backend is the embedding backend to use (see embedding_backends), float32 PyTorch by default.
+    reviews are the app's prepared reviews (see load_prepared_reviews) if they're already loaded,
+    duplicates their (groups, representatives) from duplicate_reviews if those are worked out
+    too, and cache the backend's EmbeddingCache if it's already open. create_clusters passes
+    all three in.
+
+    The embeddings of the versions being clustered are written to one memory mapped matrix
+    in Cache/, with each version's reviews in a contiguous block of rows, so a version's
+    embeddings are just a slice of it. embedding_dtype is "float32" or "float16" (half
+    the disk and memory, slightly different clusters).
+
+    label_method is how clusters get named (see labeling). The default, "legacy", gives the
+    labels the per cluster TfidfVectorizer used to, "ctfidf" scores phrases across clusters
+    (different labels).
+
+    reduction ("pca" or "random") shrinks each version's embeddings to reduction_dims before
+    HDBSCAN, and versions with at least fast_neighbors_from reviews use hdbscan's Boruvka
+    trees and skip its prediction data (see reduction). Both are off by default,
+    benchmarks/reduction.py shows the trade-off.
+
+    With dedup on, each group of copies of the same review (and, given dedup_threshold, of
+    near copies at least that similar to its first review) in a version goes to HDBSCAN as one
+    point, the first review's embedding (see dedup). hdbscan has no sample weights, so a review
+    pasted many times counts once towards density, which changes the clusters
+    (benchmarks/dedup.py measures how much). The rest of the group takes that point's cluster,
+    so the summary's num_reviews and avg_score still count every review, the clustered reviews
+    output lists every review and the centroids are weighted by group size. Off by default.
+
+    Every kept cluster's centroid and size go to Clusters/<App>_centroids.npz, a row per
+    summary row, for linking clusters across versions (see cluster_threads).
+
+    Every prepared review's embedding also goes into the app's search index (see search_index),
+    one vector per group of copies (exact copies without dedup), which is only rebuilt when some version's reviews changed.
+
+    profiler (see profiling) records how long each stage takes, and each version's
+    clustering and labeling. By default nothing is recorded.
+
+    progress, if given, is called as progress(stage, done, total) as the run goes along:
+    "loading", "embedding" (texts), "clustering" (versions), "writing" and "indexing".
+    cluster_jobs uses it to show how far a background run got.
+    """
+    report = progress or (lambda stage, done=0, total=0: None)
+    report("loading")
+    if backend is None:
+        backend = get_backend("torch", model_name=EMBEDDING_MODEL)
+    # Vectors from a different backend would give different clusters, so it's part of the settings
+    settings = dict(CLUSTER_SETTINGS, embedding_model=backend.cache_name, embedding_dtype=embedding_dtype,
+                    label_method=label_method, reduction=reduction, fast_neighbors_from=fast_neighbors_from,
+                    reduction_dims=reduction_dims if reduction else None, dedup=dedup,
+                    dedup_threshold=dedup_threshold if dedup else None)
+
+    # Wherever config.py says, so main.py finds them whatever case app_name was given in
+    key = app_name.lower()
+    summary_path = CLUSTER_FILES[f"{key}_summary"]
+    clustered_reviews_path = CLUSTER_FILES[f"{key}_clustered_reviews"]
+    manifest_path = CLUSTER_FILES[f"{key}_manifest"]
+    centroids_path = CLUSTER_FILES[f"{key}_centroids"]
+
+    # Typed copies of the CSVs, with dates parsed and every review already assigned to a release
+    with profiler.span("load_releases") as span:
+        releases = load_releases(app_name)
+        span["rows"] = len(releases)
+    if reviews is None:
+        reviews = load_prepared_reviews(app_name, stream, profiler)
+
+    versions = releases['clean_version'].dropna().unique()
+
+    # Work out which versions actually changed since the last run
+    saved_summary, saved_reviews, saved_centroids = None, None, None
+    previous_fingerprints = {}
+    if incremental:
+        with profiler.span("load_saved") as span:
+            saved_summary, saved_reviews = load_saved_clusters(app_name, summary_path, clustered_reviews_path)
+            if saved_summary is not None:
+                previous_fingerprints = load_manifest(manifest_path, settings)
+                saved_centroids = load_centroids(centroids_path)
+                span["rows"] = len(saved_reviews)
+
+    with profiler.span("fingerprint", rows=len(reviews)):
+        version_positions = {
+            version: np.flatnonzero((reviews['clean_version'] == version).to_numpy()) for version in versions
+        }
+        version_rows = {version: reviews.iloc[positions] for version, positions in version_positions.items()}
+        fingerprints = {str(version): fingerprint_reviews(rows) for version, rows in version_rows.items()}
+    dirty_versions = [
+        version for version in versions
+        if previous_fingerprints.get(str(version)) != fingerprints[str(version)]
+    ]
+    print(f"{len(dirty_versions)} of {len(versions)} versions changed since the last run")
+
+    # Group copies of the same review, only the first of each group gets embedded and clustered
+    if duplicates is None:
+        with profiler.span("dedup", rows=len(reviews)):
+            duplicates = duplicate_reviews(reviews, dedup, dedup_threshold)
+    groups, representatives = duplicates
+    if dedup:
+        print(f"Collapsed {len(reviews) - len(representatives)} copies into the first review of their group")
+
+    # Embed the cleaned review texts of the versions we actually have to cluster
+    # Most reviews were already embedded on a previous run, so only the new ones get sent to the model
+    to_embed = [v for v in dirty_versions if len(version_rows[v]) >= CLUSTER_SETTINGS["min_reviews"]]
+    # The matrix holds the versions one after another, so each one is a block of rows [start, stop),
+    # with a row per group of copies in the version
+    blocks = {}
+    version_groups = {}
+    texts = []
+    cleaned = reviews['cleaned_content']
+    for version in to_embed:
+        version_group_ids, local_groups = np.unique(groups[version_positions[version]], return_inverse=True)
+        if dedup:
+            version_groups[str(version)] = local_groups
+        blocks[str(version)] = (len(texts), len(texts) + len(version_group_ids))
+        texts.extend(cleaned.iloc[representatives[version_group_ids]].tolist())
+
+    def encode(missing_texts):
+        # Just the model, the embed span around it also counts the cache lookups and writes
+        with profiler.span("encode", rows=len(missing_texts)):
+            if progress is None:
+                return backend.encode(missing_texts)
+            # In chunks, so there's something to report while a big app embeds
+            parts = []
+            for start in range(0, len(missing_texts), PROGRESS_CHUNK):
+                report("embedding", start, len(missing_texts))
+                parts.append(backend.encode(missing_texts[start:start + PROGRESS_CHUNK]))
+            return np.concatenate(parts)
+
+    # A file of its own, another run for the same app (say a background job) may have one open too
+    os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+    fd, matrix_path = tempfile.mkstemp(dir=EMBEDDING_CACHE_DIR, prefix=f"{app_name.lower()}_matrix.", suffix=".npy")
+    os.close(fd)
+    with profiler.span("embed", rows=len(texts)):
+        if cache is None:
+            cache = EmbeddingCache(backend.cache_name)
+        matrix = cache.encode_to_file(texts, encode, matrix_path, dtype=embedding_dtype)
+        cache.save()
+    del texts
+    dirty = set(str(v) for v in dirty_versions)
+
+    # Prepare lists to hold results
+    cluster_summary_list = []  # holds one dict per cluster with summary info
+    clustered_reviews_list = []  # holds the individual review clusters
+    centroid_list = []  # holds each version's cluster centroids, lined up with the summaries
+    # Saved centroids line up with the saved summary rows, unless they're from some other run
+    if saved_centroids is not None and len(saved_centroids["centroid"]) != len(saved_summary):
+        saved_centroids = None
+
+    # Work out what to do with each version first, so the ones that need clustering
+    # can be handed to the process pool all at once
+    plan = []
+    for version in versions:
+        if str(version) not in dirty:
+            plan.append(("reuse", version, None))
+        elif len(version_rows[version]) < CLUSTER_SETTINGS["min_reviews"]:
+            plan.append(("skip", version, None))
+        else:
+            plan.append(("cluster", version, version_rows[version]))
+
+    futures = {}
+    executor = None
+    if workers > 1 and any(action == "cluster" for action, _, _ in plan):
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(matrix_path,))
+        for action, version, version_reviews in plan:
+            if action == "cluster":
+                futures[str(version)] = executor.submit(
+                    _cluster_version_task, version, version_reviews, *blocks[str(version)], profiler.enabled, settings,
+                    version_groups.get(str(version)),
+                )
+
+    to_cluster = sum(1 for action, _, _ in plan if action == "cluster")
+    clustered_count = 0
+    try:
+        # Cluster reviews for each version
+        for action, version, version_reviews in plan:
+            if action == "reuse":
+                # Nothing changed, so just carry over what we found last time
+                reused_summary = saved_summary[saved_summary['version'] == version]
+                reused_reviews = saved_reviews[saved_reviews['clean_version'] == version]
+                print(f"\nReusing version: {version} - {len(reused_summary)} saved clusters")
+                cluster_summary_list.extend(reused_summary.to_dict('records'))
+                if not reused_reviews.empty:
+                    clustered_reviews_list.append(reused_reviews)
+                if saved_centroids is not None:
+                    centroid_list.append(saved_centroids["centroid"][reused_summary.index.to_numpy()])
+                else:
+                    # Runs from before the centroid store, work them out from the cached embeddings
+                    vectors = cache.encode(reused_reviews['cleaned_content'].tolist(), encode)
+                    centroid_list.append(cluster_centroids(
+                        vectors, reused_reviews['cluster'].to_numpy(), reused_summary['cluster_id'].tolist()
+                    ))
+                continue
+
+            print(f"\nProcessing version: {version} - {len(version_rows[version])} reviews")
+
+            if action == "skip":
+                print(f"Skipping version {version} (not enough reviews)")
+                continue
+
+            report("clustering", clustered_count, to_cluster)
+            clustered_count += 1
+            if executor is None:
+                start, stop = blocks[str(version)]
+                summaries, clustered, centroids = cluster_version(
+                    version, version_reviews, matrix[start:stop], profiler=profiler, settings=settings,
+                    groups=version_groups.get(str(version)),
+                )
+            else:
+                summaries, clustered, centroids, lines, worker_spans = futures[str(version)].result()
+                for line in lines:
+                    print(line)
+                profiler.extend(worker_spans)
+            cluster_summary_list.extend(summaries)
+            clustered_reviews_list.extend(clustered)
+            centroid_list.append(centroids)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        # The matrix is only needed for this run (the cache keeps the vectors),
+        # and Windows won't delete it while it's still mapped
+        if matrix is not None:
+            del matrix
+        os.remove(matrix_path)
+
+    # Combine all the clustered reviews and cluster summaries into DataFrames
+    report("writing")
+    with profiler.span("write") as span:
+        if clustered_reviews_list:
+            all_clustered_reviews = pd.concat(clustered_reviews_list, ignore_index=True)
+            span["rows"] = len(all_clustered_reviews)
+            # Create Clusters directory if it doesn't exist
+            os.makedirs(os.path.dirname(clustered_reviews_path), exist_ok=True)
+            # Save the detailed review clustering to CSV
+            all_clustered_reviews.to_csv(clustered_reviews_path, index=False)
+            print(f"Saved detailed clustered reviews to '{clustered_reviews_path}'")
+        else:
+            print("No clustered reviews to save.")
+
+        if cluster_summary_list:
+            cluster_summary_df = pd.DataFrame(cluster_summary_list)
+            # Create Clusters directory if it doesn't exist
+            os.makedirs(os.path.dirname(summary_path), exist_ok=True)
+            # Save the cluster summary to CSV
+            cluster_summary_df.to_csv(summary_path, index=False)
+            print(f"Saved cluster summary to '{summary_path}'")
+            # Versions as strings the same way the CSV writes them
+            save_centroids(centroids_path, cluster_summary_df['version'].astype(str).tolist(),
+                           cluster_summary_df['cluster_id'].tolist(), cluster_summary_df['num_reviews'].tolist(),
+                           np.concatenate(centroid_list))
+            print(f"Saved cluster centroids to '{centroids_path}'")
+        else:
+            print("No cluster summaries to save.")
+
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"Peak RSS: {peak:.0f} MB")
+
+    report("indexing")
+    with profiler.span("search_index", rows=len(reviews)):
+        fingerprint = hashlib.sha256(json.dumps(fingerprints, sort_keys=True).encode('utf-8')).hexdigest()
+        build_search_index(app_name, reviews, cache, encode, backend, fingerprint=fingerprint,
+                           groups=groups if dedup else None)
+        cache.save()
+
+    # Only record fingerprints once the outputs they describe are on disk
+    if cluster_summary_list and clustered_reviews_list:
+        with open(manifest_path, "w") as f:
+            json.dump({"settings": settings, "versions": fingerprints}, f, indent=2)
+
+
+def create_clusters(app_names, backend=None, profile=False, stream=False, dedup=CLUSTER_SETTINGS["dedup"],
+                    dedup_threshold=CLUSTER_SETTINGS["dedup_threshold"], **options):
+    """
+    Runs create_cluster for several apps in one process, so the model, the embedding cache
+    and the NLTK words only get loaded once.
+
+    Every app's reviews are prepared first, then all of their texts that aren't cached yet
+    are embedded together in one call, so the backend batches (and length sorts) across apps.
+    With dedup, each app's groups of copies are found once here (see duplicate_reviews) and
+    only the first of each gets embedded. After that each app clusters straight from the
+    cache. options go to create_cluster.
+
+    With profile, each app gets its own Profiler. Returns {app_name: profiler}, the shared
+    loading and embedding are under the "batch" key.
+    """
+    if backend is None:
+        backend = get_backend("torch", model_name=EMBEDDING_MODEL)
+    new_profiler = Profiler if profile else lambda: NULL_PROFILER
+    batch_profiler = new_profiler()
+    profilers = {"batch": batch_profiler}
+    seconds = {}
+
+    cache = EmbeddingCache(backend.cache_name)
+    prepared = {}
+    for app_name in app_names:
+        print(f"\nLoading {app_name} reviews...")
+        started = time.perf_counter()
+        with batch_profiler.span("load", version=app_name) as span:
+            prepared[app_name] = load_prepared_reviews(app_name, stream, batch_profiler)
+            span["rows"] = len(prepared[app_name])
+        seconds[app_name] = time.perf_counter() - started
+
+    # Worked out once per app, create_cluster gets them passed in
+    duplicates = {}
+    texts = []
+    for app_name, reviews in prepared.items():
+        with batch_profiler.span("dedup", version=app_name, rows=len(reviews)):
+            duplicates[app_name] = duplicate_reviews(reviews, dedup, dedup_threshold)
+        texts.extend(reviews['cleaned_content'].iloc[duplicates[app_name][1]].tolist())
+    with batch_profiler.span("embed", rows=len(texts)):
+        encoded = cache.add(texts, backend.encode)
+        cache.save()
+    print(f"Embedded {encoded} new review texts across {len(app_names)} apps")
+    del texts
+
+    for app_name in app_names:
+        print(f"\n=== {app_name} ===")
+        profilers[app_name] = new_profiler()
+        started = time.perf_counter()
+        with profilers[app_name].span("total"):
+            # Dropped from prepared as it goes, so only one app's reviews stay around once clustered
+            create_cluster(app_name, stream=stream, backend=backend, profiler=profilers[app_name],
+                           dedup=dedup, dedup_threshold=dedup_threshold, reviews=prepared.pop(app_name),
+                           duplicates=duplicates.pop(app_name), cache=cache, **options)
+        seconds[app_name] += time.perf_counter() - started
+
+    print(f"\n{'app':<16}{'seconds':>10}")
+    for app_name in app_names:
+        print(f"{app_name:<16}{seconds[app_name]:>10.2f}")
+    return profilers
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Cluster reviews for a specific app.')
-    parser.add_argument('app_name', type=str, help='Name of the app to process (e.g., Zoom, Webex, Firefox)')
+    parser.add_argument('app_names', type=str, nargs='*', metavar='app_name',
+                        help='Apps to process (e.g., Zoom, Webex, Firefox). More than one are done in one batch')
+    parser.add_argument('--all', action='store_true', help='Process every app in REVIEW_FILES in one batch')
+    parser.add_argument('--full', action='store_true', help='Recompute every version instead of only the ones whose reviews changed')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes to cluster versions with (default: 1)')
+    parser.add_argument('--stream', action='store_true', help='Read reviews in chunks with only the needed columns to save memory')
+    parser.add_argument('--backend', choices=list(BACKENDS), default='torch', help='Embedding backend (default: torch)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help=f'Texts per embedding batch (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--threads', type=int, default=None, help='CPU threads for the embedding model (default: library default)')
+    parser.add_argument('--float16', action='store_true', help='Keep embeddings as float16 instead of float32 (half the memory, slightly different clusters)')
+    parser.add_argument('--label-method', choices=LABEL_METHODS, default=CLUSTER_SETTINGS["label_method"],
+                        help='How clusters get named, ctfidf scores phrases against the other clusters (different labels from older runs) (default: legacy)')
+    parser.add_argument('--reduce', choices=REDUCTION_METHODS, default=None, help='Shrink embeddings before HDBSCAN (default: no reduction)')
+    parser.add_argument('--dims', type=int, default=CLUSTER_SETTINGS["reduction_dims"], help=f'Dimensions to shrink them to with --reduce (default: {CLUSTER_SETTINGS["reduction_dims"]})')
+    parser.add_argument('--fast-neighbors', type=int, nargs='?', const=LARGE_VERSION_REVIEWS, default=None, metavar='MIN_REVIEWS',
+                        help=f'Faster HDBSCAN settings for versions with at least MIN_REVIEWS reviews (default: {LARGE_VERSION_REVIEWS})')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Cluster each group of copies of a review as one point, different clusters')
+    parser.add_argument('--dedup-threshold', type=float, nargs='?', const=NEAR_DUPLICATE_THRESHOLD,
+                        default=CLUSTER_SETTINGS["dedup_threshold"], metavar='SIMILARITY',
+                        help=f'With --dedup (implied), near copies at least this similar are in the group too '
+                             f'(default: only exact copies, {NEAR_DUPLICATE_THRESHOLD} if given without a value)')
+    parser.add_argument('--profile', type=str, nargs='?', const='', default=None, metavar='PREFIX',
+                        help='Time every stage and write the trace to PREFIX.json/.csv (default: Clusters/<app_name>_profile). '
+                             'In a batch every app gets its own, PREFIX_<app_name>')
     args = parser.parse_args()
-    create_cluster(args.app_name)
\ No newline at end of file
+    app_names = [key.removesuffix("_reviews") for key in REVIEW_FILES] if args.all else args.app_names
+    if not app_names:
+        parser.error("give an app name, or --all")
+    backend = get_backend(args.backend, model_name=EMBEDDING_MODEL, batch_size=args.batch_size, num_threads=args.threads)
+    options = dict(incremental=not args.full, workers=args.workers, stream=args.stream, backend=backend,
+                   embedding_dtype="float16" if args.float16 else "float32",
+                   label_method=args.label_method, reduction=args.reduce, reduction_dims=args.dims,
+                   fast_neighbors_from=args.fast_neighbors,
+                   dedup=args.dedup or args.dedup_threshold is not None, dedup_threshold=args.dedup_threshold)
+
+    if len(app_names) == 1:
+        profiler = Profiler() if args.profile is not None else NULL_PROFILER
+        with profiler.span("total"):
+            create_cluster(app_names[0], profiler=profiler, **options)
+        profilers = {app_names[0]: profiler}
+    else:
+        profilers = create_clusters(app_names, profile=args.profile is not None, **options)
+
+    batch = len(profilers) > 1
+    for name, profiler in profilers.items():
+        if not profiler.enabled:
+            continue
+        if batch:
+            print(f"\n{name}:")
+        profiler.print_summary()
+        if args.profile and batch:
+            profiler.save(f"{args.profile}_{name}")
+        else:
+            profiler.save(args.profile or f"./Clusters/{name}_profile")
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""
+Semantic search over an app's reviews, using the embeddings clustering already made.
+
+create_cluster saves an index per app in SEARCH_INDEX_DIR/<app>/:
+    vectors.npy     - an embedding per group of copies of a review (see dedup), scaled to length 1
+                      (float16 by default)
+    reviews.parquet - every prepared review: version, score, date and text
+    groups.npy      - the row of vectors.npy each review's embedding is
+    meta.json       - which embedding backend made the vectors, so queries get embedded the same way
+
+A query is embedded, and since every row has length 1 its dot product with a row is their
+cosine similarity. The matrix is scored a block of rows at a time, keeping the best k so far,
+so only one block is ever converted to float32. Every copy of a review shares its vector's
+score, and the best k vectors always have at least k reviews between them.
+
+Usage:
+    python search_index.py <app_name> "audio cuts out" [--top-k 50]
+    python search_index.py <app_name> --build    # (Re)build the index without clustering
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from atomic_files import temp_path
+from config import REVIEW_COLUMNS, SEARCH_INDEX_DIR
+from versioning import release_order_key
+from dedup import duplicate_groups
+from embedding_backends import get_backend, BACKENDS, DEFAULT_MODEL
+
+DEFAULT_TOP_K = 50
+DEFAULT_DTYPE = "float16"
+# Rows scored at once, small enough that a block converted to float32 stays in cache
+BLOCK_SIZE = 16384
+# What's kept about each review to show with the results
+RESULT_COLUMNS = ["clean_version", REVIEW_COLUMNS["Rating"], REVIEW_COLUMNS["Date"], REVIEW_COLUMNS["Description"], "reviewId"]
+
+# Query encoders by backend cache name, so every app's index made with a model shares it
+_encoders = {}
+
+
+def index_path(app_name):
+    return os.path.join(SEARCH_INDEX_DIR, app_name.lower())
+
+
+def build_search_index(app_name, reviews, cache, encoder, backend, dtype=DEFAULT_DTYPE, fingerprint=None,
+                       groups=None):
+    """
+    Writes app_name's search index for reviews (prepared, with cleaned_content), taking
+    their embeddings from cache (see embedding_cache) and encoding any it doesn't have
+    with encoder. backend is what the vectors are from.
+    groups is which group of copies each review is in (see dedup), only the first of each
+    gets a vector. By default copies of the same cleaned text are a group.
+    Skipped if the index on disk was already built from the same fingerprint.
+    """
+    path = index_path(app_name)
+    meta = _read_meta(path)
+    if fingerprint is not None and meta is not None and meta.get("fingerprint") == fingerprint \
+            and meta.get("cache_name") == backend.cache_name and meta.get("dtype") == dtype:
+        print(f"Search index for {app_name} is up to date")
+        return
+
+    # A folder of our own, in case the dashboard and a cluster job build this index at once
+    os.makedirs(SEARCH_INDEX_DIR, exist_ok=True)
+    tmp_path = temp_path(path)
+    os.makedirs(tmp_path)
+    if groups is None:
+        groups, representatives = duplicate_groups(reviews['cleaned_content'], None)
+    else:
+        representatives = np.unique(groups, return_index=True)[1]
+    vectors_path = os.path.join(tmp_path, "vectors.npy")
+    vectors = cache.encode_to_file(reviews['cleaned_content'].iloc[representatives].tolist(), encoder, vectors_path,
+                                   dtype=dtype)
+    if vectors is None:
+        print(f"No reviews to index for {app_name}")
+        shutil.rmtree(tmp_path)
+        return
+    del vectors
+    normalize_rows(vectors_path)
+
+    columns = [col for col in RESULT_COLUMNS if col in reviews.columns]
+    rows = reviews[columns].reset_index(drop=True)
+    # Parquet won't take mixed object columns, same as the ingest cache
+    for col in rows.columns[rows.dtypes == object]:
+        rows[col] = rows[col].astype("string")
+    rows.to_parquet(os.path.join(tmp_path, "reviews.parquet"), index=False)
+    np.save(os.path.join(tmp_path, "groups.npy"), np.asarray(groups, dtype=np.int64))
+
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({
+            "app": app_name,
+            "backend": backend.name,
+            "model_name": backend.model_name,
+            "onnx_file": getattr(backend, "onnx_file", None),
+            "cache_name": backend.cache_name,
+            "dtype": dtype,
+            "rows": len(rows),
+            "vectors": len(representatives),
+            "fingerprint": fingerprint,
+        }, f, indent=2)
+
+    # Swap the whole folder in at once, so a search never sees half an index. The old one
+    # is only moved aside first, so there's next to no moment without one
+    old_path = temp_path(path, ".old")
+    try:
+        os.replace(path, old_path)
+    except FileNotFoundError:
+        old_path = None
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another build swapped its index in first, keep that one
+        shutil.rmtree(tmp_path)
+    if old_path is not None:
+        shutil.rmtree(old_path, ignore_errors=True)
+    print(f"Saved search index for {app_name} ({len(rows)} reviews, {len(representatives)} vectors)")
+
+
+def normalize_rows(path, block_size=BLOCK_SIZE):
+    """
+    Scales every row of the .npy matrix at path to length 1, in place.
+    """
+    vectors = np.load(path, mmap_mode='r+')
+    for start in range(0, len(vectors), block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        vectors[start:start + block_size] = block / np.where(norms == 0, 1, norms)
+    vectors.flush()
+    del vectors
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class SearchIndex:
+    """
+    One app's search index, loaded from disk. The vectors stay memory mapped.
+    """
+
+    def __init__(self, app_name):
+        path = index_path(app_name)
+        self.meta = _read_meta(path)
+        if self.meta is None:
+            raise FileNotFoundError(f"No search index for {app_name}, run review_clustering.py {app_name} "
+                                    f"or search_index.py {app_name} --build first")
+        self.app_name = app_name
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode='r')
+        self.reviews = pd.read_parquet(os.path.join(path, "reviews.parquet"))
+        groups_path = os.path.join(path, "groups.npy")
+        # Indexes from before copies shared a vector have one per review
+        groups = np.load(groups_path) if os.path.exists(groups_path) else np.arange(len(self.reviews))
+        # Each vector's reviews are members[member_starts[row]:member_starts[row + 1]]
+        self.members = np.argsort(groups, kind='stable')
+        self.member_starts = np.r_[0, np.cumsum(np.bincount(groups, minlength=len(self.vectors)))]
+
+    def __len__(self):
+        return len(self.reviews)
+
+    def encode(self, query):
+        """
+        The query's embedding, made the same way as the index's vectors.
+        """
+        encoder = _encoders.get(self.meta["cache_name"])
+        if encoder is None:
+            options = {"onnx_file": self.meta["onnx_file"]} if self.meta.get("onnx_file") else {}
+            encoder = get_backend(self.meta["backend"], model_name=self.meta["model_name"],
+                                  show_progress_bar=False, **options)
+            _encoders[self.meta["cache_name"]] = encoder
+        return np.asarray(encoder.encode([query]), dtype=np.float32)[0]
+
+    def top_k(self, query_vector, k=DEFAULT_TOP_K, block_size=BLOCK_SIZE):
+        """
+        (rows, similarities) of the k rows of vectors most similar to query_vector, best first.
+        """
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1)
+        k = min(k, len(self.vectors))
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, len(self.vectors), block_size):
+            scores = np.asarray(self.vectors[start:start + block_size], dtype=np.float32) @ query_vector
+            # Only this block's top k can make it into the overall top k
+            if len(scores) > k:
+                keep = np.argpartition(-scores, k - 1)[:k]
+            else:
+                keep = np.arange(len(scores))
+            best_rows = np.concatenate([best_rows, keep + start])
+            best_scores = np.concatenate([best_scores, scores[keep]])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+        order = np.argsort(-best_scores, kind='stable')
+        return best_rows[order], best_scores[order]
+
+    def reviews_of(self, vector_rows, scores):
+        """
+        (rows of reviews, similarities) of every review of vector_rows, keeping their order.
+        """
+        counts = np.diff(self.member_starts)[vector_rows]
+        # Each vector's first member, less where its reviews start in the output
+        offsets = np.repeat(self.member_starts[vector_rows] - (np.cumsum(counts) - counts), counts)
+        return self.members[offsets + np.arange(counts.sum())], np.repeat(scores, counts)
+
+    def search(self, query, k=DEFAULT_TOP_K):
+        """
+        The k reviews closest in meaning to query, best first, with a similarity column.
+        Returns (results, timings), timings being {"encode_ms", "search_ms"}.
+        """
+        start = time.perf_counter()
+        query_vector = self.encode(query)
+        encoded = time.perf_counter()
+        vector_rows, scores = self.top_k(query_vector, k)
+        rows, scores = self.reviews_of(vector_rows, scores)
+        rows, scores = rows[:k], scores[:k]
+        results = self.reviews.iloc[rows].reset_index(drop=True)
+        results.insert(0, "similarity", scores.round(4))
+        done = time.perf_counter()
+        return results, {"encode_ms": (encoded - start) * 1000, "search_ms": (done - encoded) * 1000}
+
+
+def group_by_version(results):
+    """
+    Splits search results into [(version, results for it)], in release order.
+    """
+    groups = list(results.groupby("clean_version", sort=False))
+    return sorted(groups, key=lambda group: release_order_key(group[0]))
+
+
+def format_version(version):
+    # Firefox versions are release dates, the time of day is always midnight
+    return version.strftime("%Y-%m-%d") if isinstance(version, pd.Timestamp) else str(version)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search an app\'s reviews by meaning.')
+    parser.add_argument('app_name', type=str, help='Name of the app to search (e.g., Zoom, Webex, Firefox)')
+    parser.add_argument('query', type=str, nargs='?', help='What the reviews should be about, e.g. "audio cuts out"')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help=f'How many reviews to return (default: {DEFAULT_TOP_K})')
+    parser.add_argument('--build', action='store_true', help='Build the index from the current reviews first')
+    parser.add_argument('--backend', choices=list(BACKENDS), default='torch', help='Embedding backend for --build (default: torch)')
+    parser.add_argument('--float32', action='store_true', help='Keep the index in float32 instead of float16 with --build')
+    # Intermixed so the query can come after --build too
+    args = parser.parse_intermixed_args()
+
+    if args.build:
+        from embedding_cache import EmbeddingCache
+        from ingest import load_reviews
+        from review_clustering import prepare_reviews
+
+        backend = get_backend(args.backend, model_name=DEFAULT_MODEL)
+        reviews = prepare_reviews(load_reviews(args.app_name))
+        cache = EmbeddingCache(backend.cache_name)
+        build_search_index(args.app_name, reviews, cache, backend.encode, backend,
+                           dtype="float32" if args.float32 else DEFAULT_DTYPE)
+        cache.save()
+    if not args.query:
+        return
+
+    index = SearchIndex(args.app_name)
+    results, timings = index.search(args.query, args.top_k)
+    groups = group_by_version(results)
+    print(f"{len(results)} of {len(index)} reviews in {len(groups)} versions "
+          f"({timings['encode_ms']:.1f} ms embedding the query, {timings['search_ms']:.1f} ms searching)")
+    text_col = REVIEW_COLUMNS["Description"]
+    rating_col = REVIEW_COLUMNS["Rating"]
+    for version, group in groups:
+        print(f"\n{format_version(version)} - {len(group)} reviews")
+        for _, review in group.iterrows():
+            print(f"  {review['similarity']:.3f}  [{review[rating_col]}] {review[text_col]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import math
+
+# Dash DataTable filter operators, in the order they have to be checked
+# (e.g. "ge " before "gt " is fine, but "eq " has to come after "ne ")
+# Based on https://dash.plotly.com/datatable/callbacks
+FILTER_OPERATORS = [
+    ['ge ', '>='],
+    ['le ', '<='],
+    ['lt ', '<'],
+    ['gt ', '>'],
+    ['ne ', '!='],
+    ['eq ', '='],
+    ['contains '],
+    ['datestartswith '],
+]
+
+
+def split_filter_part(filter_part):
+    """
+    Splits one clause of a DataTable filter_query, e.g. "{score} >= 4",
+    into (column name, operator, value). Returns (None, None, None) if it can't be parsed.
+    """
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                if not value_part:
+                    return None, None, None
+                v0 = value_part[0]
+                if v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1:-1].replace('\\' + v0, v0)
+                else:
+                    # Left as a string, query_table turns it into a number for numeric columns
+                    # (so a version like "5.10" doesn't get turned into 5.1)
+                    value = value_part
+
+                # Symbols like '>=' are reported by their word form ('ge')
+                return name, operator_type[0].strip(), value
+
+    return None, None, None
+
+
+def query_table(df, filter_query=None, sort_by=None):
+    """
+    Applies a DataTable's filter_query and sort_by to a DataFrame, the same way the
+    table would do it in the browser with page_action='native'.
+    """
+    if filter_query:
+        for filter_part in filter_query.split(' && '):
+            col_name, operator, filter_value = split_filter_part(filter_part)
+            if col_name not in df.columns:
+                continue
+            column = df[col_name]
+            if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+                if column.dtype.kind in 'iuf':
+                    try:
+                        filter_value = float(filter_value)
+                    except ValueError:
+                        df = df.iloc[:0]
+                        continue
+                try:
+                    df = df.loc[getattr(column, operator)(filter_value)]
+                except TypeError:
+                    df = df.iloc[:0]
+            elif operator == 'contains':
+                df = df.loc[column.astype(str).str.contains(str(filter_value), case=False, regex=False, na=False)]
+            elif operator == 'datestartswith':
+                df = df.loc[column.astype(str).str.startswith(str(filter_value), na=False)]
+
+    if sort_by:
+        df = df.sort_values(
+            [col['column_id'] for col in sort_by],
+            ascending=[col['direction'] == 'asc' for col in sort_by],
+            kind='stable',
+        )
+
+    return df
+
+
+def page_records(df, page_current, page_size):
+    """
+    Serializes only the rows of the requested page.
+    """
+    start = (page_current or 0) * page_size
+    return df.iloc[start:start + page_size].to_dict('records')
+
+
+def page_count(num_rows, page_size):
+    return max(1, math.ceil(num_rows / page_size))
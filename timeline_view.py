@@ -0,0 +1,284 @@
+"""
+What the timeline shows for the part of it that's on screen, drawn with WebGL.
+
+Apps with hundreds of versions and thousands of clusters are too many markers for the browser
+to pan and hover smoothly. TimelineView keeps every release and cluster point of an app's
+figure, and for a visible x range gives back a figure with at most point_budget markers:
+
+    - if everything in view fits the budget, every release and cluster in view, as in the
+      normal figure (clicking them works the same)
+    - otherwise neighbouring releases are merged into bins, each drawn as one diamond, and
+      each bin's clusters are merged by average score into one dot per score_step. Clicking
+      those just says to zoom in.
+
+The figure always has five traces, in this order: releases, clusters, merged releases,
+merged clusters, issue threads (only drawn when nothing is merged). The ones that aren't in
+use are empty, so the click callback can tell them apart by curveNumber like before.
+"""
+import base64
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+DEFAULT_POINT_BUDGET = 2000
+# Points just off screen are sent too, up to this many screen widths each side,
+# so a short pan doesn't show empty space while the next view is worked out
+MARGIN_WIDTHS = 0.5
+# How finely merged clusters are split by average score (1-5 stars)
+SCORE_STEP = 0.5
+MIN_CLUSTER_SIZE, MAX_CLUSTER_SIZE = 10, 50
+
+
+class TimelineView:
+    def __init__(self, fig, aggregates, point_budget=DEFAULT_POINT_BUDGET, score_step=SCORE_STEP, uirevision=True):
+        """
+        fig and aggregates are an app's full figure and the per release numbers behind it,
+        as make_plot returns them. uirevision should be different for every app, plotly keeps
+        the user's zoom across figures with the same one.
+        """
+        self.point_budget = point_budget
+        self.uirevision = uirevision
+        self.score_step = score_step
+        self.layout = fig.layout
+        self.release_trace, self.cluster_trace = fig.data[0], fig.data[1]
+        self.thread_trace = fig.data[2] if len(fig.data) > 2 else None
+
+        x_col = aggregates.columns[0]
+        self.dates = pd.api.types.is_datetime64_any_dtype(aggregates[x_col])
+        self.releases = aggregates.reset_index(drop=True)
+        self.release_x = self.releases[x_col].to_numpy()
+        cluster_x = _values(self.cluster_trace.x, object)
+        if self.dates:
+            # Dates are placed by time, in nanoseconds
+            position = lambda xs: pd.to_datetime(pd.Series(xs)).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+            self.release_pos = self.release_x.astype("datetime64[ns]").astype(np.int64)
+            cluster_pos = position(cluster_x)
+            self.categories = None
+        else:
+            # Versions are categories, placed in order along the axis. Cluster versions that
+            # aren't a release come after, like plotly would put them
+            self.categories = list(dict.fromkeys([str(x) for x in self.release_x] + [str(x) for x in cluster_x]))
+            category_pos = {category: i for i, category in enumerate(self.categories)}
+            position = lambda xs: np.array([category_pos[str(x)] for x in xs], dtype=np.int64)
+            self.release_pos = position(self.release_x)
+            cluster_pos = position(cluster_x)
+
+        # Clusters sorted by position, so the ones in view are one slice
+        order = np.argsort(cluster_pos, kind="stable")
+        self.cluster_pos = cluster_pos[order]
+        self.cluster_x = cluster_x[order]
+        self.cluster_y = _values(self.cluster_trace.y, np.float64)[order]
+        self.cluster_reviews = _values(self.cluster_trace.marker.color, np.float64)[order]
+        self.cluster_size = _values(self.cluster_trace.marker.size, np.float64)[order]
+        self.cluster_customdata = _values(self.cluster_trace.customdata, object)[order]
+
+        # Thread lines are (start, end, None) triples, one per segment
+        thread = self.thread_trace
+        self.thread_x = _values(thread.x if thread else None, object).reshape(-1, 3)[:, :2]
+        self.thread_y = _values(thread.y if thread else None, np.float64).reshape(-1, 3)[:, :2]
+        self.thread_pos = position(self.thread_x.ravel()).reshape(-1, 2)
+
+    def parse_range(self, relayout_data):
+        """
+        The x range a relayoutData event zoomed or panned to, as positions. Returns None
+        for the whole timeline (autorange/reset), or False if the event wasn't about the x axis.
+        """
+        if not relayout_data:
+            return False
+        if relayout_data.get("xaxis.autorange"):
+            return None
+        if "xaxis.range[0]" in relayout_data:
+            bounds = relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+        elif "xaxis.range" in relayout_data:
+            bounds = relayout_data["xaxis.range"]
+        else:
+            return False
+        if self.dates:
+            return tuple(pd.Timestamp(bound).value for bound in bounds)
+        return float(bounds[0]), float(bounds[1])
+
+    def figure(self, x_range=None):
+        """
+        The figure for positions x_range (None for the whole timeline).
+        """
+        if x_range is None:
+            low, high = self.full_range()
+        else:
+            low, high = x_range
+            margin = (high - low) * MARGIN_WIDTHS
+            low, high = low - margin, high + margin
+
+        releases = np.flatnonzero((self.release_pos >= low) & (self.release_pos <= high))
+        start = np.searchsorted(self.cluster_pos, low, side="left")
+        stop = np.searchsorted(self.cluster_pos, high, side="right")
+
+        if len(releases) + (stop - start) <= self.point_budget:
+            traces = [self._releases(releases), self._clusters(start, stop), self._empty(), self._empty(),
+                      self._threads(low, high)]
+        else:
+            traces = [self._empty(), self._empty(), *self._merged(releases, start, stop), self._empty()]
+
+        fig = go.Figure(data=traces, layout=self.layout)
+        # Keep the user's zoom when the figure gets swapped out under them
+        fig.update_layout(uirevision=self.uirevision)
+        if self.categories is not None:
+            # Fixed category positions, otherwise they'd move with whichever points are sent
+            fig.update_xaxes(categoryorder="array", categoryarray=self.categories)
+        if x_range is not None:
+            fig.update_xaxes(range=self._axis_range(x_range), autorange=False)
+        return fig
+
+    def full_range(self):
+        positions = np.concatenate([self.release_pos, self.cluster_pos])
+        return positions.min(), positions.max()
+
+    def _axis_range(self, x_range):
+        if self.dates:
+            return [pd.Timestamp(int(bound)) for bound in x_range]
+        return list(x_range)
+
+    def _empty(self):
+        return go.Scattergl(x=[], y=[], mode="markers", showlegend=False)
+
+    def _releases(self, rows):
+        trace = self.release_trace
+        return go.Scattergl(
+            x=self.release_x[rows],
+            y=self.releases["y_value"].to_numpy()[rows],
+            mode="markers",
+            marker=_marker(trace, size=self.releases["count"].to_numpy()[rows],
+                           color=self.releases["review_count"].to_numpy()[rows]),
+            customdata=self.release_x[rows],
+            hovertemplate=trace.hovertemplate,
+            name=trace.name,
+            showlegend=False,
+        )
+
+    def _clusters(self, start, stop):
+        trace = self.cluster_trace
+        return go.Scattergl(
+            x=self.cluster_x[start:stop],
+            y=self.cluster_y[start:stop],
+            mode="markers",
+            marker=_marker(trace, size=self.cluster_size[start:stop], color=self.cluster_reviews[start:stop]),
+            customdata=np.stack(self.cluster_customdata[start:stop]) if stop > start else [],
+            hovertemplate=trace.hovertemplate,
+            name=trace.name,
+            showlegend=False,
+        )
+
+    def _threads(self, low, high):
+        """
+        The thread segments that reach into positions low to high.
+        """
+        if self.thread_trace is None:
+            return self._empty()
+        shown = (self.thread_pos.max(axis=1) >= low) & (self.thread_pos.min(axis=1) <= high)
+        x = np.full((shown.sum(), 3), None, dtype=object)
+        y = np.full((shown.sum(), 3), None, dtype=object)
+        x[:, :2], y[:, :2] = self.thread_x[shown], self.thread_y[shown]
+        return go.Scattergl(
+            x=x.ravel(), y=y.ravel(), mode="lines",
+            line=self.thread_trace.line.to_plotly_json(),
+            hoverinfo="skip", name=self.thread_trace.name, showlegend=False,
+        )
+
+    def _merged(self, releases, start, stop):
+        """
+        (merged release trace, merged cluster trace) for the releases at rows releases
+        and the clusters start:stop.
+        """
+        # A bin per release if there's room, otherwise enough bins that every bin's
+        # clusters still fit in the budget once split by score
+        score_bins = int(np.ceil(4 / self.score_step)) + 1
+        num_bins = max(1, min(len(releases), self.point_budget // (score_bins + 1)))
+        groups = [group for group in np.array_split(releases, num_bins) if len(group)]
+
+        counts = self.releases["count"].to_numpy(dtype=np.float64)
+        reviews = self.releases["review_count"].fillna(0).to_numpy(dtype=np.float64)
+        ratings = self.releases["avg_rating"].to_numpy(dtype=np.float64)
+        bin_x, bin_y, bin_size, bin_reviews, bin_text = [], [], [], [], []
+        for group in groups:
+            # Each bin sits on its middle release, so it lands on a real category
+            bin_x.append(self.release_x[group[len(group) // 2]])
+            weights = reviews[group]
+            rated = ~np.isnan(ratings[group]) & (weights > 0)
+            bin_y.append(np.average(ratings[group][rated], weights=weights[rated]) if rated.any() else 3)
+            bin_size.append(counts[group].mean())
+            bin_reviews.append(weights.sum())
+            first, last = self.release_x[group[0]], self.release_x[group[-1]]
+            bin_text.append(f"{self._label(first)} to {self._label(last)}<br>"
+                            f"<b>Releases:</b> {len(group)}<br><b>Features:</b> {int(counts[group].sum())}")
+
+        release_trace = go.Scattergl(
+            x=bin_x, y=bin_y, mode="markers",
+            marker=_marker(self.release_trace, size=bin_size, color=bin_reviews),
+            text=bin_text,
+            hovertemplate=(
+                "<b style='font-size: 14px'>%{text}</b><br>"
+                "<b># Reviews:</b> %{marker.color:,.0f}<br>"
+                "<b>Avg Rating:</b> %{y:.2f}<br>"
+                "<i>Zoom in for single releases</i><extra></extra>"
+            ),
+            name="Releases (merged)", showlegend=False,
+        )
+        return release_trace, self._merged_clusters(groups, bin_x, start, stop)
+
+    def _merged_clusters(self, groups, bin_x, start, stop):
+        if stop <= start:
+            return self._empty()
+        # Each cluster goes in the bin of the last release at or before it
+        edges = np.array([self.release_pos[group[0]] for group in groups])
+        bins = np.clip(np.searchsorted(edges, self.cluster_pos[start:stop], side="right") - 1, 0, len(groups) - 1)
+        scores = self.cluster_y[start:stop]
+        merged = pd.DataFrame({
+            "bin": bins,
+            "score_bin": np.floor(scores / self.score_step).astype(np.int64),
+            "reviews": self.cluster_reviews[start:stop],
+            "weighted_score": scores * self.cluster_reviews[start:stop],
+        }).groupby(["bin", "score_bin"], sort=True).agg(
+            clusters=("reviews", "size"), reviews=("reviews", "sum"), weighted_score=("weighted_score", "sum"),
+        ).reset_index()
+
+        reviews = merged["reviews"].to_numpy(dtype=np.float64)
+        spread = reviews.max() - reviews.min()
+        size = (reviews - reviews.min()) / (spread if spread else 1) * (MAX_CLUSTER_SIZE - MIN_CLUSTER_SIZE) + MIN_CLUSTER_SIZE
+        return go.Scattergl(
+            x=[bin_x[b] for b in merged["bin"]],
+            y=merged["weighted_score"] / np.where(reviews == 0, 1, reviews),
+            mode="markers",
+            marker=dict(size=size, color=reviews, colorscale=self.cluster_trace.marker.colorscale),
+            customdata=np.stack([merged["clusters"], reviews], axis=-1),
+            hovertemplate=(
+                "<b>Review Clusters:</b> %{customdata[0]:,}<br>"
+                "<b>Avg Score:</b> %{y:.2f}<br>"
+                "<b># Reviews:</b> %{customdata[1]:,}<br>"
+                "<i>Zoom in for single clusters</i><extra></extra>"
+            ),
+            name="Cluster Summary (merged)", showlegend=False,
+        )
+
+    def _label(self, x):
+        return pd.Timestamp(x).strftime("%Y-%m-%d") if self.dates else str(x)
+
+
+def _marker(trace, **changes):
+    """
+    A copy of trace's marker settings (symbol, outline, size scaling, colors) with changes made.
+    """
+    marker = trace.marker.to_plotly_json()
+    marker.update(changes)
+    return marker
+
+
+def _values(value, dtype):
+    """
+    A trace's data array as numpy. Figures loaded back from JSON (see figure_cache) keep
+    numeric arrays the way plotly writes them, base64 in a {"dtype", "bdata", "shape"} dict.
+    """
+    if isinstance(value, dict) and "bdata" in value:
+        array = np.frombuffer(base64.b64decode(value["bdata"]), dtype=value["dtype"])
+        if "shape" in value:
+            array = array.reshape([int(n) for n in str(value["shape"]).split(",")])
+        return array.astype(dtype)
+    return np.asarray(value if value is not None else [], dtype=dtype)
@@ -0,0 +1,125 @@
+"""
+Works out which release every review belongs to.
+
+Zoom and Webex reviews carry an app version, which gets cleaned down to the same form as
+the release versions. Firefox releases have no versions, so each review goes to the last
+release on or before the day it was written.
+
+clean_version and extract_major_minor clean one value. clean_versions and
+major_minor_versions do a whole column: each distinct value is only cleaned once (with
+str.extract), and remembered, since the same few hundred version strings come up in every
+file and chunk. attribute_releases bins review dates to release dates with np.searchsorted.
+release_order_key sorts either kind of release in the order they came out.
+"""
+import re
+import numpy as np
+import pandas as pd
+from packaging import version as packaging_version
+
+VERSION_PATTERN = r'(\d+\.\d+(?:\.\d+)?)'
+MAJOR_MINOR_PATTERN = r'(\d+)\.(\d+)'
+
+# Raw version string -> cleaned version, filled in as columns get cleaned
+_clean_memo = {}
+_major_minor_memo = {}
+
+
+def clean_version(v):
+    """
+    Drops all unneeded version info.
+    Example: "version 51.01 (4306)" -> "51.01"
+    """
+    s = str(v).lower().strip()
+    pattern = re.search(VERSION_PATTERN, s)
+    if pattern:
+        return pattern.group(1)
+    return s
+
+def extract_major_minor(version):
+    """
+    Extracts the major.minor part of a version string.
+    """
+    match = re.search(MAJOR_MINOR_PATTERN, str(version))
+    if match:
+        major, minor = match.groups()
+        return f"{major}.{minor}"
+    return None
+
+
+def _clean_unique(values):
+    s = pd.Series(values, dtype=object).astype(str).str.lower().str.strip()
+    return s.str.extract(VERSION_PATTERN, expand=False).fillna(s).tolist()
+
+def _major_minor_unique(values):
+    parts = pd.Series(values, dtype=object).astype(str).str.extract(MAJOR_MINOR_PATTERN)
+    joined = parts[0] + "." + parts[1]
+    return joined.astype(object).where(joined.notna(), None).tolist()
+
+
+def _map_versions(values, memo, clean_unique, scalar, keep_na):
+    """
+    Cleans every value of a column with clean_unique, running it only on the distinct values
+    memo hasn't seen yet. Missing values come out as scalar would clean them, or stay
+    missing with keep_na.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    uniques = np.asarray(uniques, dtype=object)
+
+    new = [v for v in uniques.tolist() if v not in memo]
+    if new:
+        memo.update(zip(new, clean_unique(new)))
+
+    # Missing values have code -1, which picks the value tacked on the end
+    missing = None if keep_na else scalar(np.nan)
+    mapped = np.array([memo[v] for v in uniques.tolist()] + [missing], dtype=object)
+    return pd.Series(mapped[codes], index=values.index, dtype=object)
+
+
+def clean_versions(values, keep_na=False):
+    """
+    clean_version of every value in values, as a Series.
+    """
+    return _map_versions(values, _clean_memo, _clean_unique, clean_version, keep_na)
+
+def major_minor_versions(values, keep_na=False):
+    """
+    extract_major_minor of every value in values, as a Series.
+    """
+    return _map_versions(values, _major_minor_memo, _major_minor_unique, extract_major_minor, keep_na)
+
+
+def attribute_releases(review_dates, release_dates):
+    """
+    The date of the last release on or before each review date, as a datetime Series.
+    Reviews from before the first release (or without a date) get NaT.
+    Same bins as pd.cut over the sorted release dates with right=False: [release, next release).
+    """
+    review_dates = pd.to_datetime(pd.Series(review_dates))
+    bins = np.unique(pd.to_datetime(pd.Series(release_dates)).dropna().to_numpy(dtype="datetime64[ns]"))
+
+    dates = review_dates.to_numpy(dtype="datetime64[ns]")
+    positions = np.searchsorted(bins, dates, side='right') - 1
+    # NaT sorts after every date, so it has to be left out by hand
+    found = (positions >= 0) & ~np.isnat(dates)
+
+    released = np.full(len(dates), np.datetime64("NaT"), dtype="datetime64[ns]")
+    released[found] = bins[positions[found]]
+    return pd.Series(released, index=review_dates.index)
+
+
+def release_order_key(version):
+    """
+    Sort key that puts clean versions ("5.16.2") or Firefox release dates in release order.
+    """
+    if isinstance(version, pd.Timestamp):
+        return (0, version.value)
+    try:
+        return (0, packaging_version.parse(str(version)))
+    except packaging_version.InvalidVersion:
+        pass
+    # Firefox dates that came back as strings, e.g. from a CSV
+    try:
+        return (1, pd.Timestamp(version).value)
+    except (ValueError, TypeError):
+        return (2, str(version))